@@ -0,0 +1,71 @@
+"""Throughput of concurrent downloads through the async views, and how long the event loop stalls.
+
+    python bench/async_downloads.py --size-mb 20 --concurrency 1 8 32
+
+Every file read runs on the I/O pool, so the loop should stay responsive however many downloads are
+in flight; the worst delay seen by a 1 ms ticker running next to the downloads is reported as the lag.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from support import make_share, setup, write_file
+
+
+async def tick(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        l_start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - l_start - 0.001)
+    return
+
+
+async def download(view, request) -> int:
+    l_response = await view(request)
+    if 400 <= l_response.status_code:
+        raise RuntimeError(f'HTTP {l_response.status_code}')
+    l_size = 0
+    async for c in l_response:
+        l_size += len(c)
+    return l_size
+
+
+async def run(view, factory, concurrency: int) -> tuple:
+    l_lags: list = []
+    l_stop = asyncio.Event()
+    l_ticker = asyncio.create_task(tick(l_lags, l_stop))
+    l_start = time.perf_counter()
+    l_sizes = await asyncio.gather(*[
+        download(view, factory.get('/filesystem/download', {'id': f'/file{i}.bin', 'name': f'file{i}.bin'}))
+        for i in range(concurrency)
+    ])
+    l_seconds = time.perf_counter() - l_start
+    l_stop.set()
+    await l_ticker
+    return sum(l_sizes), l_seconds, max(l_lags, default=0.0)
+
+
+def main() -> None:
+    l_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    l_parser.add_argument('--size-mb', type=int, default=20)
+    l_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    l_args = l_parser.parse_args()
+    l_root = make_share()
+    setup(l_root)
+    from django.test import AsyncRequestFactory
+    from filesystem import views
+
+    for i in range(max(l_args.concurrency)):
+        write_file(os.path.join(l_root, f'file{i}.bin'), l_args.size_mb * 1024 * 1024)
+    l_factory = AsyncRequestFactory()
+    for c in l_args.concurrency:
+        l_bytes, l_seconds, l_lag = asyncio.run(run(views.download_async, l_factory, c))
+        print(f'{c:4d} concurrent   {l_seconds * 1000:9.1f} ms   {l_bytes / l_seconds / 1024 / 1024:9.1f} MiB/s'
+              f'   worst loop lag {l_lag * 1000:7.2f} ms')
+    return
+
+
+if __name__ == '__main__':
+    main()
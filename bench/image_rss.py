@@ -0,0 +1,52 @@
+"""Peak resident memory while serving large images.
+
+    python bench/image_rss.py --size-mb 200 --requests 5
+
+Serves one large image through content=bytes several times and reports how far the process peak RSS
+rose, next to the rise from reading the same file into memory once, which is what the view used to do.
+"""
+
+import argparse
+import os
+import resource
+import sys
+
+from support import fetch, make_share, measure, report, setup, write_file
+
+
+def get_peak_rss() -> int:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    l_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return l_peak if sys.platform == 'darwin' else l_peak * 1024
+
+
+def main() -> None:
+    l_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    l_parser.add_argument('--size-mb', type=int, default=200)
+    l_parser.add_argument('--requests', type=int, default=5)
+    l_args = l_parser.parse_args()
+    l_root = make_share()
+    setup(l_root)
+    from django.test import Client
+
+    l_size = l_args.size_mb * 1024 * 1024
+    write_file(os.path.join(l_root, 'small.jpg'), 1024)
+    l_path = write_file(os.path.join(l_root, 'large.jpg'), l_size)
+    l_client = Client()
+    # Imports, templates and the first response are paid for before the baseline is taken.
+    fetch(l_client, '/filesystem/?id=/small.jpg&type=image&name=small.jpg&content=bytes')
+    l_baseline = get_peak_rss()
+    l_url = '/filesystem/?id=/large.jpg&type=image&name=large.jpg&content=bytes'
+    report(f'{l_args.size_mb} MiB image', measure(lambda: fetch(l_client, l_url), l_args.requests), l_size)
+    l_served = get_peak_rss()
+    with open(l_path, 'rb') as f:
+        l_data = f.read()
+    l_read = get_peak_rss()
+    del l_data
+    print(f'peak RSS rise while serving {l_args.requests} requests   {(l_served - l_baseline) / 1024 / 1024:9.1f} MiB')
+    print(f'peak RSS rise from one read() of the file   {(l_read - l_served) / 1024 / 1024:9.1f} MiB')
+    return
+
+
+if __name__ == '__main__':
+    main()
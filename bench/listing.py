@@ -0,0 +1,58 @@
+"""Directory listing time for a directory of N entries.
+
+    python bench/listing.py --entries 100000 --repeat 5
+
+Times the raw scandir pass, a cold and a warm listing through the listing cache, and a rendered page.
+"""
+
+import argparse
+import os
+
+from support import fetch, make_share, measure, report, setup
+
+
+def populate(root: str, entries: int) -> str:
+    l_directory = os.path.join(root, 'big')
+    os.makedirs(l_directory)
+    for i in range(entries):
+        if i % 10 == 0:
+            os.mkdir(os.path.join(l_directory, f'dir {i:07d}'))
+        else:
+            open(os.path.join(l_directory, f'file {i:07d}.txt'), 'wb').close()
+    return l_directory
+
+
+def main() -> None:
+    l_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    l_parser.add_argument('--entries', type=int, default=20000)
+    l_parser.add_argument('--repeat', type=int, default=5)
+    l_args = l_parser.parse_args()
+    l_root = make_share()
+    setup(l_root)
+    from django.test import Client
+    from com.yoclabo.filesystem.cache import ListingCache
+    from com.yoclabo.filesystem.query.Query import SORT_MTIME, SORT_NAME, list_children_sorted, scan_children
+
+    l_directory = populate(l_root, l_args.entries)
+    print(f'{l_args.entries} entries in {l_directory}')
+    report('scan_children', measure(lambda: scan_children(l_directory), l_args.repeat))
+
+    def cold(sort: str) -> None:
+        ListingCache.cache.clear()
+        list_children_sorted(l_directory, sort, False, True)
+        return
+
+    report('sorted listing, cold, by name', measure(lambda: cold(SORT_NAME), l_args.repeat))
+    report('sorted listing, cold, by mtime', measure(lambda: cold(SORT_MTIME), l_args.repeat))
+    report('sorted listing, warm', measure(lambda: list_children_sorted(l_directory, SORT_NAME, False, True),
+                                           l_args.repeat))
+    l_client = Client()
+    l_url = '/filesystem/?id=/big&type=directory&name=big&page=2'
+    report('browse page 2, warm', measure(lambda: fetch(l_client, l_url), l_args.repeat))
+    report('listing API, 200 entries, warm', measure(lambda: fetch(l_client, '/filesystem/listing?id=/big'),
+                                                     l_args.repeat))
+    return
+
+
+if __name__ == '__main__':
+    main()
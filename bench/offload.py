@@ -0,0 +1,42 @@
+"""Worker time per download with and without the nginx X-Accel-Redirect offload.
+
+    python bench/offload.py --size-mb 50 --requests 20
+
+With the offload the worker only resolves the path and answers headers; nginx sends the body. Without
+it the worker reads and writes every byte. The numbers are the time the worker is busy per request.
+"""
+
+import argparse
+import os
+from unittest import mock
+
+from support import fetch, make_share, measure, report, setup, write_file
+
+
+def main() -> None:
+    l_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    l_parser.add_argument('--size-mb', type=int, default=50)
+    l_parser.add_argument('--requests', type=int, default=20)
+    l_args = l_parser.parse_args()
+    l_root = make_share()
+    setup(l_root)
+    from django.test import Client
+    from com.yoclabo.routing import FileServing
+
+    l_size = l_args.size_mb * 1024 * 1024
+    write_file(os.path.join(l_root, 'video.mp4'), l_size)
+    l_client = Client()
+    l_urls = [
+        ('download', '/filesystem/download?id=/video.mp4&name=video.mp4'),
+        ('content=bytes', '/filesystem/?id=/video.mp4&type=media&name=video.mp4&content=bytes'),
+    ]
+    for name, url in l_urls:
+        fetch(l_client, url)
+        report(f'{name}, through the worker', measure(lambda: fetch(l_client, url), l_args.requests), l_size)
+        with mock.patch.object(FileServing, 'X_ACCEL_REDIRECT_LOCATION', '/protected/'):
+            report(f'{name}, X-Accel-Redirect', measure(lambda: fetch(l_client, url), l_args.requests))
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import atexit
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_share() -> str:
+    # A throwaway ROOT_DIRECTORY, removed when the script exits.
+    l_root = os.path.realpath(tempfile.mkdtemp(prefix='filesystem-bench-'))
+    atexit.register(shutil.rmtree, l_root, True)
+    return l_root
+
+
+def setup(root: str) -> None:
+    # Must run before anything under com/ is imported: the modules read .env relative to the working
+    # directory and ROOT_DIRECTORY from the environment, which .env does not override.
+    os.chdir(BASE_DIR)
+    sys.path.insert(0, BASE_DIR)
+    os.environ['ROOT_DIRECTORY'] = root
+    os.environ.setdefault('DJANGO_SECRET_KEY', 'bench')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'browser.settings')
+    import django
+    from django.test.utils import setup_test_environment
+    django.setup()
+    # Lets the test client through ALLOWED_HOSTS.
+    setup_test_environment()
+    return
+
+
+def write_file(path: str, size: int) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        l_block = os.urandom(min(size, 1024 * 1024))
+        l_left = size
+        while 0 < l_left:
+            f.write(l_block[:l_left])
+            l_left -= len(l_block)
+    return path
+
+
+def fetch(client, url: str, **headers) -> int:
+    # Reads the whole body, as a browser would, and returns its length.
+    l_response = client.get(url, headers=headers)
+    if 400 <= l_response.status_code:
+        raise RuntimeError(f'{url}: HTTP {l_response.status_code}')
+    l_size = 0
+    if l_response.streaming:
+        for c in l_response.streaming_content:
+            l_size += len(c)
+    else:
+        l_size = len(l_response.content)
+    l_response.close()
+    return l_size
+
+
+def measure(func: Callable[[], object], repeat: int) -> list:
+    l_seconds: list = []
+    for _ in range(repeat):
+        l_start = time.perf_counter()
+        func()
+        l_seconds.append(time.perf_counter() - l_start)
+    return l_seconds
+
+
+def report(label: str, seconds: list, bytes_per_run: int = 0) -> None:
+    l_line = f'{label:<40} median {statistics.median(seconds) * 1000:9.2f} ms   min {min(seconds) * 1000:9.2f} ms'
+    if bytes_per_run:
+        l_line += f'   {bytes_per_run / statistics.median(seconds) / 1024 / 1024:9.1f} MiB/s'
+    print(l_line)
+    return
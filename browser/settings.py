@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'corsheaders',
+    'filesystem',
 ]
 
 MIDDLEWARE = [
@@ -73,6 +74,14 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'browser.wsgi.application'
 
+# Serve the filesystem views as async views; only useful under an ASGI server (browser.asgi).
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
+# Watch ROOT_DIRECTORY from one worker and drop stale listing caches and thumbnails as changes arrive; the
+# invalidations reach every worker through the shared log. Leave this off when manage.py watch_filesystem runs;
+# either way only one process holds the watcher lock, and another takes over when it exits.
+FILESYSTEM_WATCHER = env.bool('FILESYSTEM_WATCHER', default=False)
+
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
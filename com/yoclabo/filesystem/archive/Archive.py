@@ -0,0 +1,374 @@
+#
+# Archive.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import calendar
+import hashlib
+import io
+import json
+import os
+import os.path
+import struct
+import tarfile
+import tempfile
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+from typing import IO, NamedTuple
+
+import environ
+
+from browser.settings import BASE_DIR
+
+env = environ.Env()
+env.read_env('.env')
+
+ARCHIVE_CACHE_DIRECTORY: str = env.str('ARCHIVE_CACHE_DIRECTORY', default=os.path.join(BASE_DIR, 'cache', 'archive'))
+
+# Separates the archive from the member path in a virtual id: /photos/2019.zip!/march/1.jpg
+SEPARATOR = '!/'
+
+FORMAT_ZIP = 'zip'
+
+FORMAT_TAR = 'tar'
+
+METHOD_ENCRYPTED = -1
+
+# Local file header: signature, version, flags, method, time, date, crc, sizes, name length, extra length.
+LOCAL_HEADER = struct.Struct('<4s5HLLLHH')
+
+READ_SIZE = 256 * 1024
+
+MAX_OPEN_ARCHIVES = 64
+
+
+class Member(NamedTuple):
+    name: str
+    is_dir: bool
+    size: int
+    mtime: float
+    offset: int
+    method: int
+    compressed_size: int
+
+
+class MemberTable:
+
+    # Every member of one archive, read once from the zip central directory or the tar headers.
+    # Directories that only exist as a prefix of member names are added, so every level can be listed.
+    def __init__(self, path: str, mtime_ns: int, size: int, format: str, members: list) -> None:
+        self.f_path: str = path
+        self.f_mtime_ns: int = mtime_ns
+        self.f_size: int = size
+        self.f_format: str = format
+        self.f_members: dict = {}
+        self.f_children: dict = {'': {}}
+        for m in members:
+            self.add(m)
+        return
+
+    @property
+    def format(self) -> str:
+        return self.f_format
+
+    @property
+    def members(self) -> list:
+        return list(self.f_members.values())
+
+    def is_current(self, st: os.stat_result) -> bool:
+        return self.f_mtime_ns == st.st_mtime_ns and self.f_size == st.st_size
+
+    def add(self, member: Member) -> None:
+        if not member.name:
+            return
+        self.f_members[member.name] = member
+        if member.is_dir:
+            self.f_children.setdefault(member.name, {})
+        l_name = member.name
+        while l_name:
+            l_parent = l_name.rpartition('/')[0]
+            l_siblings = self.f_children.setdefault(l_parent, {})
+            if l_name in l_siblings:
+                # Everything above is linked already.
+                break
+            l_siblings[l_name] = None
+            if l_parent and l_parent not in self.f_members:
+                self.f_members[l_parent] = Member(l_parent, True, 0, member.mtime, 0, zipfile.ZIP_STORED, 0)
+            l_name = l_parent
+        return
+
+    def get(self, name: str) -> Member:
+        l_member = self.f_members.get(name.strip('/'))
+        if l_member is None:
+            raise FileNotFoundError(f'{self.f_path}{SEPARATOR}{name}')
+        return l_member
+
+    def list(self, directory: str) -> list:
+        l_children = self.f_children.get(directory.strip('/'))
+        if l_children is None:
+            raise NotADirectoryError(f'{self.f_path}{SEPARATOR}{directory}')
+        return [self.f_members[n] for n in l_children]
+
+
+def is_archive_name(name: str) -> bool:
+    return name.lower().endswith('.zip') or name.lower().endswith('.tar')
+
+
+def is_member_path(path: str) -> bool:
+    l_archive, l_separator, _ = path.partition(SEPARATOR)
+    return bool(l_separator) and is_archive_name(l_archive)
+
+
+def split(path: str) -> tuple:
+    # (archive path, member path), or (path, None) when the path does not point into an archive.
+    if not is_member_path(path) or not os.path.isfile(path.partition(SEPARATOR)[0]):
+        return path, None
+    l_archive, _, l_member = path.partition(SEPARATOR)
+    return l_archive, l_member.strip('/')
+
+
+def join(archive: str, member: str) -> str:
+    return archive + SEPARATOR + member
+
+
+def get_member_name(name: str) -> str:
+    l_name = name.replace('\\', '/')
+    while l_name.startswith('./'):
+        l_name = l_name[2:]
+    # A tar made with "tar cf x.tar ." names its top entry '.'; it is the archive itself.
+    return '' if l_name == '.' else l_name.strip('/')
+
+
+def read_zip(path: str) -> tuple:
+    # Only the end record and the central directory are read: a few kilobytes whatever the archive size.
+    l_members: list = []
+    with zipfile.ZipFile(path) as z:
+        for i in z.infolist():
+            l_method = METHOD_ENCRYPTED if i.flag_bits & 0x1 else i.compress_type
+            l_members.append(Member(
+                get_member_name(i.filename), i.is_dir(), i.file_size, calendar.timegm(i.date_time + (0, 0, 0)),
+                i.header_offset, l_method, i.compress_size,
+            ))
+    return FORMAT_ZIP, l_members
+
+
+def read_tar(path: str) -> tuple:
+    # tarfile seeks over member data, so only the 512-byte headers are read.
+    l_members: list = []
+    with tarfile.open(path, 'r:') as t:
+        for i in t:
+            if i.isdir() or i.isreg():
+                l_members.append(Member(
+                    get_member_name(i.name), i.isdir(), i.size, float(i.mtime), i.offset_data, zipfile.ZIP_STORED,
+                    i.size,
+                ))
+    return FORMAT_TAR, l_members
+
+
+def get_cache_path(path: str) -> str:
+    return os.path.join(ARCHIVE_CACHE_DIRECTORY, hashlib.sha1(path.encode('utf-8', 'surrogateescape')).hexdigest() + '.json')
+
+
+def load(path: str, st: os.stat_result) -> MemberTable | None:
+    try:
+        with open(get_cache_path(path)) as f:
+            l_data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (l_data.get('mtime_ns'), l_data.get('size')) != (st.st_mtime_ns, st.st_size):
+        return None
+    return MemberTable(path, st.st_mtime_ns, st.st_size, l_data['format'], [Member(*m) for m in l_data['members']])
+
+
+def save(table: MemberTable) -> None:
+    l_destination = get_cache_path(table.f_path)
+    os.makedirs(os.path.dirname(l_destination), exist_ok=True)
+    l_fd, l_temp = tempfile.mkstemp(dir=os.path.dirname(l_destination), suffix='.part')
+    try:
+        with os.fdopen(l_fd, 'w') as dest:
+            json.dump({
+                'mtime_ns': table.f_mtime_ns, 'size': table.f_size, 'format': table.f_format,
+                'members': [list(m) for m in table.members],
+            }, dest, separators=(',', ':'))
+        os.replace(l_temp, l_destination)
+    except BaseException:
+        os.remove(l_temp)
+        raise
+    return
+
+
+def build(path: str, st: os.stat_result) -> MemberTable:
+    if zipfile.is_zipfile(path):
+        l_format, l_members = read_zip(path)
+    else:
+        try:
+            l_format, l_members = read_tar(path)
+        except tarfile.TarError as e:
+            raise ValueError(f'not a zip or uncompressed tar archive: {path}') from e
+    l_table = MemberTable(path, st.st_mtime_ns, st.st_size, l_format, l_members)
+    try:
+        save(l_table)
+    except OSError:
+        # The table still serves this process; only the next process has to read the archive again.
+        pass
+    return l_table
+
+
+tables: OrderedDict = OrderedDict()
+
+lock = threading.Lock()
+
+
+def get_table(path: str) -> MemberTable:
+    l_st = os.stat(path)
+    with lock:
+        l_table = tables.get(path)
+        if l_table is not None and l_table.is_current(l_st):
+            tables.move_to_end(path)
+            return l_table
+    l_table = load(path, l_st) or build(path, l_st)
+    with lock:
+        tables[path] = l_table
+        while MAX_OPEN_ARCHIVES < len(tables):
+            tables.popitem(last=False)
+    return l_table
+
+
+def list_members(path: str, directory: str) -> list:
+    return get_table(path).list(directory)
+
+
+def get_member(path: str, name: str) -> Member:
+    return get_table(path).get(name)
+
+
+class SliceReader(io.RawIOBase):
+
+    # A window onto the archive file: the member's bytes, read in place.
+    def __init__(self, path: str, offset: int, size: int) -> None:
+        self.f_file: IO[bytes] = open(path, 'rb')
+        self.f_offset: int = offset
+        self.f_size: int = size
+        self.f_position: int = 0
+        return
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.f_position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.f_position
+        elif whence == io.SEEK_END:
+            offset += self.f_size
+        self.f_position = max(0, min(offset, self.f_size))
+        return self.f_position
+
+    def readinto(self, buffer) -> int:
+        l_length = min(len(buffer), self.f_size - self.f_position)
+        if l_length <= 0:
+            return 0
+        l_data = os.pread(self.f_file.fileno(), l_length, self.f_offset + self.f_position)
+        buffer[:len(l_data)] = l_data
+        self.f_position += len(l_data)
+        return len(l_data)
+
+    def close(self) -> None:
+        self.f_file.close()
+        super().close()
+        return
+
+
+class InflateReader(io.RawIOBase):
+
+    # A deflated zip member, inflated while it is read; only one read block is held at a time.
+    def __init__(self, path: str, offset: int, compressed_size: int) -> None:
+        self.f_source: SliceReader = SliceReader(path, offset, compressed_size)
+        self.f_inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+        self.f_pending: bytes = b''
+        return
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.f_pending and not self.f_inflater.eof:
+            l_data = self.f_source.read(READ_SIZE)
+            if not l_data:
+                self.f_pending = self.f_inflater.flush()
+                break
+            self.f_pending = self.f_inflater.decompress(l_data)
+        l_length = min(len(buffer), len(self.f_pending))
+        buffer[:l_length] = self.f_pending[:l_length]
+        self.f_pending = self.f_pending[l_length:]
+        return l_length
+
+    def close(self) -> None:
+        self.f_source.close()
+        super().close()
+        return
+
+
+def get_data_offset(path: str, member: Member) -> int:
+    # The central directory points at the local header, whose name and extra field lengths may differ
+    # from the central copy; one small read finds where the data starts.
+    with open(path, 'rb') as f:
+        l_header = os.pread(f.fileno(), LOCAL_HEADER.size, member.offset)
+    if len(l_header) < LOCAL_HEADER.size:
+        raise ValueError(f'truncated archive: {path}')
+    l_fields = LOCAL_HEADER.unpack(l_header)
+    if l_fields[0] != b'PK\x03\x04':
+        raise ValueError(f'bad local header for {member.name} in {path}')
+    return member.offset + LOCAL_HEADER.size + l_fields[-2] + l_fields[-1]
+
+
+def open_member(path: str, name: str) -> IO[bytes]:
+    l_table = get_table(path)
+    l_member = l_table.get(name)
+    if l_member.is_dir:
+        raise IsADirectoryError(join(path, name))
+    if l_member.method == METHOD_ENCRYPTED:
+        raise PermissionError(f'encrypted member: {join(path, name)}')
+    if l_table.format == FORMAT_TAR:
+        return io.BufferedReader(SliceReader(path, l_member.offset, l_member.size), READ_SIZE)
+    if l_member.method == zipfile.ZIP_STORED:
+        return io.BufferedReader(SliceReader(path, get_data_offset(path, l_member), l_member.size), READ_SIZE)
+    if l_member.method == zipfile.ZIP_DEFLATED:
+        return io.BufferedReader(
+            InflateReader(path, get_data_offset(path, l_member), l_member.compressed_size), READ_SIZE
+        )
+    # bzip2 and lzma members are rare enough to go through zipfile, at the cost of reading the
+    # central directory once more.
+    l_zip = zipfile.ZipFile(path)
+    return l_zip.open(next(i for i in l_zip.infolist() if get_member_name(i.filename) == l_member.name))
+
+
+def invalidate(path: str) -> None:
+    with lock:
+        tables.pop(path, None)
+    try:
+        os.remove(get_cache_path(path))
+    except FileNotFoundError:
+        pass
+    return
@@ -0,0 +1,154 @@
+#
+# ZipStream.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import os
+import os.path
+import zipfile
+from typing import Iterator
+
+from com.yoclabo.filesystem.query.Query import is_upload_part
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 1024 * 1024
+
+# Deflating these costs CPU and saves next to nothing, so they are stored as they are.
+STORED_SUFFIXES = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp4', '.m4a', '.m4v', '.mov', '.mkv', '.webm', '.flv', '.wmv', '.mp3', '.aac', '.ogg', '.opus', '.flac',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar', '.jar', '.apk',
+    '.pdf', '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub',
+}
+
+
+class Sink:
+
+    # A write-only file object. zipfile finds no tell() or seek() on it, so it writes each entry's sizes
+    # in a data descriptor after the data instead of seeking back, and nothing has to be held but the
+    # bytes produced since the last drain.
+    def __init__(self) -> None:
+        self.f_chunks: list = []
+        return
+
+    def write(self, data: bytes) -> int:
+        self.f_chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        return
+
+    def drain(self) -> bytes:
+        l_data = b''.join(self.f_chunks)
+        self.f_chunks.clear()
+        return l_data
+
+
+def get_compress_type(name: str) -> int:
+    if os.path.splitext(name)[1].lower() in STORED_SUFFIXES:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def walk(path: str, arcname: str) -> Iterator[tuple]:
+    # Depth first, in name order. Symlinked directories are not entered, so a link loop cannot make
+    # the archive endless.
+    yield path, arcname
+    if not os.path.isdir(path) or os.path.islink(path):
+        return
+    try:
+        l_entries = sorted(os.scandir(path), key=lambda e: e.name)
+    except OSError:
+        logger.warning('zip: cannot list %s', path, exc_info=True)
+        return
+    for e in l_entries:
+        if not is_upload_part(e.name):
+            yield from walk(e.path, arcname + '/' + e.name)
+    return
+
+
+class IncompleteEntry(Exception):
+
+    # Raised when a file fails after its header is out. The member cannot be taken back, so the stream
+    # ends here rather than hand over an archive with a silently short file in it.
+    def __init__(self, path: str, written: int) -> None:
+        super().__init__(f'{path}: read failed after {written} bytes')
+        self.f_path: str = path
+        self.f_written: int = written
+        return
+
+    @property
+    def path(self) -> str:
+        return self.f_path
+
+    @property
+    def written(self) -> int:
+        return self.f_written
+
+
+def write_entry(archive: zipfile.ZipFile, sink: Sink, path: str, arcname: str) -> Iterator[bytes]:
+    l_info = zipfile.ZipInfo.from_file(path, arcname)
+    if l_info.is_dir():
+        archive.writestr(l_info, b'')
+        return
+    l_info.compress_type = get_compress_type(arcname)
+    with open(path, 'rb') as src:
+        # The first block is read before the header goes out, so a file that cannot be read at all is
+        # left out whole. zipfile switches to zip64 by itself from file_size; reading no more than that
+        # keeps a file that grows meanwhile from overrunning the header it was given.
+        l_data = src.read(min(READ_SIZE, l_info.file_size))
+        l_left = l_info.file_size
+        with archive.open(l_info, 'w') as dest:
+            while l_data:
+                dest.write(l_data)
+                l_left -= len(l_data)
+                yield sink.drain()
+                if l_left <= 0:
+                    break
+                try:
+                    l_data = src.read(min(READ_SIZE, l_left))
+                except OSError as e:
+                    raise IncompleteEntry(path, l_info.file_size - l_left) from e
+    return
+
+
+def iterate(sources: list) -> Iterator[bytes]:
+    # sources are (path, name in the archive) pairs; directories are added with everything below them.
+    return (c for c in generate(sources) if c)
+
+
+def generate(sources: list) -> Iterator[bytes]:
+    l_sink = Sink()
+    with zipfile.ZipFile(l_sink, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as l_archive:
+        for source, name in sources:
+            for path, arcname in walk(source, name):
+                try:
+                    yield from write_entry(l_archive, l_sink, path, arcname)
+                except OSError:
+                    # Once streaming has begun the status cannot change, so an unreadable file is left out.
+                    logger.warning('zip: skipped %s', path, exc_info=True)
+                except IncompleteEntry:
+                    # Nothing more is sent: without its central directory the archive fails to open, and the
+                    # connection drops mid-body, so the client sees a failed download instead of a bad file.
+                    logger.error('zip: aborted at %s', path, exc_info=True)
+                    raise
+                yield l_sink.drain()
+    # Closing wrote the central directory.
+    yield l_sink.drain()
+    return
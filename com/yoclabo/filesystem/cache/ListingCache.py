@@ -0,0 +1,286 @@
+#
+# ListingCache.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import environ
+
+from browser.settings import BASE_DIR
+
+env = environ.Env()
+env.read_env('.env')
+
+logger = logging.getLogger(__name__)
+
+# Shared by every process serving the share: each invalidation is appended to it, and each process
+# replays what the others appended before it answers from its own cache.
+LISTING_INVALIDATION_LOG: str = env.str(
+    'LISTING_INVALIDATION_LOG', default=os.path.join(BASE_DIR, 'cache', 'listing.invalidations')
+)
+
+# Past this size the log is started over; every process then drops its whole cache once.
+LISTING_INVALIDATION_LOG_MAX_BYTES = 1024 * 1024
+
+
+class Listing:
+
+    def __init__(self, path: str, mtime_ns: int, entries: list) -> None:
+        self.f_path: str = path
+        self.f_mtime_ns: int = mtime_ns
+        self.f_entries: list = entries
+        self.f_cached_at: float = time.monotonic()
+        self.f_memo: dict = {}
+        self.f_size: int = len(entries)
+        self.f_owner: ListingCache | None = None
+        return
+
+    @property
+    def path(self) -> str:
+        return self.f_path
+
+    @property
+    def mtime_ns(self) -> int:
+        return self.f_mtime_ns
+
+    @property
+    def entries(self) -> list:
+        return self.f_entries
+
+    @property
+    def cached_at(self) -> float:
+        return self.f_cached_at
+
+    @property
+    def size(self) -> int:
+        return self.f_size
+
+    def memo(self, key: tuple, builder: Callable[[], list]) -> list:
+        # Sort keys and sorted orders derived from the entries live and die with the listing,
+        # and are charged to the cache budget like the entries themselves.
+        l_value = self.f_memo.get(key)
+        if l_value is None:
+            l_value = builder()
+            self.f_memo[key] = l_value
+            if self.f_owner is None:
+                self.f_size += len(l_value)
+            else:
+                self.f_owner.charge(self, len(l_value))
+        return l_value
+
+
+class ListingCache:
+
+    # Per-process LRU of directory listings. The budget counts records, not bytes: the entries of
+    # each listing plus every sort key and sorted order memoised on it, one reference each.
+    def __init__(self, max_entries: int, ttl_seconds: float, check_mtime: bool, log_path: str | None = None) -> None:
+        self.f_lock: threading.Lock = threading.Lock()
+        self.f_listings: OrderedDict = OrderedDict()
+        self.f_max_entries: int = max_entries
+        self.f_ttl_seconds: float = ttl_seconds
+        self.f_check_mtime: bool = check_mtime
+        self.f_size: int = 0
+        self.f_hits: int = 0
+        self.f_misses: int = 0
+        self.f_evictions: int = 0
+        self.f_invalidations: int = 0
+        self.f_log_path: str | None = log_path
+        self.f_log_lock: threading.Lock = threading.Lock()
+        self.f_log_inode: int | None = None
+        self.f_log_offset: int = 0
+        return
+
+    def is_fresh(self, listing: Listing, mtime_ns: int) -> bool:
+        if 0 < self.f_ttl_seconds < time.monotonic() - listing.cached_at:
+            return False
+        if self.f_check_mtime and listing.mtime_ns != mtime_ns:
+            return False
+        return True
+
+    def get(self, path: str, loader: Callable[[str], list]) -> Listing:
+        l_key: str = os.path.normpath(path)
+        self.replay()
+        # The mtime is taken before loading, so a change made while scanning is caught on the next access.
+        l_mtime_ns: int = os.stat(l_key).st_mtime_ns if self.f_check_mtime else 0
+        with self.f_lock:
+            l_listing: Listing = self.f_listings.get(l_key)
+            if l_listing is not None and self.is_fresh(l_listing, l_mtime_ns):
+                self.f_listings.move_to_end(l_key)
+                self.f_hits += 1
+                return l_listing
+            self.f_misses += 1
+        l_listing = Listing(l_key, l_mtime_ns, loader(l_key))
+        self.put(l_listing)
+        return l_listing
+
+    def put(self, listing: Listing) -> None:
+        if self.f_max_entries < len(listing.entries):
+            return
+        with self.f_lock:
+            self.discard(listing.path)
+            self.f_listings[listing.path] = listing
+            listing.f_owner = self
+            self.f_size += listing.size
+            self.evict()
+        return
+
+    def charge(self, listing: Listing, size: int) -> None:
+        with self.f_lock:
+            listing.f_size += size
+            if self.f_listings.get(listing.path) is not listing:
+                return
+            self.f_size += size
+            self.evict()
+        return
+
+    def evict(self) -> None:
+        while self.f_max_entries < self.f_size:
+            _, l_evicted = self.f_listings.popitem(last=False)
+            self.f_size -= l_evicted.size
+            l_evicted.f_owner = None
+            self.f_evictions += 1
+        return
+
+    def discard(self, key: str) -> bool:
+        l_listing: Listing = self.f_listings.pop(key, None)
+        if l_listing is None:
+            return False
+        self.f_size -= l_listing.size
+        l_listing.f_owner = None
+        return True
+
+    def invalidate(self, path: str) -> None:
+        with self.f_lock:
+            if self.discard(os.path.normpath(path)):
+                self.f_invalidations += 1
+        return
+
+    def publish(self, paths: list) -> None:
+        # Other processes see the invalidation on their next lookup; this one drops the listings at once.
+        for p in paths:
+            self.invalidate(p)
+        if self.f_log_path is None:
+            return
+        l_data = b''.join(os.fsencode(os.path.normpath(p)) + b'\0' for p in paths)
+        try:
+            os.makedirs(os.path.dirname(self.f_log_path), exist_ok=True)
+            while True:
+                l_fd = os.open(self.f_log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+                try:
+                    l_st = os.fstat(l_fd)
+                    if LISTING_INVALIDATION_LOG_MAX_BYTES < l_st.st_size:
+                        self.start_log()
+                        continue
+                    os.write(l_fd, l_data)
+                finally:
+                    os.close(l_fd)
+                # A write that landed in a log started over meanwhile is lost to readers; it is repeated.
+                if os.stat(self.f_log_path).st_ino == l_st.st_ino:
+                    break
+        except OSError:
+            logger.warning('cannot publish listing invalidations to %s', self.f_log_path, exc_info=True)
+        return
+
+    def start_log(self) -> None:
+        l_temp = f'{self.f_log_path}.{os.getpid()}.part'
+        with open(l_temp, 'wb'):
+            pass
+        os.replace(l_temp, self.f_log_path)
+        return
+
+    def replay(self) -> None:
+        # One stat of the log per lookup; the records appended since the last one are read and applied.
+        if self.f_log_path is None:
+            return
+        try:
+            l_st = os.stat(self.f_log_path)
+        except FileNotFoundError:
+            with self.f_log_lock:
+                # Nothing published yet: once the log appears it is read from its start.
+                self.f_log_inode, self.f_log_offset = 0, 0
+            return
+        with self.f_log_lock:
+            if l_st.st_ino == self.f_log_inode and l_st.st_size == self.f_log_offset:
+                return
+            if self.f_log_inode is None:
+                # The first lookup of this process: nothing is cached yet that the log could invalidate.
+                self.f_log_inode, self.f_log_offset = l_st.st_ino, l_st.st_size
+                return
+            if l_st.st_ino != self.f_log_inode or l_st.st_size < self.f_log_offset:
+                # The log was started over, so whatever was appended to the old one since the last
+                # lookup is unknown.
+                if self.f_log_inode != 0:
+                    self.clear()
+                self.f_log_inode, self.f_log_offset = l_st.st_ino, 0
+            try:
+                with open(self.f_log_path, 'rb') as f:
+                    f.seek(self.f_log_offset)
+                    l_data = f.read(l_st.st_size - self.f_log_offset)
+            except OSError:
+                return
+            # A record still being appended is picked up whole next time.
+            l_end = l_data.rfind(b'\0') + 1
+            self.f_log_offset += l_end
+            l_paths = [os.fsdecode(p) for p in l_data[:l_end].split(b'\0')[:-1]]
+        for p in l_paths:
+            self.invalidate(p)
+        return
+
+    def clear(self) -> None:
+        with self.f_lock:
+            self.f_listings.clear()
+            self.f_size = 0
+        return
+
+    def statistics(self) -> dict:
+        with self.f_lock:
+            return {
+                'directories': len(self.f_listings),
+                'entries': self.f_size,
+                'max_entries': self.f_max_entries,
+                'hits': self.f_hits,
+                'misses': self.f_misses,
+                'evictions': self.f_evictions,
+                'invalidations': self.f_invalidations,
+            }
+
+
+cache = ListingCache(
+    env.int('LISTING_CACHE_MAX_ENTRIES', default=200000),
+    env.float('LISTING_CACHE_TTL_SECONDS', default=0),
+    env.bool('LISTING_CACHE_CHECK_MTIME', default=True),
+    LISTING_INVALIDATION_LOG,
+)
+
+
+def get_listing(path: str, loader: Callable[[str], list]) -> Listing:
+    return cache.get(path, loader)
+
+
+def invalidate(*paths: str) -> None:
+    cache.publish(list(paths))
+    return
+
+
+def statistics() -> dict:
+    return cache.statistics()
@@ -0,0 +1,227 @@
+#
+# Content.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import environ
+from django.db import connection, transaction
+from django.db.models import Q
+
+from com.yoclabo.filesystem.query.Query import ITEM_TYPE_PDF, ITEM_TYPE_TEXT, Entry
+from filesystem.models import ContentDocument, Node
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+env = environ.Env()
+env.read_env('.env')
+
+CONTENT_INDEX_MAX_BYTES: int = env.int('CONTENT_INDEX_MAX_BYTES', default=1024 * 1024)
+
+# Upper bound on pages read from one PDF; the byte budget usually stops extraction earlier.
+CONTENT_INDEX_MAX_PDF_PAGES: int = env.int('CONTENT_INDEX_MAX_PDF_PAGES', default=200)
+
+# With the metadata index enabled, the filesystem watcher also re-extracts the files it reports
+# changed, so the content index stays current between runs of index_contents.
+CONTENT_INDEX_WATCH: bool = env.bool('CONTENT_INDEX_WATCH', default=False)
+
+TEXT_ENCODINGS = ('utf-8', 'cp932', 'euc-jp')
+
+BATCH_SIZE = 200
+
+SNIPPET_OPEN = '\x02'
+
+SNIPPET_CLOSE = '\x03'
+
+LATENCY_SAMPLES = 1000
+
+
+def decode(data: bytes) -> str:
+    for encoding in TEXT_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def extract_text(path: str) -> str:
+    with open(path, 'rb') as f:
+        l_data = f.read(CONTENT_INDEX_MAX_BYTES)
+    # The budget may cut a multibyte character in half; dropping the incomplete tail keeps utf-8 decodable.
+    for i in range(4):
+        try:
+            return l_data[:len(l_data) - i].decode('utf-8')
+        except UnicodeDecodeError:
+            continue
+    return decode(l_data)
+
+
+def extract_pdf(path: str) -> str:
+    if shutil.which('pdftotext') is not None:
+        with subprocess.Popen(
+                ['pdftotext', '-q', '-l', str(CONTENT_INDEX_MAX_PDF_PAGES), '-enc', 'UTF-8', path, '-'],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        ) as process:
+            l_data = process.stdout.read(CONTENT_INDEX_MAX_BYTES)
+            process.kill()
+        return l_data.decode('utf-8', errors='ignore')
+    if pypdf is not None:
+        l_parts: list = []
+        l_length = 0
+        for page in pypdf.PdfReader(path).pages[:CONTENT_INDEX_MAX_PDF_PAGES]:
+            l_text = page.extract_text() or ''
+            l_parts.append(l_text)
+            l_length += len(l_text.encode())
+            if CONTENT_INDEX_MAX_BYTES <= l_length:
+                break
+        return '\n'.join(l_parts)[:CONTENT_INDEX_MAX_BYTES]
+    return ''
+
+
+def extract(task: tuple) -> tuple:
+    # Runs in a worker process; failures are returned rather than raised so one bad file does not stop the batch.
+    l_path, l_type = task
+    try:
+        if l_type == ITEM_TYPE_PDF:
+            return l_path, extract_pdf(l_path)
+        return l_path, extract_text(l_path)
+    except Exception:
+        return l_path, None
+
+
+def is_watched() -> bool:
+    return CONTENT_INDEX_WATCH
+
+
+def get_candidates(under: Q = Q()) -> list:
+    l_indexed = {p: (m, s) for p, m, s in ContentDocument.objects.filter(under).values_list('path', 'mtime', 'size')}
+    l_candidates: list = []
+    l_nodes = Node.objects.filter(under, type__in=[ITEM_TYPE_TEXT, ITEM_TYPE_PDF])
+    for n in l_nodes.values_list('path', 'type', 'mtime', 'size'):
+        if l_indexed.get(n[0]) != (n[2], n[3]):
+            l_candidates.append(n)
+    return l_candidates
+
+
+def store(node: tuple, body: str) -> None:
+    l_path, _, l_mtime, l_size = node
+    with transaction.atomic():
+        l_document, _ = ContentDocument.objects.update_or_create(path=l_path, defaults={'mtime': l_mtime, 'size': l_size})
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM filesystem_content_text WHERE rowid = %s', [l_document.id])
+            cursor.execute('INSERT INTO filesystem_content_text(rowid, body) VALUES (%s, %s)', [l_document.id, body])
+    return
+
+
+def refresh(workers: int) -> dict:
+    # Works from the metadata index: only files whose mtime or size differ from the last extraction are read.
+    l_statistics = {'indexed': 0, 'failed': 0, 'removed': 0}
+    l_removed = ContentDocument.objects.exclude(path__in=Node.objects.values('path'))
+    l_statistics['removed'], _ = l_removed.delete()
+    l_candidates = get_candidates()
+    l_nodes = {n[0]: n for n in l_candidates}
+    with ProcessPoolExecutor(workers) as executor:
+        for l_path, l_body in executor.map(extract, [(n[0], n[1]) for n in l_candidates], chunksize=8):
+            if l_body is None:
+                l_statistics['failed'] += 1
+                continue
+            store(l_nodes[l_path], l_body)
+            l_statistics['indexed'] += 1
+    return l_statistics
+
+
+def update(directories: list) -> dict:
+    # The watcher's pass: only the subtrees of the changed directories are compared, and the few
+    # files found stale are extracted in this process rather than in a pool.
+    l_statistics = {'indexed': 0, 'failed': 0, 'removed': 0}
+    l_under = Q()
+    for d in directories:
+        l_under |= Q(path__startswith=os.path.join(d, ''))
+    if not l_under:
+        return l_statistics
+    l_removed = ContentDocument.objects.filter(l_under).exclude(path__in=Node.objects.filter(l_under).values('path'))
+    l_statistics['removed'], _ = l_removed.delete()
+    for n in get_candidates(l_under):
+        _, l_body = extract((n[0], n[1]))
+        if l_body is None:
+            l_statistics['failed'] += 1
+            continue
+        store(n, l_body)
+        l_statistics['indexed'] += 1
+    return l_statistics
+
+
+class Match:
+
+    def __init__(self, entry: Entry, snippet: str) -> None:
+        self.f_entry: Entry = entry
+        self.f_snippet: str = snippet
+        return
+
+    @property
+    def entry(self) -> Entry:
+        return self.f_entry
+
+    @property
+    def snippet(self) -> str:
+        return self.f_snippet
+
+
+latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+
+latencies_lock: threading.Lock = threading.Lock()
+
+
+def search(query: str, offset: int, limit: int) -> list:
+    l_start = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT f.path, f.name, f.type, f.size, f.mtime, '
+            'snippet(filesystem_content_text, 0, %s, %s, %s, 24) '
+            'FROM filesystem_content_text t JOIN filesystem_contentdocument d ON d.id = t.rowid '
+            'JOIN filesystem_node f ON f.path = d.path '
+            'WHERE filesystem_content_text MATCH %s ORDER BY rank LIMIT %s OFFSET %s',
+            [SNIPPET_OPEN, SNIPPET_CLOSE, '…', '"' + query.replace('"', '""') + '"', limit, offset]
+        )
+        l_matches = [Match(Entry(*r[:5]), r[5]) for r in cursor.fetchall()]
+    with latencies_lock:
+        latencies.append(time.perf_counter() - l_start)
+    return l_matches
+
+
+def statistics() -> dict:
+    with latencies_lock:
+        l_sorted = sorted(latencies)
+    if not l_sorted:
+        return {'queries': 0}
+    return {
+        'queries': len(l_sorted),
+        'p50_ms': round(l_sorted[len(l_sorted) // 2] * 1000, 2),
+        'p99_ms': round(l_sorted[min(len(l_sorted) - 1, len(l_sorted) * 99 // 100)] * 1000, 2),
+    }
+
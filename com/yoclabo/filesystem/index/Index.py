@@ -0,0 +1,263 @@
+#
+# Index.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import os.path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import environ
+from django.db import transaction
+from django.db.models import F, Max, Sum, Value
+from django.db.models.functions import Greatest
+
+from com.yoclabo.filesystem.query.Query import (
+    ITEM_TYPE_DIRECTORY, SORT_MTIME, SORT_NAME, SORT_SIZE, SORT_TYPE, Entry, get_sort_name, scan_children
+)
+from com.yoclabo.setting.Server import get_root_directory_path
+from filesystem.models import Node
+
+env = environ.Env()
+env.read_env('.env')
+
+METADATA_INDEX: bool = env.bool('METADATA_INDEX', default=False)
+
+KIND_DIRECTORY = 'directory'
+
+KIND_FILE = 'file'
+
+BATCH_SIZE = 2000
+
+SORT_FIELDS = {SORT_NAME: [], SORT_SIZE: ['size'], SORT_MTIME: ['mtime'], SORT_TYPE: ['type']}
+
+
+def is_enabled() -> bool:
+    return METADATA_INDEX
+
+
+def to_entry(node: Node) -> Entry:
+    return Entry(node.path, node.name, node.type, node.size, node.mtime, node.file_count, node.newest_mtime)
+
+
+def to_node(entry: Entry, parent: str) -> Node:
+    return Node(
+        path=entry.id, parent=parent, name=entry.name, sort_name=get_sort_name(entry.name),
+        kind=KIND_DIRECTORY if entry.type == ITEM_TYPE_DIRECTORY else KIND_FILE,
+        type=entry.type, size=entry.size, mtime=entry.mtime,
+        file_count=0 if entry.type == ITEM_TYPE_DIRECTORY else 1, newest_mtime=entry.mtime,
+    )
+
+
+def is_fresh(path: str) -> bool:
+    # One stat of the directory itself and one indexed lookup; the children are not touched.
+    l_path = os.path.normpath(path)
+    l_scanned = Node.objects.filter(path=l_path).values_list('scanned_mtime_ns', flat=True).first()
+    if l_scanned is None:
+        return False
+    try:
+        return os.stat(l_path).st_mtime_ns == l_scanned
+    except OSError:
+        return False
+
+
+def filter_children(path: str, show_hidden: bool):
+    l_nodes = Node.objects.filter(parent=os.path.normpath(path))
+    if not show_hidden:
+        l_nodes = l_nodes.exclude(name__startswith='.')
+    return l_nodes
+
+
+def get_ordering(sort: str, descending: bool) -> list:
+    # Same order as Query.sort_entries: directories first, then the sort column with the
+    # natural-order name as the tie breaker, all reversed together inside each kind.
+    l_fields = SORT_FIELDS.get(sort, []) + ['sort_name', 'name']
+    return ['kind'] + ['-' + f if descending else f for f in l_fields]
+
+
+def count_children(path: str, show_hidden: bool = True) -> int:
+    return filter_children(path, show_hidden).count()
+
+
+def query_children(path: str, start: int, end: int, sort: str = SORT_NAME, descending: bool = False,
+                   show_hidden: bool = True) -> list:
+    l_nodes = filter_children(path, show_hidden).order_by(*get_ordering(sort, descending))[start:end]
+    return [to_entry(n) for n in l_nodes]
+
+
+def query_children_after(path: str, after: tuple | None, limit: int) -> list:
+    # Keyset pagination on the (parent, kind, sort_name) index: the cost does not grow with the position.
+    l_nodes = Node.objects.filter(parent=os.path.normpath(path))
+    if after is not None:
+        l_kind, l_sort_name, l_name = after
+        l_nodes = l_nodes.filter(kind__gte=l_kind).exclude(kind=l_kind, sort_name__lt=l_sort_name).exclude(
+            kind=l_kind, sort_name=l_sort_name, name__lte=l_name
+        )
+    return [to_entry(n) for n in l_nodes.order_by(*get_ordering(SORT_NAME, False))[:limit]]
+
+
+def get_key(entry: Entry) -> tuple:
+    return KIND_DIRECTORY if entry.type == ITEM_TYPE_DIRECTORY else KIND_FILE, get_sort_name(entry.name), entry.name
+
+
+def scan(path: str) -> tuple:
+    l_mtime_ns = os.stat(path).st_mtime_ns
+    return l_mtime_ns, scan_children(path)
+
+
+def store(path: str, mtime_ns: int, entries: list) -> list:
+    l_removed = set(Node.objects.filter(parent=path, kind=KIND_DIRECTORY).values_list('path', flat=True))
+    l_removed -= {e.id for e in entries if e.type == ITEM_TYPE_DIRECTORY}
+    with transaction.atomic():
+        for r in l_removed:
+            delete_subtree(r)
+        # Subdirectory rows carry their own scan state and subtree totals, so those are kept
+        # across the replacement.
+        l_kept = {
+            n[0]: n[1:] for n in Node.objects.filter(parent=path, kind=KIND_DIRECTORY).values_list(
+                'path', 'scanned_mtime_ns', 'size', 'file_count', 'newest_mtime'
+            )
+        }
+        Node.objects.filter(parent=path).delete()
+        l_nodes = [to_node(e, path) for e in entries]
+        for n in l_nodes:
+            if n.path in l_kept:
+                n.scanned_mtime_ns, n.size, n.file_count, n.newest_mtime = l_kept[n.path]
+        Node.objects.bulk_create(l_nodes, batch_size=BATCH_SIZE)
+        Node.objects.filter(path=path).update(scanned_mtime_ns=mtime_ns)
+    return [e.id for e in entries if e.type == ITEM_TYPE_DIRECTORY]
+
+
+def rollup(paths: set) -> None:
+    # Recomputes the totals of the changed directories and of every directory above them, deepest
+    # first, each from its direct children only: one aggregate on the parent index per level, so a
+    # change costs the depth of the tree rather than its size.
+    l_root = os.path.normpath(get_root_directory_path())
+    l_directories: set = set()
+    for p in paths:
+        l_path = os.path.normpath(p)
+        while l_path not in l_directories:
+            l_directories.add(l_path)
+            if l_path == l_root or os.path.dirname(l_path) == l_path:
+                break
+            l_path = os.path.dirname(l_path)
+    with transaction.atomic():
+        for d in sorted(l_directories, key=lambda p: p.count(os.sep), reverse=True):
+            l_totals = Node.objects.filter(parent=d).aggregate(
+                size=Sum('size'), files=Sum('file_count'), newest=Max('newest_mtime')
+            )
+            Node.objects.filter(path=d, kind=KIND_DIRECTORY).update(
+                size=l_totals['size'] or 0, file_count=l_totals['files'] or 0,
+                newest_mtime=Greatest(F('mtime'), Value(l_totals['newest'] or 0.0)),
+            )
+    return
+
+
+def get_totals(path: str) -> Entry | None:
+    l_node = Node.objects.filter(path=os.path.normpath(path), kind=KIND_DIRECTORY).first()
+    return None if l_node is None else to_entry(l_node)
+
+
+def query_largest(path: str, limit: int) -> list:
+    # The largest directories anywhere below path, biggest first; nested ones are listed too, so a
+    # parent and the child that makes it large both show up.
+    l_path = os.path.normpath(path)
+    l_nodes = Node.objects.filter(
+        kind=KIND_DIRECTORY, path__gte=l_path + os.sep, path__lt=l_path + chr(ord(os.sep) + 1)
+    ).order_by('-size', 'path')[:limit]
+    return [to_entry(n) for n in l_nodes]
+
+
+def delete_subtree(path: str) -> None:
+    # A range on the unique path index rather than startswith, which SQLite matches case-insensitively.
+    Node.objects.filter(path__gte=path + os.sep, path__lt=path + chr(ord(os.sep) + 1)).delete()
+    return
+
+
+def ensure_root(path: str) -> None:
+    if Node.objects.filter(path=path).exists():
+        return
+    l_st = os.stat(path)
+    Node.objects.create(
+        path=path, parent=os.path.dirname(path), name=os.path.basename(path),
+        sort_name=get_sort_name(os.path.basename(path)), kind=KIND_DIRECTORY, type=ITEM_TYPE_DIRECTORY, mtime=l_st.st_mtime,
+    )
+    return
+
+
+def refresh(path: str, workers: int) -> dict:
+    # Directory reads run on a thread pool (they are round trips to the share, not CPU work);
+    # all database writes stay on the calling thread, since SQLite has a single writer.
+    l_root = os.path.normpath(path)
+    ensure_root(l_root)
+    l_statistics = {'directories': 0, 'scanned': 0, 'unchanged': 0, 'failed': 0}
+    l_pending: list = [l_root]
+    l_in_flight: dict = {}
+    l_stored: set = set()
+    with ThreadPoolExecutor(workers) as executor:
+        while l_pending or l_in_flight:
+            while l_pending and len(l_in_flight) < workers * 4:
+                l_directory = l_pending.pop()
+                l_in_flight[executor.submit(os.stat, l_directory)] = ('stat', l_directory)
+            l_done, _ = wait(l_in_flight, return_when=FIRST_COMPLETED)
+            for f in l_done:
+                l_step, l_directory = l_in_flight.pop(f)
+                if f.exception() is not None:
+                    l_statistics['failed'] += 1
+                    continue
+                if l_step == 'stat':
+                    l_statistics['directories'] += 1
+                    l_scanned = Node.objects.filter(path=l_directory).values_list('scanned_mtime_ns', flat=True).first()
+                    if l_scanned == f.result().st_mtime_ns:
+                        # Unchanged directory: its entries are still right, but subdirectories are checked on their own.
+                        l_statistics['unchanged'] += 1
+                        l_pending.extend(
+                            Node.objects.filter(parent=l_directory, kind=KIND_DIRECTORY).values_list('path', flat=True)
+                        )
+                        continue
+                    l_in_flight[executor.submit(scan, l_directory)] = ('scan', l_directory)
+                    continue
+                l_mtime_ns, l_entries = f.result()
+                l_statistics['scanned'] += 1
+                l_pending.extend(store(l_directory, l_mtime_ns, l_entries))
+                l_stored.add(l_directory)
+    # Totals are rolled up once at the end, so a directory shared by many changed ones is summed once.
+    if l_stored:
+        rollup(l_stored)
+    return l_statistics
+
+
+def update(path: str) -> None:
+    # Re-reads one directory after a change notification. Subdirectories that are new to the index
+    # are crawled whole; known ones keep their rows until they are reported themselves.
+    l_path = os.path.normpath(path)
+    if not Node.objects.filter(path=l_path).exists():
+        return
+    if not os.path.isdir(l_path):
+        delete_subtree(l_path)
+        Node.objects.filter(path=l_path).delete()
+        rollup({os.path.dirname(l_path)})
+        return
+    l_known = set(
+        Node.objects.filter(parent=l_path, kind=KIND_DIRECTORY, scanned_mtime_ns__isnull=False)
+        .values_list('path', flat=True)
+    )
+    for d in store(l_path, *scan(l_path)):
+        if d not in l_known:
+            refresh(d, 4)
+    rollup({l_path})
+    return
@@ -0,0 +1,80 @@
+#
+# Search.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from django.db import connection
+
+from com.yoclabo.filesystem.query.Query import Entry
+
+MODE_SUBSTRING = 'substring'
+
+MODE_PREFIX = 'prefix'
+
+MODE_GLOB = 'glob'
+
+# The trigram tokenizer can only use its index for patterns with at least three literal characters.
+TRIGRAM_LENGTH = 3
+
+
+def escape_like(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def get_match(query: str, mode: str) -> tuple:
+    if mode == MODE_GLOB:
+        return 'n.name GLOB %s', [query]
+    if TRIGRAM_LENGTH <= len(query):
+        # A quoted phrase of trigrams is a case-insensitive substring match served by the index;
+        # anchored with ^ to the first token of the name, it is a prefix match served the same way.
+        l_phrase = '"' + query.replace('"', '""') + '"'
+        return 'n.filesystem_node_name MATCH %s', ['^' + l_phrase if mode == MODE_PREFIX else l_phrase]
+    if mode == MODE_PREFIX:
+        return "n.name LIKE %s ESCAPE '\\'", [escape_like(query) + '%']
+    return "n.name LIKE %s ESCAPE '\\'", ['%' + escape_like(query) + '%']
+
+
+def search(query: str, mode: str, types: list, min_size: int | None, max_size: int | None,
+           modified_after: float | None, modified_before: float | None, offset: int, limit: int) -> list:
+    # Answered from the index alone. Exact names rank first, then prefixes, then shorter names.
+    l_match, l_params = get_match(query, mode)
+    l_where: list = [l_match]
+    if types:
+        l_where.append('f.type IN (' + ', '.join(['%s'] * len(types)) + ')')
+        l_params += types
+    if min_size is not None:
+        l_where.append('f.size >= %s')
+        l_params.append(min_size)
+    if max_size is not None:
+        l_where.append('f.size <= %s')
+        l_params.append(max_size)
+    if modified_after is not None:
+        l_where.append('f.mtime >= %s')
+        l_params.append(modified_after)
+    if modified_before is not None:
+        l_where.append('f.mtime <= %s')
+        l_params.append(modified_before)
+    l_sql = (
+        'SELECT f.path, f.name, f.type, f.size, f.mtime FROM filesystem_node_name n '
+        'JOIN filesystem_node f ON f.id = n.rowid WHERE ' + ' AND '.join(l_where) + ' '
+        "ORDER BY CASE WHEN lower(f.name) = lower(%s) THEN 0 WHEN lower(f.name) LIKE lower(%s) ESCAPE '\\' "
+        'THEN 1 ELSE 2 END, length(f.name), f.name LIMIT %s OFFSET %s'
+    )
+    l_params += [query, escape_like(query) + '%', limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(l_sql, l_params)
+        return [Entry(*r) for r in cursor.fetchall()]
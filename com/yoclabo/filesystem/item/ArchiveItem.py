@@ -0,0 +1,111 @@
+#
+# ArchiveItem.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os.path
+from typing import IO
+
+from com.yoclabo.filesystem.archive import Archive
+from com.yoclabo.filesystem.item.Item import Item, Directory, File, Children
+from com.yoclabo.filesystem.query.Query import (
+    ITEM_TYPE_DIRECTORY, ITEM_TYPE_ARCHIVE, ITEM_TYPE_OTHER, Entry, get_type_by_name, get_sort_name, sort_entries,
+    query_ancestors
+)
+from com.yoclabo.filesystem.thumbnail import Thumbnail
+
+
+class ArchiveDirectory(Directory):
+
+    # A zip or tar archive, or a directory inside one, browsed like a folder. The listing comes from
+    # the archive's cached member table; nothing is extracted.
+    def __init__(self, id: str, name: str, sequence: int, size: int = 0, mtime: float = 0.0) -> None:
+        super().__init__(id, name, sequence, size, mtime)
+        l_archive, l_member = Archive.split(self.f_id)
+        self.f_archive: str = l_archive
+        self.f_member: str = l_member or ''
+        if l_member is None:
+            self.f_type = ITEM_TYPE_ARCHIVE
+        return
+
+    @property
+    def is_archive(self) -> bool:
+        return True
+
+    def fill_ancestors(self) -> None:
+        for a in query_ancestors(os.path.dirname(self.f_archive), ITEM_TYPE_DIRECTORY):
+            self.f_ancestors.append(Item(a['id'], a['type'], a['name'], 0))
+        self.f_ancestors.append(Item(self.f_archive, ITEM_TYPE_ARCHIVE, os.path.basename(self.f_archive), 0))
+        l_parts = self.f_member.split('/') if self.f_member else []
+        for i in range(len(l_parts)):
+            l_id = Archive.join(self.f_archive, '/'.join(l_parts[:i + 1]))
+            self.f_ancestors.append(Item(l_id, ITEM_TYPE_DIRECTORY, l_parts[i], 0))
+        return
+
+    def cache_children_info(self) -> None:
+        l_entries: list = []
+        for m in Archive.list_members(self.f_archive, self.f_member):
+            l_name = m.name.rpartition('/')[2]
+            l_type = ITEM_TYPE_DIRECTORY if m.is_dir else get_type_by_name(l_name)
+            if l_type == ITEM_TYPE_ARCHIVE:
+                # Archives inside archives are not opened; they are served as plain files.
+                l_type = ITEM_TYPE_OTHER
+            l_entries.append(Entry(Archive.join(self.f_archive, m.name), l_name, l_type, m.size, m.mtime))
+        l_sort_names = [get_sort_name(e.name) for e in l_entries]
+        self.f_children_info = Children(
+            sort_entries(l_entries, l_sort_names, self.f_sort, self.f_descending, self.f_show_hidden)
+        )
+        return
+
+    def prewarm_thumbnails(self) -> None:
+        # Member thumbnails are made on first view only.
+        return
+
+    @property
+    def thumbnail_types(self) -> list:
+        # Photos only; PDF and video members would have to be extracted for the external renderers.
+        return []
+
+
+class ArchiveMember(File):
+
+    def __init__(self, id: str, name: str, sequence: int, size: int = 0, mtime: float = 0.0) -> None:
+        super().__init__(id, ITEM_TYPE_OTHER, name, sequence, size, mtime)
+        l_archive, l_member = Archive.split(self.f_id)
+        self.f_archive: str = l_archive
+        self.f_member: str = l_member or ''
+        self.f_name = name or self.f_member.rpartition('/')[2]
+        self.f_type = get_type_by_name(self.f_name)
+        return
+
+    @property
+    def is_directory(self) -> bool:
+        # The archive itself counts as the top directory of its members.
+        return not self.f_member or Archive.get_member(self.f_archive, self.f_member).is_dir
+
+    @property
+    def size(self) -> int:
+        return Archive.get_member(self.f_archive, self.f_member).size
+
+    def get_file_binary_object(self) -> IO[bytes]:
+        return Archive.open_member(self.f_archive, self.f_member)
+
+    def describe_thumbnail(self) -> Thumbnail.Thumbnail:
+        return Thumbnail.describe_member(self.f_archive, self.f_member)
+
+    def get_thumbnail(self) -> Thumbnail.Thumbnail:
+        return Thumbnail.get_member_thumbnail(self.f_archive, self.f_member, self.get_file_binary_object)
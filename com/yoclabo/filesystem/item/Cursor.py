@@ -0,0 +1,53 @@
+#
+# Cursor.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import base64
+import json
+
+
+def encode_cursor(cursor: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> dict:
+    # The cursor is opaque to clients; anything that does not decode simply starts from the top.
+    if not cursor:
+        return {}
+    try:
+        l_cursor = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        return {}
+    return l_cursor if is_valid(l_cursor) else {}
+
+
+def is_valid(cursor) -> bool:
+    # Only the shapes encode_cursor hands out are trusted: a version string, a non-negative offset
+    # and, for keyset pages, the three strings of the last entry's key.
+    if not isinstance(cursor, dict):
+        return False
+    if not isinstance(cursor.get('v', ''), str):
+        return False
+    l_offset = cursor.get('o', 0)
+    if not isinstance(l_offset, int) or isinstance(l_offset, bool) or l_offset < 0:
+        return False
+    l_key = cursor.get('k')
+    if l_key is not None and not (isinstance(l_key, list) and len(l_key) == 3
+                                  and all(isinstance(e, str) for e in l_key)):
+        return False
+    return True
@@ -17,30 +17,46 @@
 # limitations under the License.
 #
 
+import os.path
 import urllib.parse
+from datetime import datetime, timezone
 
 import environ
 
-from typing import IO
+from typing import IO, Iterator
 
 from com.yoclabo.filesystem.query.Query import (
-    ITEM_TYPE_DIRECTORY, ITEM_TYPE_TEXT, ITEM_TYPE_IMAGE, ITEM_TYPE_PDF, ITEM_TYPE_MEDIA,
-    get_path_from_root_directory, query_ancestors, query_children, create_directory, create_file, get_file_binary_object, guess_file_mimetype,
-    get_text_content, update_text_content, rename, get_web_encoded_image, get_image_bytearray, copy_file_to_static
+    ITEM_TYPE_DIRECTORY, ITEM_TYPE_TEXT, ITEM_TYPE_IMAGE, ITEM_TYPE_PDF, ITEM_TYPE_MEDIA, SORT_NAME, Entry,
+    get_path_from_root_directory, get_listing_version, query_ancestors, list_children_sorted, create_directory,
+    create_file, get_file_binary_object, guess_file_mimetype, get_text_content, update_text_content, rename,
+    get_web_encoded_image
 )
+from com.yoclabo.filesystem.archive import ZipStream
+from com.yoclabo.filesystem.index import Index
+from com.yoclabo.filesystem.item.Cursor import encode_cursor, decode_cursor
+from com.yoclabo.filesystem.media import Transcode
+from com.yoclabo.filesystem.text import LineIndex, Tail
+from com.yoclabo.filesystem.thumbnail import Prewarm, Thumbnail
+from com.yoclabo.filesystem.upload import Upload
 from com.yoclabo.setting import Server
 
 env = environ.Env()
 env.read_env('.env')
 
+LISTING_FIELDS = ['id', 'name', 'type', 'size', 'mtime', 'files']
+
+USAGE_FIELDS = ['id', 'name', 'size', 'files', 'newest']
+
 
 class Item:
 
-    def __init__(self, id: str, type: str, name: str, sequence: int) -> None:
+    def __init__(self, id: str, type: str, name: str, sequence: int, size: int = 0, mtime: float = 0.0) -> None:
         self.f_id: str = get_path_from_root_directory(id)
         self.f_type: str = type
         self.f_name: str = name
         self.f_sequence: int = sequence
+        self.f_size: int = size
+        self.f_mtime: float = mtime
         self.f_ancestors: list = []
         return
 
@@ -48,6 +64,10 @@ class Item:
     def id(self) -> str:
         return urllib.parse.quote(str(self.f_id).replace(Server.get_root_directory_path(), ''))
 
+    @property
+    def relative_path(self) -> str:
+        return str(self.f_id).replace(Server.get_root_directory_path(), '')
+
     @property
     def type(self) -> str:
         return self.f_type
@@ -60,6 +80,14 @@ class Item:
     def sequence(self) -> int:
         return self.f_sequence
 
+    @property
+    def size(self) -> int:
+        return self.f_size
+
+    @property
+    def modified(self) -> datetime:
+        return datetime.fromtimestamp(self.f_mtime, timezone.utc)
+
     @property
     def ancestors(self) -> list:
         return self.f_ancestors
@@ -81,22 +109,49 @@ class Item:
 
 class Directory(Item):
 
-    def __init__(self, id: str, name: str, sequence: int) -> None:
-        super().__init__(id, ITEM_TYPE_DIRECTORY, name, sequence)
-        self.f_children_info: list = []
+    def __init__(self, id: str, name: str, sequence: int, size: int = 0, mtime: float = 0.0, files: int = 0,
+                 newest: float = 0.0) -> None:
+        super().__init__(id, ITEM_TYPE_DIRECTORY, name, sequence, size, mtime)
+        self.f_files: int = files
+        self.f_newest: float = newest
+        self.f_children_info: Children | IndexedChildren = Children([])
         self.f_children: list = []
         self.f_page: int = 0
         self.f_pages: list = []
         self.f_is_tile: bool = False
+        self.f_is_scroll: bool = False
+        self.f_sort: str = SORT_NAME
+        self.f_descending: bool = False
+        self.f_show_hidden: bool = True
+        self.f_thumbnail_types: list = []
+        self.f_version: str = ''
+        self.f_listing: list = []
+        self.f_cursor: str | None = None
+        self.f_is_restarted: bool = False
+        self.f_totals: Entry | None = None
+        self.f_largest: list = []
         self.SLIDE_SHOW_INTERVAL_MS: int = env.int('SLIDE_SHOW_INTERVAL_MS', default=3000)
         self.ITEMS_PER_PAGE: int = env.int('ITEMS_PER_PAGE', default=10)
         self.TILE_ITEMS_PER_PAGE: int = env.int('TILE_ITEMS_PER_PAGE', default=30)
+        self.LISTING_LIMIT: int = env.int('LISTING_API_LIMIT', default=200)
+        self.LISTING_MAX_LIMIT: int = env.int('LISTING_API_MAX_LIMIT', default=1000)
+        self.USAGE_LIMIT: int = env.int('USAGE_API_LIMIT', default=20)
+        self.USAGE_MAX_LIMIT: int = env.int('USAGE_API_MAX_LIMIT', default=200)
         return
 
     @property
     def children(self) -> list:
         return self.f_children
 
+    @property
+    def files(self) -> int:
+        # Files anywhere below; zero when the listing did not come from the metadata index.
+        return self.f_files
+
+    @property
+    def newest(self) -> datetime:
+        return datetime.fromtimestamp(self.f_newest, timezone.utc)
+
     @property
     def page(self) -> int:
         return self.f_page
@@ -109,9 +164,7 @@ class Directory(Item):
     def max_page(self) -> int:
         if 0 == len(self.f_children_info):
             return 1
-        if self.f_is_tile:
-            return -(-len(self.f_children_info) // self.TILE_ITEMS_PER_PAGE)
-        return -(-len(self.f_children_info) // self.ITEMS_PER_PAGE)
+        return -(-len(self.f_children_info) // self.items_per_page)
 
     @property
     def prev_page(self) -> int:
@@ -125,43 +178,205 @@ class Directory(Item):
     def is_tile(self) -> bool:
         return self.f_is_tile
 
+    @property
+    def is_archive(self) -> bool:
+        return False
+
+    @property
+    def is_scroll(self) -> bool:
+        return self.f_is_scroll
+
     @property
     def slide_show_interval_ms(self) -> int:
         return self.SLIDE_SHOW_INTERVAL_MS
 
+    @property
+    def thumbnail_batch_size(self) -> int:
+        return Thumbnail.THUMBNAIL_BATCH_SIZE
+
+    def get_zip_name(self, names: list) -> str:
+        if len(names) == 1:
+            return names[0] + '.zip'
+        return (os.path.basename(self.f_id.rstrip('/')) or 'root') + '.zip'
+
+    def get_zip_sources(self, names: list) -> list:
+        # Nothing selected means the whole directory, inside a folder named after it.
+        if not names:
+            return [(self.f_id, os.path.basename(self.f_id.rstrip('/')) or 'root')]
+        l_sources: list = []
+        for n in names:
+            if n in ['', '.', '..'] or '/' in n or os.sep in n:
+                raise ValueError(f'invalid name {n}')
+            l_path = os.path.join(self.f_id, n)
+            if not os.path.lexists(l_path):
+                raise FileNotFoundError(l_path)
+            l_sources.append((l_path, n))
+        return l_sources
+
+    def iterate_zip(self, names: list) -> Iterator[bytes]:
+        # Checked before the first byte goes out, while a bad request can still get an error status.
+        return ZipStream.iterate(self.get_zip_sources(names))
+
+    @property
+    def thumbnail_types(self) -> list:
+        # Item types whose tiles load a rendered thumbnail; the rest keep their icon.
+        return self.f_thumbnail_types
+
+    @property
+    def sort(self) -> str:
+        return self.f_sort
+
+    @property
+    def order(self) -> str:
+        return 'desc' if self.f_descending else 'asc'
+
+    @property
+    def show_hidden(self) -> bool:
+        return self.f_show_hidden
+
+    @property
+    def sort_parameters(self) -> str:
+        # Appended to the links of this listing so that paging and switching views keep the order.
+        l_parameters = ''
+        if self.f_sort != SORT_NAME:
+            l_parameters += '&sort=' + self.f_sort
+        if self.f_descending:
+            l_parameters += '&order=desc'
+        if not self.f_show_hidden:
+            l_parameters += '&hidden=false'
+        return l_parameters
+
+    @property
+    def version(self) -> str:
+        if not self.f_version:
+            self.f_version = get_listing_version(self.f_id)
+        return self.f_version
+
+    @property
+    def listing(self) -> dict:
+        l_root = Server.get_root_directory_path()
+        return {
+            'version': self.version,
+            'total': len(self.f_children_info),
+            'restarted': self.f_is_restarted,
+            'fields': LISTING_FIELDS,
+            'entries': [[e.id.replace(l_root, '', 1), e.name, e.type, e.size, e.mtime, e.files] for e in self.f_listing],
+            'cursor': self.f_cursor,
+        }
+
+    @property
+    def usage(self) -> dict:
+        l_root = Server.get_root_directory_path()
+        return {
+            'id': self.f_totals.id.replace(l_root, '', 1) or '/',
+            'size': self.f_totals.size,
+            'files': self.f_totals.files,
+            'newest': self.f_totals.newest,
+            'fields': USAGE_FIELDS,
+            'largest': [[e.id.replace(l_root, '', 1), e.name, e.size, e.files, e.newest] for e in self.f_largest],
+        }
+
+    def get_limit(self, limit: int | None) -> int:
+        if limit is None or limit < 1:
+            return self.LISTING_LIMIT
+        return min(limit, self.LISTING_MAX_LIMIT)
+
+    def is_keyset_applicable(self) -> bool:
+        # The index keeps a keyset cursor for its default order; every other order is an offset.
+        return (isinstance(self.f_children_info, IndexedChildren)
+                and self.f_sort == SORT_NAME and not self.f_descending and self.f_show_hidden)
+
     def cache_children_info(self) -> None:
-        l_children: list = query_children(self.f_id)
-        i: int = 1
-        for child in l_children:
-            if child['type'] == ITEM_TYPE_DIRECTORY:
-                self.f_children_info.append(Directory(child['id'], child['name'], i))
-            elif child['type'] == ITEM_TYPE_IMAGE:
-                self.f_children_info.append(Image(child['id'], child['name'], i))
-            elif child['type'] == ITEM_TYPE_PDF:
-                self.f_children_info.append(Pdf(child['id'], child['name'], i))
-            elif child['type'] == ITEM_TYPE_MEDIA:
-                self.f_children_info.append(Media(child['id'], child['name'], i))
-            else:
-                self.f_children_info.append(Item(child['id'], child['type'], child['name'], i))
-            i += 1
+        if Index.is_enabled() and Index.is_fresh(self.f_id):
+            self.f_children_info = IndexedChildren(self.f_id, self.f_sort, self.f_descending, self.f_show_hidden)
+            return
+        self.f_children_info = Children(
+            list_children_sorted(self.f_id, self.f_sort, self.f_descending, self.f_show_hidden)
+        )
         return
 
+    @property
+    def items_per_page(self) -> int:
+        return self.TILE_ITEMS_PER_PAGE if self.f_is_tile else self.ITEMS_PER_PAGE
+
     def slice(self) -> None:
-        l_start = self.TILE_ITEMS_PER_PAGE * (self.f_page - 1) if self.is_tile \
-            else self.ITEMS_PER_PAGE * (self.f_page - 1)
-        l_end = l_start + self.TILE_ITEMS_PER_PAGE if self.is_tile else l_start + self.ITEMS_PER_PAGE
-        l_end = len(self.f_children_info) if len(self.f_children_info) < l_end else l_end
-        for i in range(l_start, l_end):
-            self.f_children.append(self.f_children_info[i])
+        l_start = self.items_per_page * (self.f_page - 1)
+        self.f_children = self.f_children_info[l_start:l_start + self.items_per_page]
+        return
+
+    def prewarm_thumbnails(self) -> None:
+        if not Prewarm.prewarmer.enabled:
+            return
+        l_start = self.items_per_page * (self.f_page - 1)
+        l_end = l_start + self.items_per_page
+        l_page = self.f_children_info.entries(l_start, l_end)
+        l_neighbours = (self.f_children_info.entries(l_end, l_end + self.items_per_page)
+                        + self.f_children_info.entries(max(0, l_start - self.items_per_page), l_start))
+        Prewarm.schedule_files(Prewarm.PRIORITY_PAGE, l_page)
+        Prewarm.schedule_files(Prewarm.PRIORITY_NEIGHBOUR_PAGE, l_neighbours)
+        Prewarm.schedule_directories(
+            Prewarm.PRIORITY_SUBDIRECTORY, [e.id for e in l_page if e.type == ITEM_TYPE_DIRECTORY]
+        )
         return
 
-    def prepare_browse(self, page: int, is_tile: bool) -> None:
+    def prepare_browse(self, page: int, is_tile: bool, sort: str = SORT_NAME, descending: bool = False,
+                       show_hidden: bool = True) -> None:
         self.fill_ancestors()
         self.f_page = page
         self.f_is_tile = is_tile
+        self.f_sort = sort
+        self.f_descending = descending
+        self.f_show_hidden = show_hidden
         self.cache_children_info()
         self.f_pages = Paginator().create_list(page, self.prev_page, self.next_page, self.max_page)
         self.slice()
+        self.f_thumbnail_types = Thumbnail.get_kinds() if is_tile else []
+        self.prewarm_thumbnails()
+        return
+
+    def prepare_scroll(self, sort: str = SORT_NAME, descending: bool = False, show_hidden: bool = True) -> None:
+        # The page itself only carries the chrome; rows are fetched through the listing API.
+        self.fill_ancestors()
+        self.f_is_scroll = True
+        self.f_sort = sort
+        self.f_descending = descending
+        self.f_show_hidden = show_hidden
+        return
+
+    def prepare_listing(self, cursor: str, limit: int | None, sort: str = SORT_NAME, descending: bool = False,
+                        show_hidden: bool = True) -> None:
+        self.f_sort = sort
+        self.f_descending = descending
+        self.f_show_hidden = show_hidden
+        l_cursor = decode_cursor(cursor)
+        # A cursor from an older version of the directory would skip or repeat entries, so the
+        # client is told to start over instead.
+        self.f_is_restarted = bool(l_cursor) and l_cursor.get('v') != self.version
+        if self.f_is_restarted:
+            l_cursor = {}
+        l_limit = self.get_limit(limit)
+        l_offset = int(l_cursor.get('o', 0))
+        self.cache_children_info()
+        if self.is_keyset_applicable() and l_cursor.get('k') is not None:
+            self.f_listing = self.f_children_info.entries_after(tuple(l_cursor['k']), l_limit)
+        else:
+            self.f_listing = self.f_children_info.entries(l_offset, l_offset + l_limit)
+        self.f_cursor = None
+        if l_offset + len(self.f_listing) < len(self.f_children_info) and self.f_listing:
+            l_next = {'v': self.version, 'o': l_offset + len(self.f_listing)}
+            if self.is_keyset_applicable():
+                l_next['k'] = list(Index.get_key(self.f_listing[-1]))
+            self.f_cursor = encode_cursor(l_next)
+        return
+
+    def prepare_usage(self, limit: int | None) -> None:
+        # Totals come from the rollups in the metadata index; without it every request would be a
+        # walk of the whole subtree, so the report is simply not there.
+        self.f_totals = Index.get_totals(self.f_id) if Index.is_enabled() else None
+        if self.f_totals is None:
+            raise FileNotFoundError(f'{self.relative_path} is not in the metadata index')
+        l_limit = self.USAGE_LIMIT if limit is None or limit < 1 else min(limit, self.USAGE_MAX_LIMIT)
+        self.f_largest = Index.query_largest(self.f_id, l_limit)
         return
 
     def create_directory(self, name: str) -> None:
@@ -182,6 +397,9 @@ class Directory(Item):
         create_file(self.f_id, files['uploadFile'].name, files)
         return
 
+    def begin_upload(self, name: str, size: int) -> dict:
+        return Upload.begin(self.f_id, name, size)
+
     def rename(self, old_name: str, new_name: str) -> None:
         rename(self.f_id, old_name, new_name)
         return
@@ -189,10 +407,13 @@ class Directory(Item):
 
 class File(Item):
 
-    def __init__(self, id: str, type: str, name: str, sequence: int) -> None:
-        super().__init__(id, type, name, sequence)
+    def __init__(self, id: str, type: str, name: str, sequence: int, size: int = 0, mtime: float = 0.0) -> None:
+        super().__init__(id, type, name, sequence, size, mtime)
         return
 
+    def get_path(self) -> str:
+        return self.f_id
+
     def get_file_binary_object(self) -> IO[bytes]:
         return get_file_binary_object(self.f_id)
 
@@ -206,15 +427,39 @@ class File(Item):
 
 class Text(File):
 
-    def __init__(self, id: str, name: str, sequence: int) -> None:
-        super().__init__(id, ITEM_TYPE_TEXT, name, sequence)
+    def __init__(self, id: str, name: str, sequence: int, size: int = 0, mtime: float = 0.0) -> None:
+        super().__init__(id, ITEM_TYPE_TEXT, name, sequence, size, mtime)
         self.f_content: str = ''
+        self.f_is_large: bool = False
+        self.f_is_tail: bool = False
         return
 
     @property
     def content(self) -> str:
         return self.f_content
 
+    @property
+    def is_large(self) -> bool:
+        return self.f_is_large
+
+    @property
+    def is_tail(self) -> bool:
+        return self.f_is_tail
+
+    def get_line_window(self, start: int, count: int) -> dict:
+        return LineIndex.get_window(self.f_id, start, count)
+
+    def follow(self, generation: str | None, offset: int | None) -> dict:
+        return Tail.follow(self.f_id, generation, offset)
+
+    async def follow_async(self, generation: str | None, offset: int | None, wait: float | None) -> dict:
+        return await Tail.follow_async(self.f_id, generation, offset, wait)
+
+    def prepare_tail(self) -> None:
+        super().prepare_view()
+        self.f_is_tail = True
+        return
+
     def get_text_content(self) -> None:
         self.f_content = get_text_content(self.f_id)
         return
@@ -225,56 +470,145 @@ class Text(File):
 
     def prepare_view(self) -> None:
         super().prepare_view()
+        self.f_is_large = LineIndex.is_large(self.f_id)
+        if self.f_is_large:
+            # Starts the line scan now, so the first window is usually ready by the time it is asked for.
+            LineIndex.get_index(self.f_id)
+            return
         self.get_text_content()
         return
 
 
 class Image(File):
 
-    def __init__(self, id: str, name: str, sequence: int) -> None:
-        super().__init__(id, ITEM_TYPE_IMAGE, name, sequence)
-        self.f_image: str = ''
+    def __init__(self, id: str, name: str, sequence: int, size: int = 0, mtime: float = 0.0) -> None:
+        super().__init__(id, ITEM_TYPE_IMAGE, name, sequence, size, mtime)
         return
 
-    @property
-    def image(self) -> str:
-        return self.f_image
-
     def get_web_encoded_image(self) -> str:
         return get_web_encoded_image(self.f_id)
 
-    def get_image_bytearray(self) -> bytes:
-        return get_image_bytearray(self.f_id)
+    def describe_thumbnail(self) -> Thumbnail.Thumbnail:
+        return Thumbnail.describe(self.f_id)
 
-    def prepare_view(self) -> None:
-        super().prepare_view()
-        self.f_image = self.get_web_encoded_image()
-        return
+    def get_thumbnail(self) -> Thumbnail.Thumbnail:
+        return Thumbnail.get_thumbnail(self.f_id)
 
 
 class Pdf(File):
 
-    def __init__(self, id: str, name: str, sequence: int) -> None:
-        super().__init__(id, ITEM_TYPE_PDF, name, sequence)
+    def __init__(self, id: str, name: str, sequence: int, size: int = 0, mtime: float = 0.0) -> None:
+        super().__init__(id, ITEM_TYPE_PDF, name, sequence, size, mtime)
         return
 
-    def prepare_view(self) -> None:
-        super().prepare_view()
-        copy_file_to_static(self.f_id, self.f_name)
-        return
+    def describe_thumbnail(self) -> Thumbnail.Thumbnail:
+        return Thumbnail.describe(self.f_id, Thumbnail.KIND_PDF)
+
+    def get_thumbnail(self) -> Thumbnail.Thumbnail:
+        return Thumbnail.get_thumbnail(self.f_id, Thumbnail.KIND_PDF)
 
 
 class Media(File):
 
-    def __init__(self, id: str, name: str, sequence: int) -> None:
-        super().__init__(id, ITEM_TYPE_MEDIA, name, sequence)
+    def __init__(self, id: str, name: str, sequence: int, size: int = 0, mtime: float = 0.0) -> None:
+        super().__init__(id, ITEM_TYPE_MEDIA, name, sequence, size, mtime)
+        self.f_is_streamed: bool = False
         return
 
+    @property
+    def is_streamed(self) -> bool:
+        return self.f_is_streamed
+
+    def describe_thumbnail(self) -> Thumbnail.Thumbnail:
+        return Thumbnail.describe(self.f_id, Thumbnail.KIND_MEDIA)
+
+    def get_thumbnail(self) -> Thumbnail.Thumbnail:
+        return Thumbnail.get_thumbnail(self.f_id, Thumbnail.KIND_MEDIA)
+
+    def get_playlist(self, segment_url: str) -> str:
+        return Transcode.get_playlist(self.f_id, segment_url)
+
+    def get_segment(self, index: int) -> str:
+        return Transcode.get_segment(self.f_id, index)
+
     def prepare_view(self) -> None:
         super().prepare_view()
-        copy_file_to_static(self.f_id, self.f_name)
+        # Formats the browser can play are still served straight from the file with Range requests.
+        self.f_is_streamed = Transcode.is_streamed(self.f_id)
+        return
+
+
+def create_item(entry: Entry, sequence: int) -> Item:
+    if entry.type == ITEM_TYPE_DIRECTORY:
+        return Directory(entry.id, entry.name, sequence, entry.size, entry.mtime, entry.files, entry.newest)
+    if entry.type == ITEM_TYPE_IMAGE:
+        return Image(entry.id, entry.name, sequence, entry.size, entry.mtime)
+    if entry.type == ITEM_TYPE_PDF:
+        return Pdf(entry.id, entry.name, sequence, entry.size, entry.mtime)
+    if entry.type == ITEM_TYPE_MEDIA:
+        return Media(entry.id, entry.name, sequence, entry.size, entry.mtime)
+    return Item(entry.id, entry.type, entry.name, sequence, entry.size, entry.mtime)
+
+
+class Children:
+
+    # Sequence over the listing records of a directory. Item objects are only built
+    # for the positions actually read, so a page costs O(page size) however big the listing is.
+    def __init__(self, entries: list) -> None:
+        self.f_entries: list = entries
         return
 
+    def __len__(self) -> int:
+        return len(self.f_entries)
+
+    def __getitem__(self, index: int | slice) -> Item | list:
+        if isinstance(index, slice):
+            return [create_item(self.f_entries[i], i + 1) for i in range(*index.indices(len(self.f_entries)))]
+        if index < 0:
+            index += len(self.f_entries)
+        return create_item(self.f_entries[index], index + 1)
+
+    def __iter__(self):
+        for i in range(len(self.f_entries)):
+            yield create_item(self.f_entries[i], i + 1)
+
+    def entries(self, start: int, end: int) -> list:
+        return self.f_entries[start:end]
+
+
+class IndexedChildren:
+
+    # Same interface as Children, answered from the metadata index: the count and each page
+    # are single indexed queries, and the share itself is not read at all.
+    def __init__(self, path: str, sort: str = SORT_NAME, descending: bool = False, show_hidden: bool = True) -> None:
+        self.f_path: str = path
+        self.f_sort: str = sort
+        self.f_descending: bool = descending
+        self.f_show_hidden: bool = show_hidden
+        self.f_length: int = -1
+        return
+
+    def __len__(self) -> int:
+        if self.f_length < 0:
+            self.f_length = Index.count_children(self.f_path, self.f_show_hidden)
+        return self.f_length
+
+    def __getitem__(self, index: int | slice) -> Item | list:
+        if isinstance(index, slice):
+            l_start, l_stop, _ = index.indices(len(self))
+            return [create_item(e, l_start + i + 1) for i, e in enumerate(self.entries(l_start, l_stop))]
+        if index < 0:
+            index += len(self)
+        return create_item(self.entries(index, index + 1)[0], index + 1)
+
+    def entries(self, start: int, end: int) -> list:
+        if end <= start:
+            return []
+        return Index.query_children(self.f_path, start, end, self.f_sort, self.f_descending, self.f_show_hidden)
+
+    def entries_after(self, after: tuple | None, limit: int) -> list:
+        return Index.query_children_after(self.f_path, after, limit)
+
 
 class Paginator:
 
@@ -0,0 +1,133 @@
+#
+# SearchResult.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import environ
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from com.yoclabo.filesystem.index import Content, Index, Search
+from com.yoclabo.filesystem.item.Item import Item, create_item
+
+env = environ.Env()
+env.read_env('.env')
+
+
+class SearchResult:
+
+    def __init__(self, query: str, mode: str, types: list, min_size: int | None, max_size: int | None,
+                 modified_after: float | None, modified_before: float | None, page: int) -> None:
+        self.f_query: str = query
+        self.f_mode: str = mode
+        self.f_types: list = types
+        self.f_min_size: int | None = min_size
+        self.f_max_size: int | None = max_size
+        self.f_modified_after: float | None = modified_after
+        self.f_modified_before: float | None = modified_before
+        self.f_page: int = page
+        self.f_results: list = []
+        self.f_has_next: bool = False
+        self.ITEMS_PER_PAGE: int = env.int('SEARCH_ITEMS_PER_PAGE', default=50)
+        return
+
+    @property
+    def query(self) -> str:
+        return self.f_query
+
+    @property
+    def mode(self) -> str:
+        return self.f_mode
+
+    @property
+    def types(self) -> list:
+        return self.f_types
+
+    @property
+    def results(self) -> list:
+        return self.f_results
+
+    @property
+    def page(self) -> int:
+        return self.f_page
+
+    @property
+    def prev_page(self) -> int:
+        return self.f_page - 1 if 1 < self.f_page else 1
+
+    @property
+    def next_page(self) -> int:
+        return self.f_page + 1 if self.f_has_next else self.f_page
+
+    @property
+    def has_next(self) -> bool:
+        return self.f_has_next
+
+    @property
+    def is_available(self) -> bool:
+        return Index.is_enabled()
+
+    def prepare_search(self) -> None:
+        if not self.f_query or not self.is_available:
+            return
+        l_offset = self.ITEMS_PER_PAGE * (self.f_page - 1)
+        # One row more than a page tells whether there is a next page without counting every match.
+        l_entries = Search.search(
+            self.f_query, self.f_mode, self.f_types, self.f_min_size, self.f_max_size,
+            self.f_modified_after, self.f_modified_before, l_offset, self.ITEMS_PER_PAGE + 1
+        )
+        self.f_has_next = self.ITEMS_PER_PAGE < len(l_entries)
+        self.f_results = [create_item(e, l_offset + i + 1) for i, e in enumerate(l_entries[:self.ITEMS_PER_PAGE])]
+        return
+
+
+class ContentSearchResult(SearchResult):
+
+    def __init__(self, query: str, page: int) -> None:
+        super().__init__(query, 'contents', [], None, None, None, None, page)
+        return
+
+    def prepare_search(self) -> None:
+        if not self.f_query or not self.is_available:
+            return
+        l_offset = self.ITEMS_PER_PAGE * (self.f_page - 1)
+        l_matches = Content.search(self.f_query, l_offset, self.ITEMS_PER_PAGE + 1)
+        self.f_has_next = self.ITEMS_PER_PAGE < len(l_matches)
+        self.f_results = [
+            ContentMatch(create_item(m.entry, l_offset + i + 1), m.snippet)
+            for i, m in enumerate(l_matches[:self.ITEMS_PER_PAGE])
+        ]
+        return
+
+
+class ContentMatch:
+
+    def __init__(self, item: Item, snippet: str) -> None:
+        self.f_item: Item = item
+        self.f_snippet: str = snippet
+        return
+
+    @property
+    def item(self) -> Item:
+        return self.f_item
+
+    @property
+    def snippet(self) -> str:
+        # The file text is escaped first; only the match markers placed by the index become markup.
+        return mark_safe(
+            escape(self.f_snippet).replace(Content.SNIPPET_OPEN, '<mark>').replace(Content.SNIPPET_CLOSE, '</mark>')
+        )
@@ -0,0 +1,268 @@
+#
+# Transcode.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import json
+import math
+import os
+import os.path
+import shutil
+import subprocess
+import tempfile
+import threading
+
+import environ
+
+from browser.settings import BASE_DIR
+
+env = environ.Env()
+env.read_env('.env')
+
+FFMPEG_BINARY: str = env.str('FFMPEG_BINARY', default='ffmpeg')
+
+FFPROBE_BINARY: str = env.str('FFPROBE_BINARY', default='ffprobe')
+
+MEDIA_CACHE_DIRECTORY: str = env.str('MEDIA_CACHE_DIRECTORY', default=os.path.join(BASE_DIR, 'cache', 'media'))
+
+# Least recently used segments are removed once the cache grows past this.
+MEDIA_CACHE_MAX_BYTES: int = env.int('MEDIA_CACHE_MAX_BYTES', default=10 * 1024 * 1024 * 1024)
+
+MEDIA_SEGMENT_SECONDS: int = env.int('MEDIA_SEGMENT_SECONDS', default=6)
+
+# ffmpeg processes running at once in this process; further segment requests wait for a slot.
+MEDIA_TRANSCODE_CONCURRENCY: int = env.int('MEDIA_TRANSCODE_CONCURRENCY', default=2)
+
+# Stream copy instead of re-encoding when the codecs allow it. Much cheaper, but a copied segment
+# can only start on a keyframe, so with sparse keyframes neighbouring segments overlap slightly.
+MEDIA_REMUX: bool = env.bool('MEDIA_REMUX', default=False)
+
+# Browsers play these directly from the file with Range requests; anything else is segmented.
+NATIVE_CONTAINERS = {'mov,mp4,m4a,3gp,3g2,mj2', 'webm', 'matroska,webm', 'mp3', 'ogg'}
+
+NATIVE_VIDEO_CODECS = {'h264', 'vp8', 'vp9', 'av1'}
+
+NATIVE_AUDIO_CODECS = {'aac', 'mp3', 'opus', 'vorbis'}
+
+PROBE_FILE = 'probe.json'
+
+slots = threading.BoundedSemaphore(MEDIA_TRANSCODE_CONCURRENCY)
+
+inflight: dict = {}
+
+inflight_lock = threading.Lock()
+
+cache_size: int = -1
+
+cache_lock = threading.Lock()
+
+
+class Probe:
+
+    def __init__(self, duration: float, container: str, video_codec: str, audio_codec: str) -> None:
+        self.f_duration: float = duration
+        self.f_container: str = container
+        self.f_video_codec: str = video_codec
+        self.f_audio_codec: str = audio_codec
+        return
+
+    @property
+    def duration(self) -> float:
+        return self.f_duration
+
+    @property
+    def segment_count(self) -> int:
+        return max(1, math.ceil(self.f_duration / MEDIA_SEGMENT_SECONDS))
+
+    @property
+    def is_native(self) -> bool:
+        return (self.f_container in NATIVE_CONTAINERS
+                and self.f_video_codec in NATIVE_VIDEO_CODECS | {''}
+                and self.f_audio_codec in NATIVE_AUDIO_CODECS | {''})
+
+    @property
+    def is_remuxable(self) -> bool:
+        # The streams can go into MPEG-TS as they are; only the container changes.
+        return self.f_video_codec in {'h264', ''} and self.f_audio_codec in {'aac', 'mp3', ''}
+
+
+def is_available() -> bool:
+    return shutil.which(FFMPEG_BINARY) is not None and shutil.which(FFPROBE_BINARY) is not None
+
+
+def get_key(source: str) -> str:
+    l_st = os.stat(source)
+    return f'{l_st.st_mtime_ns:x}-{l_st.st_size:x}'
+
+
+def get_cache_directory(source: str, key: str) -> str:
+    return os.path.join(MEDIA_CACHE_DIRECTORY, hashlib.sha1(source.encode()).hexdigest(), key)
+
+
+def probe(source: str) -> Probe:
+    # ffprobe reads the container header only; the result is kept beside the segments of this version.
+    l_path = os.path.join(get_cache_directory(source, get_key(source)), PROBE_FILE)
+    try:
+        with open(l_path) as f:
+            l_info = json.load(f)
+    except (OSError, ValueError):
+        l_output = subprocess.run(
+            [FFPROBE_BINARY, '-v', 'error', '-show_entries', 'format=format_name,duration:stream=codec_type,codec_name',
+             '-of', 'json', source],
+            capture_output=True, check=True, timeout=60
+        ).stdout
+        l_info = json.loads(l_output)
+        write(l_path, json.dumps(l_info).encode())
+    l_streams = l_info.get('streams', [])
+    return Probe(
+        float(l_info.get('format', {}).get('duration') or 0),
+        l_info.get('format', {}).get('format_name', ''),
+        next((s.get('codec_name', '') for s in l_streams if s.get('codec_type') == 'video'), ''),
+        next((s.get('codec_name', '') for s in l_streams if s.get('codec_type') == 'audio'), ''),
+    )
+
+
+def is_streamed(source: str) -> bool:
+    if not is_available():
+        return False
+    try:
+        return not probe(source).is_native
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return False
+
+
+def get_playlist(source: str, segment_url: str) -> str:
+    # A complete VOD playlist up front: the player knows the duration and can seek anywhere,
+    # and only the segments it then asks for are ever produced.
+    l_probe = probe(source)
+    l_key = get_key(source)
+    l_lines = [
+        '#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{MEDIA_SEGMENT_SECONDS}',
+        '#EXT-X-MEDIA-SEQUENCE:0', '#EXT-X-PLAYLIST-TYPE:VOD',
+    ]
+    for i in range(l_probe.segment_count):
+        l_duration = min(MEDIA_SEGMENT_SECONDS, l_probe.duration - i * MEDIA_SEGMENT_SECONDS)
+        l_lines.append(f'#EXTINF:{max(l_duration, 0.001):.3f},')
+        l_lines.append(f'{segment_url}&index={i}&v={l_key}')
+    l_lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(l_lines) + '\n'
+
+
+def get_segment(source: str, index: int) -> str:
+    l_probe = probe(source)
+    if index < 0 or l_probe.segment_count <= index:
+        raise ValueError(f'no segment {index}')
+    l_path = os.path.join(get_cache_directory(source, get_key(source)), f'{index:05d}.ts')
+    if os.path.exists(l_path):
+        os.utime(l_path)
+        return l_path
+    # Concurrent requests for one segment share one ffmpeg run.
+    with inflight_lock:
+        l_event = inflight.get(l_path)
+        l_owner = l_event is None
+        if l_owner:
+            l_event = threading.Event()
+            inflight[l_path] = l_event
+    if not l_owner:
+        l_event.wait()
+        if not os.path.exists(l_path):
+            raise OSError(f'segment {index} of {source} failed')
+        return l_path
+    try:
+        with slots:
+            transcode(source, l_probe, index, l_path)
+    finally:
+        with inflight_lock:
+            del inflight[l_path]
+        l_event.set()
+    return l_path
+
+
+def get_codec_arguments(probe: Probe) -> list:
+    if MEDIA_REMUX and probe.is_remuxable:
+        return ['-c', 'copy']
+    return ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-c:a', 'aac', '-b:a', '160k']
+
+
+def transcode(source: str, probe: Probe, index: int, destination: str) -> None:
+    # -ss before -i seeks in the input, so producing segment n costs the same whatever n is.
+    # -output_ts_offset keeps timestamps continuous across separately produced segments.
+    l_start = index * MEDIA_SEGMENT_SECONDS
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    l_fd, l_temp = tempfile.mkstemp(dir=os.path.dirname(destination), suffix='.part')
+    os.close(l_fd)
+    try:
+        subprocess.run(
+            [FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+             '-ss', str(l_start), '-t', str(MEDIA_SEGMENT_SECONDS), '-i', source,
+             '-map', '0:v:0?', '-map', '0:a:0?', *get_codec_arguments(probe),
+             '-output_ts_offset', str(l_start), '-f', 'mpegts', l_temp],
+            check=True, capture_output=True, timeout=300
+        )
+        os.replace(l_temp, destination)
+    except BaseException:
+        os.remove(l_temp)
+        raise
+    add_to_cache(os.path.getsize(destination))
+    return
+
+
+def write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    l_fd, l_temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    with os.fdopen(l_fd, 'wb') as f:
+        f.write(data)
+    os.replace(l_temp, path)
+    return
+
+
+def list_cache() -> list:
+    l_files: list = []
+    for root, _, files in os.walk(MEDIA_CACHE_DIRECTORY):
+        for f in files:
+            if f.endswith('.ts'):
+                try:
+                    l_st = os.stat(os.path.join(root, f))
+                except FileNotFoundError:
+                    continue
+                l_files.append((l_st.st_mtime, l_st.st_size, os.path.join(root, f)))
+    return l_files
+
+
+def add_to_cache(size: int) -> None:
+    # The total is counted once per process and then kept up to date, so eviction walks the
+    # cache only when it actually has to remove something.
+    global cache_size
+    with cache_lock:
+        if cache_size < 0:
+            cache_size = sum(s for _, s, _ in list_cache())
+        else:
+            cache_size += size
+        if cache_size <= MEDIA_CACHE_MAX_BYTES:
+            return
+        l_files = sorted(list_cache())
+        cache_size = sum(s for _, s, _ in l_files)
+        for _, l_size, l_path in l_files:
+            if cache_size <= MEDIA_CACHE_MAX_BYTES * 0.9:
+                break
+            try:
+                os.remove(l_path)
+            except FileNotFoundError:
+                pass
+            cache_size -= l_size
+    return
@@ -21,14 +21,15 @@ import base64
 import mimetypes
 import os
 import os.path
-import shutil
-import stat
+import re
 from pathlib import Path
-from typing import IO
+from typing import IO, NamedTuple
 
 from django.utils.text import get_valid_filename
 
-from browser.settings import BASE_DIR
+from com.yoclabo.filesystem.archive import Archive
+from com.yoclabo.filesystem.cache import ListingCache
+from com.yoclabo.filesystem.thumbnail import Thumbnail
 from com.yoclabo.setting.Server import get_root_directory_path
 
 ITEM_TYPE_DIRECTORY = 'directory'
@@ -41,8 +42,39 @@ ITEM_TYPE_PDF = 'pdf'
 
 ITEM_TYPE_MEDIA = 'media'
 
+ITEM_TYPE_ARCHIVE = 'archive'
+
 ITEM_TYPE_OTHER = 'other'
 
+ITEM_TYPE_HIDDEN_FILE = 'hidden_file'
+
+
+SORT_NAME = 'name'
+
+SORT_SIZE = 'size'
+
+SORT_MTIME = 'mtime'
+
+SORT_TYPE = 'type'
+
+NATURAL_NUMBER = re.compile(r'\d+')
+
+# Resumable uploads are written beside their target under this name until they are complete; they
+# are not entries of the directory, for listings, the index, the watcher or zip downloads.
+UPLOAD_PART = re.compile(r'^\..+\.[A-Za-z0-9_-]{8}\.part$')
+
+
+class Entry(NamedTuple):
+    id: str
+    name: str
+    type: str
+    size: int
+    mtime: float
+    # Directories from the metadata index carry their subtree totals: size is then the bytes below
+    # them, files the number of files and newest the latest mtime anywhere inside.
+    files: int = 0
+    newest: float = 0.0
+
 
 def get_path_from_root_directory(path: str) -> str:
     return os.path.join(get_root_directory_path(), path[1:]) if path.startswith('/') else os.path.join(
@@ -65,23 +97,97 @@ def query_ancestors(path: str, type: str, ancestors: list = None) -> list:
 
 
 def query_children(path: str) -> list:
-    l_children: list = []
-    for c in Path(path).iterdir():
-        if os.path.isdir(c):
-            l_children.append({'id': str(c), 'type': ITEM_TYPE_DIRECTORY, 'name': os.path.basename(str(c))})
-    for c in Path(path).iterdir():
-        if os.path.isfile(c):
-            l_file_name = os.path.basename(str(c))
-            l_children.append({'id': str(c), 'type': get_type(l_file_name), 'name': l_file_name})
-    return l_children
+    return [{'id': e.id, 'type': e.type, 'name': e.name} for e in scan_children(path)]
+
+
+def list_children(path: str) -> list:
+    return list_children_sorted(path, SORT_NAME, False, True)
+
+
+def list_children_sorted(path: str, sort: str, descending: bool, show_hidden: bool) -> list:
+    l_listing = ListingCache.get_listing(path, scan_children)
+    l_sort_names = l_listing.memo(('sort_names',), lambda: [get_sort_name(e.name) for e in l_listing.entries])
+    return l_listing.memo(
+        ('order', sort, descending, show_hidden),
+        lambda: sort_entries(l_listing.entries, l_sort_names, sort, descending, show_hidden)
+    )
+
+
+def get_listing_version(path: str) -> str:
+    # Creating, deleting or renaming a child bumps the directory mtime; that is what a listing shows.
+    return f'{os.stat(path).st_mtime_ns:x}'
+
+
+def get_sort_name(name: str) -> str:
+    # Natural order as a plain string: case folded, with digit runs zero-padded so that 'f2' < 'f10'.
+    return NATURAL_NUMBER.sub(lambda m: m.group().zfill(20), name.casefold())
+
+
+def get_upload_part_name(name: str, token: str) -> str:
+    return f'.{name}.{token[:8]}.part'
+
+
+def is_upload_part(name: str) -> bool:
+    return UPLOAD_PART.match(name) is not None
+
+
+def is_hidden(entry: Entry) -> bool:
+    return entry.name.startswith('.')
+
+
+def sort_entries(entries: list, sort_names: list, sort: str, descending: bool, show_hidden: bool) -> list:
+    def get_key(i: int) -> tuple:
+        if sort == SORT_SIZE:
+            return entries[i].size, sort_names[i], entries[i].name
+        if sort == SORT_MTIME:
+            return entries[i].mtime, sort_names[i], entries[i].name
+        if sort == SORT_TYPE:
+            return entries[i].type, sort_names[i], entries[i].name
+        return sort_names[i], entries[i].name
+
+    l_indexes = [i for i in range(len(entries)) if show_hidden or not is_hidden(entries[i])]
+    # Directories stay first whatever the order; only the order inside each group is reversed.
+    l_directories = sorted((i for i in l_indexes if entries[i].type == ITEM_TYPE_DIRECTORY), key=get_key,
+                           reverse=descending)
+    l_files = sorted((i for i in l_indexes if entries[i].type != ITEM_TYPE_DIRECTORY), key=get_key,
+                     reverse=descending)
+    return [entries[i] for i in l_directories + l_files]
+
+
+def scan_children(path: str) -> list:
+    # One readdir pass. The directory/file split comes from the DirEntry type cache,
+    # so the only remaining syscall per entry is the stat for size and mtime.
+    l_directories: list = []
+    l_files: list = []
+    with os.scandir(path) as it:
+        for e in it:
+            if is_upload_part(e.name):
+                continue
+            try:
+                if e.is_dir():
+                    l_st = e.stat()
+                    l_directories.append(Entry(e.path, e.name, ITEM_TYPE_DIRECTORY, 0, l_st.st_mtime))
+                elif e.is_file():
+                    l_st = e.stat()
+                    l_files.append(Entry(e.path, e.name, get_type_by_name(e.name), l_st.st_size, l_st.st_mtime))
+            except OSError:
+                # Broken symlinks and entries removed while scanning are skipped, as before.
+                continue
+    l_directories.sort(key=lambda e: e.name)
+    l_files.sort(key=lambda e: e.name)
+    return l_directories + l_files
 
 
 def get_type(path: str) -> str:
-    l_p: Path = Path(path)
-    if l_p.is_dir():
+    if Path(path).is_dir():
         return ITEM_TYPE_DIRECTORY
+    return get_type_by_name(os.path.basename(path))
+
+
+def get_type_by_name(name: str) -> str:
+    l_p: Path = Path(name)
     if l_p.name.startswith('.'):
-        return 'hidden_file'
+        return ITEM_TYPE_HIDDEN_FILE
     if l_p.suffix == '.txt' or l_p.suffix == '.text':
         return ITEM_TYPE_TEXT
     if l_p.suffix == '.jpg' or l_p.suffix == '.jpeg' or l_p.suffix == '.png' or l_p.suffix == '.gif':
@@ -91,6 +197,8 @@ def get_type(path: str) -> str:
     if (l_p.suffix == '.mp4' or l_p.suffix == '.mp3' or l_p.suffix == '.m4a'
             or l_p.suffix == '.flv' or l_p.suffix == '.wmv'):
         return ITEM_TYPE_MEDIA
+    if l_p.suffix == '.zip' or l_p.suffix == '.tar':
+        return ITEM_TYPE_ARCHIVE
     return ITEM_TYPE_OTHER
 
 
@@ -99,6 +207,7 @@ def create_directory(path: str, name: str) -> None:
     if os.path.exists(l_path):
         return
     os.mkdir(l_path)
+    ListingCache.invalidate(path)
     return
 
 
@@ -114,6 +223,7 @@ def create_file(path: str, name: str, content: any) -> None:
         with open(l_path, 'wb+') as dest:
             for c in content['uploadFile'].chunks():
                 dest.write(c)
+    ListingCache.invalidate(path)
     return
 
 
@@ -135,6 +245,7 @@ def update_text_content(path: str, name: str, content: str) -> None:
         return
     with open(path, 'w') as cont:
         cont.write(content)
+    ListingCache.invalidate(os.path.dirname(path))
     return
 
 
@@ -146,21 +257,13 @@ def rename(path: str, old_name: str, new_name: str) -> None:
         old_name = old_name.replace('_', ' ')
     new_name = get_valid_filename(new_name)
     os.rename(os.path.join(path, old_name), os.path.join(path, new_name))
+    ListingCache.invalidate(path)
+    ListingCache.invalidate(os.path.join(path, old_name))
+    Thumbnail.invalidate(os.path.join(path, old_name))
+    Archive.invalidate(os.path.join(path, old_name))
     return
 
 
 def get_web_encoded_image(path: str) -> str:
-    return 'data:image/jpeg;base64,' + base64.b64encode(get_file_binary_object(path).read()).decode()
-
-
-def get_image_bytearray(path: str) -> bytes:
-    return get_file_binary_object(path).read()
-
-
-def copy_file_to_static(copy_from: str, copy_to: str) -> None:
-    l_copy_to = os.path.join(BASE_DIR, 'static', copy_to)
-    if os.path.exists(l_copy_to):
-        os.remove(l_copy_to)
-    shutil.copy(copy_from, l_copy_to)
-    os.chmod(l_copy_to, stat.S_IREAD | stat.S_IWRITE | stat.S_IROTH)
-    return
+    with get_file_binary_object(path) as f:
+        return 'data:image/jpeg;base64,' + base64.b64encode(f.read()).decode()
@@ -0,0 +1,249 @@
+#
+# LineIndex.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import bisect
+import hashlib
+import mmap
+import os
+import os.path
+import struct
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+
+import environ
+
+from browser.settings import BASE_DIR
+from com.yoclabo.filesystem.index.Content import decode
+
+env = environ.Env()
+env.read_env('.env')
+
+LINE_INDEX_DIRECTORY: str = env.str('LINE_INDEX_DIRECTORY', default=os.path.join(BASE_DIR, 'cache', 'lines'))
+
+# Text files larger than this open in the paged viewer instead of a textarea.
+LARGE_TEXT_THRESHOLD: int = env.int('LARGE_TEXT_THRESHOLD', default=1024 * 1024)
+
+# Files up to this size are scanned inline on first open; larger ones are scanned on a background thread.
+LINE_INDEX_SYNC_BYTES: int = env.int('LINE_INDEX_SYNC_BYTES', default=32 * 1024 * 1024)
+
+# Bytes between checkpoints: reaching any line costs at most this much scanning.
+LINE_INDEX_STRIDE = 1024 * 1024
+
+LINE_WINDOW_MAX_LINES = 1000
+
+# Longer lines are cut, so one pathological line cannot turn a window into a multi-megabyte response.
+LINE_MAX_BYTES = 16 * 1024
+
+# mtime_ns, size, stride, newline count.
+HEADER = struct.Struct('<qqqq')
+
+MAX_OPEN_INDEXES = 64
+
+
+class LineIndex:
+
+    # checkpoints[k] is the number of newlines before byte k * stride. It is filled in order while
+    # scanning, so lines in the part already scanned can be served before the scan completes.
+    def __init__(self, path: str, mtime_ns: int, size: int) -> None:
+        self.f_path: str = path
+        self.f_mtime_ns: int = mtime_ns
+        self.f_size: int = size
+        self.f_checkpoints: array = array('q')
+        self.f_newlines: int = 0
+        self.f_scanned: int = 0
+        self.f_is_complete: bool = False
+        self.f_has_trailing_line: bool = False
+        return
+
+    @property
+    def path(self) -> str:
+        return self.f_path
+
+    @property
+    def size(self) -> int:
+        return self.f_size
+
+    @property
+    def scanned(self) -> int:
+        return self.f_scanned
+
+    @property
+    def is_complete(self) -> bool:
+        return self.f_is_complete
+
+    @property
+    def lines(self) -> int:
+        return self.f_newlines + (1 if self.f_has_trailing_line else 0)
+
+    def is_current(self, st: os.stat_result) -> bool:
+        return self.f_mtime_ns == st.st_mtime_ns and self.f_size == st.st_size
+
+    def locate(self, mm: mmap.mmap, line: int) -> int:
+        # Byte offset where the line starts, or -1 when it is past what has been scanned.
+        if line == 0:
+            return 0
+        if self.f_newlines < line:
+            return -1
+        k = bisect.bisect_left(self.f_checkpoints, line) - 1
+        l_offset = k * LINE_INDEX_STRIDE
+        for _ in range(line - self.f_checkpoints[k]):
+            l_offset = mm.find(b'\n', l_offset) + 1
+        return l_offset
+
+    def read(self, start: int, count: int) -> list:
+        if self.f_size == 0:
+            return []
+        l_lines: list = []
+        with open(self.f_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            l_end_of_data = min(len(mm), self.f_size)
+            l_offset = self.locate(mm, start)
+            while 0 <= l_offset < l_end_of_data and len(l_lines) < count:
+                l_newline = mm.find(b'\n', l_offset, l_end_of_data)
+                l_stop = l_end_of_data if l_newline < 0 else l_newline
+                l_lines.append(decode(mm[l_offset:min(l_stop, l_offset + LINE_MAX_BYTES)]).rstrip('\r'))
+                l_offset = l_end_of_data if l_newline < 0 else l_newline + 1
+        return l_lines
+
+    def scan(self) -> None:
+        if self.f_size == 0:
+            self.f_is_complete = True
+            return
+        with open(self.f_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            l_end_of_data = min(len(mm), self.f_size)
+            l_offset = 0
+            while l_offset < l_end_of_data:
+                self.f_checkpoints.append(self.f_newlines)
+                l_stop = min(l_offset + LINE_INDEX_STRIDE, l_end_of_data)
+                self.f_newlines += mm[l_offset:l_stop].count(b'\n')
+                l_offset = l_stop
+                self.f_scanned = l_offset
+            self.f_has_trailing_line = mm[l_end_of_data - 1:l_end_of_data] != b'\n'
+        self.f_is_complete = True
+        return
+
+
+def get_cache_path(path: str) -> str:
+    return os.path.join(LINE_INDEX_DIRECTORY, hashlib.sha1(path.encode()).hexdigest() + '.idx')
+
+
+def load(path: str, st: os.stat_result) -> LineIndex | None:
+    try:
+        with open(get_cache_path(path), 'rb') as f:
+            l_data = f.read()
+    except OSError:
+        return None
+    l_mtime_ns, l_size, l_stride, l_newlines = HEADER.unpack_from(l_data)
+    if (l_mtime_ns, l_size, l_stride) != (st.st_mtime_ns, st.st_size, LINE_INDEX_STRIDE):
+        return None
+    l_index = LineIndex(path, l_mtime_ns, l_size)
+    l_index.f_checkpoints.frombytes(l_data[HEADER.size:-1])
+    l_index.f_newlines = l_newlines
+    l_index.f_has_trailing_line = l_data[-1:] == b'\x01'
+    l_index.f_scanned = l_size
+    l_index.f_is_complete = True
+    return l_index
+
+
+def save(index: LineIndex) -> None:
+    l_destination = get_cache_path(index.path)
+    os.makedirs(os.path.dirname(l_destination), exist_ok=True)
+    l_fd, l_temp = tempfile.mkstemp(dir=os.path.dirname(l_destination), suffix='.part')
+    try:
+        with os.fdopen(l_fd, 'wb') as dest:
+            dest.write(HEADER.pack(index.f_mtime_ns, index.f_size, LINE_INDEX_STRIDE, index.f_newlines))
+            dest.write(index.f_checkpoints.tobytes())
+            dest.write(b'\x01' if index.f_has_trailing_line else b'\x00')
+        os.replace(l_temp, l_destination)
+    except BaseException:
+        os.remove(l_temp)
+        raise
+    return
+
+
+def build(index: LineIndex) -> None:
+    index.scan()
+    try:
+        save(index)
+    except OSError:
+        # The index still serves this process; only the next process has to scan again.
+        pass
+    return
+
+
+indexes: OrderedDict = OrderedDict()
+
+lock = threading.Lock()
+
+inflight: dict = {}
+
+
+def is_large(path: str) -> bool:
+    return LARGE_TEXT_THRESHOLD < os.path.getsize(path)
+
+
+def get_index(path: str) -> LineIndex:
+    # The lock only guards the two dicts. Loading or scanning runs outside it, so a slow scan holds
+    # up the requests for its own file, which share it, and nothing else.
+    while True:
+        l_st = os.stat(path)
+        with lock:
+            l_index = indexes.get(path)
+            if l_index is not None and l_index.is_current(l_st):
+                indexes.move_to_end(path)
+                return l_index
+            l_event = inflight.get(path)
+            l_owner = l_event is None
+            if l_owner:
+                l_event = threading.Event()
+                inflight[path] = l_event
+        if l_owner:
+            break
+        l_event.wait()
+    try:
+        l_index = load(path, l_st)
+        if l_index is None:
+            l_index = LineIndex(path, l_st.st_mtime_ns, l_st.st_size)
+            if l_st.st_size <= LINE_INDEX_SYNC_BYTES:
+                build(l_index)
+            else:
+                threading.Thread(target=build, args=(l_index,), daemon=True).start()
+        with lock:
+            indexes[path] = l_index
+            while MAX_OPEN_INDEXES < len(indexes):
+                indexes.popitem(last=False)
+    finally:
+        with lock:
+            del inflight[path]
+        l_event.set()
+    return l_index
+
+
+def get_window(path: str, start: int, count: int) -> dict:
+    l_index = get_index(path)
+    l_count = max(0, min(count, LINE_WINDOW_MAX_LINES))
+    return {
+        'start': start,
+        'lines': l_index.read(max(0, start), l_count),
+        'total': l_index.lines,
+        'complete': l_index.is_complete,
+        'scanned': l_index.scanned,
+        'size': l_index.size,
+    }
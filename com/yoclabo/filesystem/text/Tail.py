@@ -0,0 +1,196 @@
+#
+# Tail.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+import os
+import threading
+import time
+
+import environ
+
+from com.yoclabo.filesystem.index.Content import decode
+from com.yoclabo.routing.Executor import run_blocking
+
+env = environ.Env()
+env.read_env('.env')
+
+TAIL_POLL_SECONDS: float = env.float('TAIL_POLL_SECONDS', default=0.5)
+
+# Longest an async follow request waits for new data before answering with nothing.
+TAIL_WAIT_SECONDS: float = env.float('TAIL_WAIT_SECONDS', default=25.0)
+
+# Without ASYNC_VIEWS a request never waits, since it would hold a worker; the viewer asks again after this.
+TAIL_SYNC_POLL_SECONDS: float = env.float('TAIL_SYNC_POLL_SECONDS', default=2.0)
+
+# A file nobody has asked about for this long stops being watched and its thread ends.
+TAIL_IDLE_SECONDS: float = env.float('TAIL_IDLE_SECONDS', default=60.0)
+
+# Most data one answer carries; a viewer further behind than this skips ahead.
+TAIL_BUFFER_BYTES: int = env.int('TAIL_BUFFER_BYTES', default=1024 * 1024)
+
+TAIL_INITIAL_BYTES = 64 * 1024
+
+READ_SIZE = 256 * 1024
+
+RESET_ROTATED = 'rotated'
+
+RESET_TRUNCATED = 'truncated'
+
+RESET_SKIPPED = 'skipped'
+
+
+def get_generation(st: os.stat_result) -> str:
+    # Derived from the file, not from this process, so any worker can continue any viewer's position.
+    # A rotated file is another inode; a truncated one shows as a size below the viewer's offset.
+    return f'{st.st_dev:x}-{st.st_ino:x}'
+
+
+def cut_lines(data: bytes) -> int:
+    # Only whole lines are sent, so a multibyte character is never split between two answers.
+    l_cut = data.rfind(b'\n') + 1
+    if l_cut == 0 and len(data) < READ_SIZE:
+        return 0
+    return l_cut or len(data)
+
+
+def read(path: str, generation: str | None, offset: int | None) -> tuple:
+    # (answer, size seen). Without a position the answer is the last lines of the file; with one it
+    # is whatever was appended since, read straight from the file.
+    l_fd = os.open(path, os.O_RDONLY)
+    try:
+        l_st = os.fstat(l_fd)
+        l_generation = get_generation(l_st)
+        l_reset: str | bool = False
+        if generation is None or offset is None:
+            l_start = max(0, l_st.st_size - TAIL_INITIAL_BYTES)
+            l_reset = True
+        elif generation != l_generation:
+            l_start, l_reset = 0, RESET_ROTATED
+        elif l_st.st_size < offset:
+            l_start, l_reset = 0, RESET_TRUNCATED
+        else:
+            l_start = offset
+        if TAIL_BUFFER_BYTES < l_st.st_size - l_start:
+            l_start = l_st.st_size - TAIL_BUFFER_BYTES
+            l_reset = l_reset or RESET_SKIPPED
+        l_data = os.pread(l_fd, l_st.st_size - l_start, l_start)
+    finally:
+        os.close(l_fd)
+    if l_reset and 0 < l_start:
+        # Started inside the file rather than at a position it sent: begin at the next line.
+        l_skip = l_data.find(b'\n') + 1
+        l_start += l_skip
+        l_data = l_data[l_skip:]
+    l_cut = cut_lines(l_data)
+    return {
+        'generation': l_generation, 'offset': l_start + l_cut, 'data': decode(l_data[:l_cut]), 'reset': l_reset,
+        'retry': TAIL_SYNC_POLL_SECONDS,
+    }, l_st.st_size
+
+
+class Follower:
+
+    # One per followed file and process. Its thread stats the path every poll interval and wakes the
+    # async requests waiting on the file, so ten viewers cost one stat rather than ten. It holds no
+    # data: answers are always read from the file itself.
+    def __init__(self, path: str) -> None:
+        self.f_path: str = path
+        self.f_generation: str = ''
+        self.f_size: int = -1
+        self.f_touched: float = time.monotonic()
+        return
+
+    def touch(self) -> None:
+        self.f_touched = time.monotonic()
+        return
+
+    def poll(self) -> None:
+        try:
+            l_st = os.stat(self.f_path)
+        except FileNotFoundError:
+            # Removed and not recreated yet: nothing changes until the new file appears.
+            return
+        self.f_generation = get_generation(l_st)
+        self.f_size = l_st.st_size
+        return
+
+    def is_ready(self, generation: str, size: int) -> bool:
+        return generation != self.f_generation or size != self.f_size
+
+    def is_idle(self) -> bool:
+        return TAIL_IDLE_SECONDS <= time.monotonic() - self.f_touched
+
+    def run(self) -> None:
+        try:
+            while True:
+                time.sleep(TAIL_POLL_SECONDS)
+                self.poll()
+                # Decided under the registry lock, so a viewer never gets a follower that is ending.
+                with lock:
+                    if self.is_idle():
+                        break
+        finally:
+            with lock:
+                if followers.get(self.f_path) is self:
+                    del followers[self.f_path]
+        return
+
+
+followers: dict = {}
+
+lock = threading.Lock()
+
+
+def get_follower(path: str) -> Follower:
+    with lock:
+        l_follower = followers.get(path)
+        if l_follower is None:
+            l_follower = Follower(path)
+            l_follower.poll()
+            followers[path] = l_follower
+            threading.Thread(target=l_follower.run, daemon=True).start()
+        l_follower.touch()
+    return l_follower
+
+
+def get_wait(wait: float | None) -> float:
+    return TAIL_WAIT_SECONDS if wait is None else max(0.0, min(wait, TAIL_WAIT_SECONDS))
+
+
+def follow(path: str, generation: str | None, offset: int | None) -> dict:
+    # Answers at once; the viewer polls again after 'retry' seconds.
+    return read(path, generation, offset)[0]
+
+
+async def follow_async(path: str, generation: str | None, offset: int | None, wait: float | None) -> dict:
+    # A long poll: waiting costs no thread, only a look at the shared follower each poll interval.
+    # Every file access goes through the I/O pool rather than the event loop.
+    l_tail, l_size = await run_blocking(read, path, generation, offset)
+    l_tail['retry'] = 0
+    if l_tail['data'] or l_tail['reset']:
+        return l_tail
+    l_follower = await run_blocking(get_follower, path)
+    l_deadline = time.monotonic() + get_wait(wait)
+    while not l_follower.is_ready(l_tail['generation'], l_size) and time.monotonic() < l_deadline:
+        await asyncio.sleep(TAIL_POLL_SECONDS)
+        l_follower.touch()
+    if l_follower.is_ready(l_tail['generation'], l_size):
+        l_tail, _ = await run_blocking(read, path, l_tail['generation'], l_tail['offset'])
+        l_tail['retry'] = 0
+    return l_tail
@@ -0,0 +1,177 @@
+#
+# Prewarm.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import environ
+
+from com.yoclabo.filesystem.thumbnail import Thumbnail
+
+env = environ.Env()
+env.read_env('.env')
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_PAGE = 0
+
+PRIORITY_NEIGHBOUR_PAGE = 1
+
+PRIORITY_SUBDIRECTORY = 2
+
+# A file task is named after the thumbnail kind it renders.
+TASK_IMAGE = Thumbnail.KIND_IMAGE
+
+TASK_PDF = Thumbnail.KIND_PDF
+
+TASK_MEDIA = Thumbnail.KIND_MEDIA
+
+TASK_DIRECTORY = 'directory'
+
+FIRST_PAGE_SIZE: int = env.int('TILE_ITEMS_PER_PAGE', default=30)
+
+
+def warm(path: str, kind: str = TASK_IMAGE) -> None:
+    # Documents and clips go through the renderer semaphore inside get_thumbnail, so however many
+    # prewarm workers there are, no more pdftoppm or ffmpeg runs start than THUMBNAIL_RENDER_WORKERS.
+    Thumbnail.get_thumbnail(path, kind)
+    return
+
+
+class Prewarmer:
+
+    # Request threads only ever call put_nowait() on a bounded queue: when it is full the task is dropped,
+    # the thumbnail is then simply generated on first view as before.
+    def __init__(self, workers: int, queue_size: int, use_processes: bool) -> None:
+        self.f_queue: queue.PriorityQueue = queue.PriorityQueue(queue_size)
+        self.f_pending: set = set()
+        self.f_lock: threading.Lock = threading.Lock()
+        self.f_counter = itertools.count()
+        self.f_workers: int = workers
+        self.f_use_processes: bool = use_processes
+        self.f_executor: Executor | None = None
+        self.f_threads: list = []
+        self.f_dropped: int = 0
+        self.f_done: int = 0
+        self.f_failed: int = 0
+        return
+
+    @property
+    def enabled(self) -> bool:
+        return 0 < self.f_workers and Thumbnail.is_available()
+
+    def start(self) -> None:
+        with self.f_lock:
+            if self.f_threads:
+                return
+            if self.f_use_processes:
+                # spawn, not fork: forking a threaded gunicorn worker is not safe.
+                self.f_executor = ProcessPoolExecutor(self.f_workers, multiprocessing.get_context('spawn'))
+            for i in range(self.f_workers):
+                l_thread = threading.Thread(target=self.work, name=f'thumbnail-prewarm-{i}', daemon=True)
+                l_thread.start()
+                self.f_threads.append(l_thread)
+        return
+
+    def submit(self, priority: int, kind: str, path: str) -> bool:
+        if not self.enabled:
+            return False
+        self.start()
+        with self.f_lock:
+            if (kind, path) in self.f_pending:
+                return False
+            try:
+                self.f_queue.put_nowait((priority, next(self.f_counter), kind, path))
+            except queue.Full:
+                self.f_dropped += 1
+                return False
+            self.f_pending.add((kind, path))
+        return True
+
+    def work(self) -> None:
+        while True:
+            l_priority, _, l_kind, l_path = self.f_queue.get()
+            try:
+                if l_kind == TASK_DIRECTORY:
+                    self.expand(l_priority, l_path)
+                elif self.f_executor is not None:
+                    self.f_executor.submit(warm, l_path, l_kind).result()
+                else:
+                    warm(l_path, l_kind)
+                self.f_done += 1
+            except Exception:
+                self.f_failed += 1
+                logger.warning('thumbnail prewarm failed: %s', l_path, exc_info=True)
+            finally:
+                with self.f_lock:
+                    self.f_pending.discard((l_kind, l_path))
+                self.f_queue.task_done()
+
+    def expand(self, priority: int, path: str) -> None:
+        # Imported here: Query imports this package, and the subfolder listing is only needed on a worker.
+        from com.yoclabo.filesystem.query.Query import list_children
+        for l_kind, l_path in get_file_tasks(list_children(path))[:FIRST_PAGE_SIZE]:
+            self.submit(priority + 1, l_kind, l_path)
+        return
+
+    def statistics(self) -> dict:
+        return {
+            'workers': self.f_workers,
+            'queued': self.f_queue.qsize(),
+            'done': self.f_done,
+            'failed': self.f_failed,
+            'dropped': self.f_dropped,
+        }
+
+
+prewarmer = Prewarmer(
+    env.int('THUMBNAIL_PREWARM_WORKERS', default=0),
+    env.int('THUMBNAIL_PREWARM_QUEUE_SIZE', default=1000),
+    env.bool('THUMBNAIL_PREWARM_PROCESSES', default=False),
+)
+
+
+def get_file_tasks(entries: list) -> list:
+    # Documents and clips are only queued when their renderer is installed; without it the tile
+    # shows a placeholder and there is nothing to warm.
+    from com.yoclabo.filesystem.query.Query import ITEM_TYPE_IMAGE, ITEM_TYPE_MEDIA, ITEM_TYPE_PDF
+    l_tasks = {ITEM_TYPE_IMAGE: TASK_IMAGE, ITEM_TYPE_PDF: TASK_PDF, ITEM_TYPE_MEDIA: TASK_MEDIA}
+    l_kinds = Thumbnail.get_kinds()
+    return [(l_tasks[e.type], e.id) for e in entries if l_tasks.get(e.type) in l_kinds]
+
+
+def schedule_files(priority: int, entries: list) -> None:
+    for l_kind, l_path in get_file_tasks(entries):
+        prewarmer.submit(priority, l_kind, l_path)
+    return
+
+
+def schedule_directories(priority: int, paths: list) -> None:
+    for p in paths:
+        prewarmer.submit(priority, TASK_DIRECTORY, p)
+    return
+
+
+def statistics() -> dict:
+    return prewarmer.statistics()
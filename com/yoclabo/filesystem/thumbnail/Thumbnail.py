@@ -0,0 +1,262 @@
+#
+# Thumbnail.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import mimetypes
+import os
+import os.path
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import IO, Callable
+
+import environ
+
+from browser.settings import BASE_DIR
+from com.yoclabo.filesystem.media.Transcode import FFMPEG_BINARY
+
+try:
+    from PIL import Image as PILImage, ImageOps
+except ImportError:
+    PILImage = None
+    ImageOps = None
+
+env = environ.Env()
+env.read_env('.env')
+
+THUMBNAIL_DIRECTORY: str = env.str('THUMBNAIL_DIRECTORY', default=os.path.join(BASE_DIR, 'cache', 'thumbnail'))
+
+THUMBNAIL_SIZE: int = env.int('THUMBNAIL_SIZE', default=360)
+
+THUMBNAIL_FORMAT: str = env.str('THUMBNAIL_FORMAT', default='jpeg')
+
+THUMBNAIL_QUALITY: int = env.int('THUMBNAIL_QUALITY', default=80)
+
+# Most ids one batch request may ask for; a tile page is 30.
+THUMBNAIL_BATCH_SIZE: int = env.int('THUMBNAIL_BATCH_SIZE', default=60)
+
+PDFTOPPM_BINARY: str = env.str('PDFTOPPM_BINARY', default='pdftoppm')
+
+# Video poster frames are taken this far in, past the black frames and logos most videos open with.
+THUMBNAIL_POSTER_SECONDS: float = env.float('THUMBNAIL_POSTER_SECONDS', default=10.0)
+
+# ffmpeg and pdftoppm processes running at once in this process; further requests wait for a slot.
+THUMBNAIL_RENDER_WORKERS: int = env.int('THUMBNAIL_RENDER_WORKERS', default=2)
+
+CONTENT_TYPES: dict = {'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+KIND_IMAGE = 'image'
+
+KIND_PDF = 'pdf'
+
+KIND_MEDIA = 'media'
+
+renderers = threading.BoundedSemaphore(THUMBNAIL_RENDER_WORKERS)
+
+
+class Thumbnail:
+
+    def __init__(self, path: str, content_type: str, etag: str) -> None:
+        self.f_path: str = path
+        self.f_content_type: str = content_type
+        self.f_etag: str = etag
+        return
+
+    @property
+    def path(self) -> str:
+        return self.f_path
+
+    @property
+    def content_type(self) -> str:
+        return self.f_content_type
+
+    @property
+    def etag(self) -> str:
+        return self.f_etag
+
+
+def is_available(kind: str = KIND_IMAGE) -> bool:
+    if PILImage is None:
+        return False
+    if kind == KIND_PDF:
+        return shutil.which(PDFTOPPM_BINARY) is not None
+    if kind == KIND_MEDIA:
+        return shutil.which(FFMPEG_BINARY) is not None
+    return True
+
+
+def get_kinds() -> list:
+    return [k for k in [KIND_IMAGE, KIND_PDF, KIND_MEDIA] if is_available(k)]
+
+
+def get_source_directory(source: str) -> str:
+    # All thumbnails of one source share a directory, so invalidating a path is a single rmtree.
+    l_digest = hashlib.sha1(os.path.normpath(source).encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(THUMBNAIL_DIRECTORY, l_digest[:2], l_digest)
+
+
+def get_key(source: str, st: os.stat_result) -> str:
+    l_key = f'{st.st_mtime_ns}:{st.st_size}:{THUMBNAIL_SIZE}:{THUMBNAIL_FORMAT}:{THUMBNAIL_QUALITY}'
+    return hashlib.sha1(l_key.encode()).hexdigest()
+
+
+def get_cache_path(source: str, key: str) -> str:
+    return os.path.join(get_source_directory(source), f'{key}.{THUMBNAIL_FORMAT}')
+
+
+def get_member_directory(source: str, member: str) -> str:
+    # Under the archive's own directory, so invalidating the archive drops its members' thumbnails too.
+    return os.path.join(get_source_directory(source), 'members', hashlib.sha1(member.encode()).hexdigest())
+
+
+def describe(source: str, kind: str = KIND_IMAGE) -> Thumbnail:
+    l_st = os.stat(source)
+    if kind != KIND_IMAGE and not is_available(kind):
+        raise FileNotFoundError(f'no thumbnail renderer for {kind}: {source}')
+    if not is_available():
+        # Without Pillow the original is served as is, still as binary rather than base64.
+        l_type, _ = mimetypes.guess_type(source)
+        return Thumbnail(source, l_type or 'application/octet-stream', f'"{l_st.st_mtime_ns:x}-{l_st.st_size:x}"')
+    l_key = get_key(source, l_st)
+    return Thumbnail(get_cache_path(source, l_key), CONTENT_TYPES[THUMBNAIL_FORMAT], f'"{l_key}"')
+
+
+def get_thumbnail(source: str, kind: str = KIND_IMAGE) -> Thumbnail:
+    l_thumbnail = describe(source, kind)
+    if not os.path.exists(l_thumbnail.path):
+        if kind == KIND_IMAGE:
+            create_thumbnail(source, l_thumbnail.path)
+        else:
+            render_thumbnail(source, l_thumbnail.path, kind)
+        prune(l_thumbnail.path)
+    return l_thumbnail
+
+
+def describe_member(source: str, member: str) -> Thumbnail:
+    l_st = os.stat(source)
+    if not is_available():
+        raise FileNotFoundError(f'no thumbnail renderer for archive members: {source}')
+    l_key = get_key(source, l_st)
+    return Thumbnail(
+        os.path.join(get_member_directory(source, member), f'{l_key}.{THUMBNAIL_FORMAT}'),
+        CONTENT_TYPES[THUMBNAIL_FORMAT], f'"{l_key}"'
+    )
+
+
+def get_member_thumbnail(source: str, member: str, opener: Callable[[], IO[bytes]]) -> Thumbnail:
+    l_thumbnail = describe_member(source, member)
+    if not os.path.exists(l_thumbnail.path):
+        with opener() as f:
+            create_thumbnail(f, l_thumbnail.path)
+        prune(l_thumbnail.path)
+    return l_thumbnail
+
+
+def create_thumbnail(source: str | IO[bytes], destination: str) -> None:
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with PILImage.open(source) as l_image:
+        # draft() lets the JPEG decoder scale by 1/2..1/8 while decoding, which is most of the saving.
+        l_image.draft('RGB', (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        l_thumbnail = ImageOps.exif_transpose(l_image)
+        l_thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        l_thumbnail = flatten(l_thumbnail)
+        save(l_thumbnail, destination)
+    return
+
+
+def render_thumbnail(source: str, destination: str, kind: str) -> None:
+    # The external tool writes a PNG into a scratch directory beside the cache; from there it is
+    # resized and saved exactly like a photo.
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(destination), suffix='.part') as l_directory:
+        l_frame = os.path.join(l_directory, 'frame.png')
+        with renderers:
+            try:
+                if kind == KIND_PDF:
+                    render_pdf(source, l_frame)
+                else:
+                    render_media(source, l_frame)
+            except subprocess.SubprocessError as e:
+                # Reported like an undecodable photo: the tile keeps its placeholder.
+                raise OSError(f'cannot render {source}') from e
+        create_thumbnail(l_frame, destination)
+    return
+
+
+def render_pdf(source: str, destination: str) -> None:
+    # Only page 1, rasterized straight at thumbnail size rather than at print resolution.
+    subprocess.run(
+        [PDFTOPPM_BINARY, '-f', '1', '-l', '1', '-singlefile', '-png', '-scale-to', str(THUMBNAIL_SIZE),
+         source, destination[:-len('.png')]],
+        check=True, capture_output=True, timeout=60
+    )
+    return
+
+
+def render_media(source: str, destination: str) -> None:
+    # -ss before -i seeks in the input. A clip shorter than the poster offset yields no frame,
+    # so it is retried from the start.
+    for l_seconds in [THUMBNAIL_POSTER_SECONDS, 0]:
+        subprocess.run(
+            [FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y', '-ss', str(l_seconds),
+             '-i', source, '-map', '0:v:0', '-frames:v', '1', '-vf', f"scale='min(iw,{THUMBNAIL_SIZE * 2})':-2", destination],
+            check=True, capture_output=True, timeout=60
+        )
+        if os.path.exists(destination):
+            return
+    raise FileNotFoundError(f'no video frame in {source}')
+
+
+def flatten(image: 'PILImage.Image') -> 'PILImage.Image':
+    if image.mode == 'RGB':
+        return image
+    l_rgba = image.convert('RGBA')
+    l_flat = PILImage.new('RGB', l_rgba.size, (255, 255, 255))
+    l_flat.paste(l_rgba, mask=l_rgba.getchannel('A'))
+    return l_flat
+
+
+def save(image: 'PILImage.Image', destination: str) -> None:
+    # Written beside the destination and renamed, so concurrent workers never see a partial file.
+    l_fd, l_temp = tempfile.mkstemp(dir=os.path.dirname(destination), suffix='.part')
+    try:
+        with os.fdopen(l_fd, 'wb') as dest:
+            image.save(dest, THUMBNAIL_FORMAT.upper(), quality=THUMBNAIL_QUALITY)
+        os.replace(l_temp, destination)
+    except BaseException:
+        os.remove(l_temp)
+        raise
+    return
+
+
+def prune(keep: str) -> None:
+    # Thumbnails of older versions of the same source are dropped once the new one exists.
+    for e in os.scandir(os.path.dirname(keep)):
+        if e.path != keep and not e.name.endswith('.part'):
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+    return
+
+
+def invalidate(source: str) -> None:
+    shutil.rmtree(get_source_directory(source), ignore_errors=True)
+    return
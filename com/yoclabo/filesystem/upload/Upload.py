@@ -0,0 +1,182 @@
+#
+# Upload.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import os
+import os.path
+import secrets
+import time
+from typing import IO
+
+import environ
+from django.http import Http404
+from django.utils.text import get_valid_filename
+
+from com.yoclabo.filesystem.cache import ListingCache
+from com.yoclabo.filesystem.query.Query import get_upload_part_name
+from filesystem.models import Upload, UploadChunk
+
+env = environ.Env()
+env.read_env('.env')
+
+UPLOAD_CHUNK_SIZE: int = env.int('UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024)
+
+# Unfinished uploads older than this are removed, temp file included, when the next one starts.
+UPLOAD_EXPIRE_SECONDS: int = env.int('UPLOAD_EXPIRE_SECONDS', default=24 * 60 * 60)
+
+READ_SIZE = 1024 * 1024
+
+
+def get_upload(token: str) -> Upload:
+    l_upload = Upload.objects.filter(token=token).first()
+    if l_upload is None:
+        raise Http404(token)
+    return l_upload
+
+
+def get_chunk_count(upload: Upload) -> int:
+    return -(-upload.size // upload.chunk_size)
+
+
+def describe(token: str) -> dict:
+    l_upload = get_upload(token)
+    return {
+        'token': l_upload.token,
+        'size': l_upload.size,
+        'chunk_size': l_upload.chunk_size,
+        'received': sorted(l_upload.chunks.values_list('index', flat=True)),
+    }
+
+
+def begin(directory: str, name: str, size: int) -> dict:
+    prune()
+    l_name = get_valid_filename(name)
+    if size < 0:
+        raise ValueError(f'invalid size {size}')
+    l_path = os.path.join(directory, l_name)
+    if os.path.exists(l_path):
+        raise FileExistsError(l_path)
+    l_token = secrets.token_urlsafe(24)
+    # Beside the target, so the final rename never crosses a filesystem and the data is written once.
+    # Listings, the index and the watcher leave the part file out.
+    l_temp_path = os.path.join(directory, get_upload_part_name(l_name, l_token))
+    with open(l_temp_path, 'wb') as f:
+        f.truncate(size)
+    Upload.objects.create(
+        token=l_token, path=l_path, temp_path=l_temp_path, size=size, chunk_size=UPLOAD_CHUNK_SIZE,
+        created=time.time(),
+    )
+    ListingCache.invalidate(directory)
+    return describe(l_token)
+
+
+def write_chunk(token: str, offset: int, stream: IO[bytes], sha256: str) -> None:
+    l_upload = get_upload(token)
+    if offset < 0 or offset % l_upload.chunk_size != 0 or l_upload.size <= offset:
+        raise ValueError(f'invalid offset {offset}')
+    l_length = min(l_upload.chunk_size, l_upload.size - offset)
+    l_hash = hashlib.sha256()
+    l_fd = os.open(l_upload.temp_path, os.O_WRONLY)
+    try:
+        l_written = 0
+        while l_written < l_length:
+            l_data = stream.read(min(READ_SIZE, l_length - l_written))
+            if not l_data:
+                break
+            l_hash.update(l_data)
+            os.pwrite(l_fd, l_data, offset + l_written)
+            l_written += len(l_data)
+    finally:
+        os.close(l_fd)
+    l_index = offset // l_upload.chunk_size
+    if l_written != l_length or (sha256 and sha256.lower() != l_hash.hexdigest()):
+        # Whatever was there before has been overwritten, so the chunk counts as missing until resent.
+        UploadChunk.objects.filter(upload=l_upload, index=l_index).delete()
+        if l_written != l_length:
+            raise ValueError(f'expected {l_length} bytes at offset {offset}, received {l_written}')
+        raise ValueError(f'checksum mismatch at offset {offset}')
+    UploadChunk.objects.update_or_create(upload=l_upload, index=l_index, defaults={'sha256': l_hash.hexdigest()})
+    return
+
+
+def verify(upload: Upload, sha256: str) -> None:
+    # One pass over the part file: each chunk is checked against the digest it arrived with, and the
+    # whole against the client's. A chunk that no longer matches counts as missing, so it is resent.
+    l_hash = hashlib.sha256()
+    l_chunks = dict(upload.chunks.values_list('index', 'sha256'))
+    l_corrupt: list = []
+    with open(upload.temp_path, 'rb') as f:
+        for i in range(get_chunk_count(upload)):
+            l_chunk_hash = hashlib.sha256()
+            l_left = min(upload.chunk_size, upload.size - i * upload.chunk_size)
+            while 0 < l_left:
+                l_data = f.read(min(READ_SIZE, l_left))
+                if not l_data:
+                    break
+                l_chunk_hash.update(l_data)
+                l_hash.update(l_data)
+                l_left -= len(l_data)
+            if l_chunk_hash.hexdigest() != l_chunks.get(i):
+                l_corrupt.append(i)
+    if l_corrupt:
+        UploadChunk.objects.filter(upload=upload, index__in=l_corrupt).delete()
+        raise ValueError(f'{len(l_corrupt)} chunks corrupt')
+    if sha256.lower() != l_hash.hexdigest():
+        raise ValueError('checksum mismatch for the whole file')
+    return
+
+
+def complete(token: str, sha256: str = '') -> str:
+    l_upload = get_upload(token)
+    l_missing = get_chunk_count(l_upload) - l_upload.chunks.count()
+    if 0 < l_missing:
+        raise ValueError(f'{l_missing} chunks missing')
+    if os.path.exists(l_upload.path):
+        raise FileExistsError(l_upload.path)
+    if sha256:
+        verify(l_upload, sha256)
+    # The target may appear while the file is verified. os.link refuses an existing name in the
+    # same step that publishes the file, where os.replace would silently overwrite it.
+    os.link(l_upload.temp_path, l_upload.path)
+    os.unlink(l_upload.temp_path)
+    l_upload.delete()
+    ListingCache.invalidate(os.path.dirname(l_upload.path))
+    return l_upload.path
+
+
+def abort(token: str) -> None:
+    l_upload = get_upload(token)
+    remove(l_upload)
+    return
+
+
+def remove(upload: Upload) -> None:
+    try:
+        os.remove(upload.temp_path)
+    except FileNotFoundError:
+        pass
+    upload.delete()
+    ListingCache.invalidate(os.path.dirname(upload.path))
+    return
+
+
+def prune() -> None:
+    for u in Upload.objects.filter(created__lt=time.time() - UPLOAD_EXPIRE_SECONDS):
+        remove(u)
+    return
@@ -0,0 +1,349 @@
+#
+# Watcher.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import os.path
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable
+
+import environ
+
+from browser.settings import BASE_DIR
+from com.yoclabo.filesystem.archive import Archive
+from com.yoclabo.filesystem.cache import ListingCache
+from com.yoclabo.filesystem.index import Content, Index
+from com.yoclabo.filesystem.query.Query import is_upload_part
+from com.yoclabo.filesystem.thumbnail import Thumbnail
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+env = environ.Env()
+env.read_env('.env')
+
+logger = logging.getLogger(__name__)
+
+WATCHER_INOTIFY: bool = env.bool('WATCHER_INOTIFY', default=True)
+
+# Sweep interval for mounts that never deliver inotify events (SMB/CIFS changes made by other clients).
+WATCHER_POLL_SECONDS: float = env.float('WATCHER_POLL_SECONDS', default=300)
+
+WATCHER_COALESCE_SECONDS: float = env.float('WATCHER_COALESCE_SECONDS', default=1.0)
+
+# Held by the one process that runs the watcher, so every gunicorn worker does not sweep the share on its own.
+WATCHER_LOCK_FILE: str = env.str('WATCHER_LOCK_FILE', default=os.path.join(BASE_DIR, 'cache', 'watcher.lock'))
+
+# How often a worker that lost the lock tries again, so the watch moves on when its holder is recycled.
+WATCHER_LOCK_RETRY_SECONDS: float = env.float('WATCHER_LOCK_RETRY_SECONDS', default=30)
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Change:
+
+    def __init__(self) -> None:
+        self.f_directories: set = set()
+        self.f_paths: set = set()
+        return
+
+    @property
+    def directories(self) -> set:
+        return self.f_directories
+
+    @property
+    def paths(self) -> set:
+        return self.f_paths
+
+    def __bool__(self) -> bool:
+        return bool(self.f_directories or self.f_paths)
+
+    def add_entry(self, path: str) -> None:
+        # A changed entry invalidates itself and the listing of the directory holding it.
+        self.f_paths.add(path)
+        self.f_directories.add(os.path.dirname(path))
+        return
+
+
+class Inotify:
+
+    def __init__(self) -> None:
+        l_libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.f_add_watch = l_libc.inotify_add_watch
+        self.f_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.f_fd: int = l_libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.f_fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self.f_watches: dict = {}
+        return
+
+    @property
+    def fd(self) -> int:
+        return self.f_fd
+
+    @property
+    def directories(self) -> list:
+        return list(self.f_watches.values())
+
+    def add_tree(self, path: str) -> None:
+        l_directories: list = [path]
+        while l_directories:
+            l_directory = l_directories.pop()
+            if not self.add(l_directory):
+                return
+            try:
+                with os.scandir(l_directory) as it:
+                    l_directories.extend(e.path for e in it if e.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+        return
+
+    def add(self, path: str) -> bool:
+        l_wd = self.f_add_watch(self.f_fd, os.fsencode(path), WATCH_MASK)
+        if l_wd < 0:
+            # ENOSPC: fs.inotify.max_user_watches is exhausted; the polling sweep covers the rest.
+            l_errno = ctypes.get_errno()
+            logger.warning('inotify watch failed for %s: %s', path, os.strerror(l_errno))
+            return l_errno != errno.ENOSPC
+        self.f_watches[l_wd] = path
+        return True
+
+    def read(self, change: Change) -> bool:
+        # Returns False on queue overflow, when individual events have been lost.
+        try:
+            l_buffer = os.read(self.f_fd, 64 * 1024)
+        except BlockingIOError:
+            return True
+        l_offset = 0
+        while l_offset < len(l_buffer):
+            l_wd, l_mask, _, l_length = EVENT_HEADER.unpack_from(l_buffer, l_offset)
+            l_name = l_buffer[l_offset + EVENT_HEADER.size:l_offset + EVENT_HEADER.size + l_length].rstrip(b'\0')
+            l_offset += EVENT_HEADER.size + l_length
+            if l_mask & IN_Q_OVERFLOW:
+                return False
+            l_directory = self.f_watches.get(l_wd)
+            if l_directory is None:
+                continue
+            if l_mask & IN_IGNORED:
+                del self.f_watches[l_wd]
+                continue
+            if l_mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                change.add_entry(l_directory)
+                continue
+            if is_upload_part(os.fsdecode(l_name)):
+                # Every chunk of an upload closes its part file; only the final rename is a change.
+                continue
+            l_path = os.path.join(l_directory, os.fsdecode(l_name))
+            change.add_entry(l_path)
+            if l_mask & IN_ISDIR and l_mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_tree(l_path)
+        return True
+
+    def close(self) -> None:
+        os.close(self.f_fd)
+        return
+
+
+class Watcher:
+
+    # Events are collected for WATCHER_COALESCE_SECONDS after the first one and then handed to the
+    # listeners as one Change, so a burst like unpacking an archive costs one invalidation per directory.
+    def __init__(self, root: str, listeners: list) -> None:
+        self.f_root: str = os.path.normpath(root)
+        self.f_listeners: list = listeners
+        self.f_inotify: Inotify | None = None
+        self.f_mtimes: dict = {}
+        self.f_thread: threading.Thread | None = None
+        self.f_lock: threading.Lock = threading.Lock()
+        return
+
+    def start(self) -> None:
+        with self.f_lock:
+            if self.f_thread is not None:
+                return
+            self.f_thread = threading.Thread(target=self.run, name='filesystem-watcher', daemon=True)
+            self.f_thread.start()
+        return
+
+    def run(self) -> None:
+        if WATCHER_INOTIFY and sys.platform.startswith('linux'):
+            try:
+                self.f_inotify = Inotify()
+                self.f_inotify.add_tree(self.f_root)
+            except OSError:
+                logger.warning('inotify is not available; falling back to mtime sweeps', exc_info=True)
+                self.f_inotify = None
+        if 0 < WATCHER_POLL_SECONDS:
+            self.sweep(Change())
+        l_change = Change()
+        l_deadline: float | None = None
+        l_next_sweep = time.monotonic() + WATCHER_POLL_SECONDS
+        while True:
+            l_now = time.monotonic()
+            l_timeout = max(0.0, min(
+                l_deadline if l_deadline is not None else float('inf'),
+                l_next_sweep if 0 < WATCHER_POLL_SECONDS else float('inf'),
+                l_now + 60,
+            ) - l_now)
+            if self.f_inotify is not None:
+                l_readable, _, _ = select.select([self.f_inotify.fd], [], [], l_timeout)
+                if l_readable and not self.f_inotify.read(l_change):
+                    l_change.directories.update(self.f_inotify.directories)
+            else:
+                time.sleep(l_timeout)
+            l_now = time.monotonic()
+            if 0 < WATCHER_POLL_SECONDS and l_next_sweep <= l_now:
+                self.sweep(l_change)
+                l_next_sweep = l_now + WATCHER_POLL_SECONDS
+            if l_change and l_deadline is None:
+                l_deadline = l_now + WATCHER_COALESCE_SECONDS
+            if l_deadline is not None and l_deadline <= l_now:
+                self.dispatch(l_change)
+                l_change = Change()
+                l_deadline = None
+
+    def sweep(self, change: Change) -> None:
+        # Only directory mtimes are compared: an entry added, removed or renamed changes its parent's mtime.
+        l_seen: dict = {}
+        l_directories: list = [self.f_root]
+        while l_directories:
+            l_directory = l_directories.pop()
+            try:
+                l_seen[l_directory] = os.stat(l_directory).st_mtime_ns
+                with os.scandir(l_directory) as it:
+                    l_directories.extend(e.path for e in it if e.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+        if self.f_mtimes:
+            for d, m in l_seen.items():
+                if self.f_mtimes.get(d) != m:
+                    change.directories.add(d)
+            for d in self.f_mtimes.keys() - l_seen.keys():
+                change.add_entry(d)
+        self.f_mtimes = l_seen
+        return
+
+    def dispatch(self, change: Change) -> None:
+        for listener in self.f_listeners:
+            try:
+                listener(change)
+            except Exception:
+                logger.warning('watcher listener failed', exc_info=True)
+        return
+
+
+def invalidate_listings(change: Change) -> None:
+    # Published through the shared invalidation log, so every worker's listing cache drops them,
+    # not only the cache of the process running the watcher.
+    ListingCache.invalidate(*sorted(change.directories | change.paths))
+    return
+
+
+def invalidate_thumbnails(change: Change) -> None:
+    for p in change.paths:
+        Thumbnail.invalidate(p)
+        Archive.invalidate(p)
+    return
+
+
+def update_index(change: Change) -> None:
+    for d in sorted(change.directories):
+        Index.update(d)
+    return
+
+
+def update_contents(change: Change) -> None:
+    # Runs after update_index, so the metadata rows it compares against are already current.
+    Content.update(sorted(change.directories))
+    return
+
+
+def get_listeners() -> list:
+    l_listeners: list = [invalidate_listings, invalidate_thumbnails]
+    if Index.is_enabled():
+        l_listeners.append(update_index)
+        if Content.is_watched():
+            l_listeners.append(update_contents)
+    return l_listeners
+
+
+lock = threading.Lock()
+
+lock_fd: int | None = None
+
+watcher: Watcher | None = None
+
+next_attempt: float = 0.0
+
+
+def lock_process(blocking: bool) -> bool:
+    # flock is dropped by the kernel when the holder exits, so a recycled worker or a restarted
+    # watch_filesystem never leaves a stale lock behind.
+    global lock_fd
+    if lock_fd is not None or fcntl is None:
+        return True
+    os.makedirs(os.path.dirname(WATCHER_LOCK_FILE), exist_ok=True)
+    l_fd = os.open(WATCHER_LOCK_FILE, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+    try:
+        fcntl.flock(l_fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(l_fd)
+        return False
+    lock_fd = l_fd
+    return True
+
+
+def start(root: str, listeners: list) -> Watcher | None:
+    # Returns None in every process but the one holding WATCHER_LOCK_FILE. The others try again
+    # at most every WATCHER_LOCK_RETRY_SECONDS.
+    global watcher, next_attempt
+    with lock:
+        if watcher is None and next_attempt <= time.monotonic():
+            if lock_process(False):
+                watcher = Watcher(root, listeners)
+                watcher.start()
+            else:
+                next_attempt = time.monotonic() + WATCHER_LOCK_RETRY_SECONDS
+    return watcher
@@ -0,0 +1,47 @@
+#
+# Executor.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import environ
+from django.db import close_old_connections
+
+env = environ.Env()
+env.read_env('.env')
+
+# Every filesystem call made from an async view goes through this pool. Its size bounds how many
+# SMB round trips are in flight at once, independently of how many clients are connected.
+executor = ThreadPoolExecutor(env.int('ASYNC_IO_WORKERS', default=32), thread_name_prefix='filesystem-io')
+
+
+def run_job(func: Callable, *args, **kwargs) -> Any:
+    # Pool threads live outside Django's request cycle, so nothing else would ever close a database
+    # connection opened by a job; it is closed here, as request_finished does for a sync request.
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(run_job, func, *args, **kwargs))
@@ -0,0 +1,281 @@
+#
+# FileServing.py
+#
+# Copyright 2024 Yuichi Yoshii
+#     吉井雄一 @ 吉井産業  you.65535.kir@gmail.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import mimetypes
+import os
+import re
+import secrets
+import urllib.parse
+from typing import IO, AsyncIterator, Iterator
+
+import environ
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.http.response import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from com.yoclabo.routing.Executor import run_blocking
+from com.yoclabo.setting.Server import get_root_directory_path
+
+env = environ.Env()
+env.read_env('.env')
+
+# Internal nginx location mapped onto ROOT_DIRECTORY (see default.conf). Empty disables the offload.
+X_ACCEL_REDIRECT_LOCATION: str = env.str('X_ACCEL_REDIRECT_LOCATION', default='')
+
+CHUNK_SIZE = 64 * 1024
+
+# Each async read is one executor round trip, so those are made larger.
+ASYNC_CHUNK_SIZE = 512 * 1024
+
+# More ranges than this are answered with the whole body, which is what RFC 9110 allows
+# and keeps a crafted header from turning one request into thousands of seeks.
+MAX_RANGES = 16
+
+RANGE_SPEC = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+class ByteRange:
+
+    def __init__(self, start: int, end: int) -> None:
+        self.f_start: int = start
+        self.f_end: int = end
+        return
+
+    @property
+    def start(self) -> int:
+        return self.f_start
+
+    @property
+    def end(self) -> int:
+        return self.f_end
+
+    @property
+    def length(self) -> int:
+        return self.f_end - self.f_start + 1
+
+    def content_range(self, size: int) -> str:
+        return f'bytes {self.f_start}-{self.f_end}/{size}'
+
+
+def get_content_type(path: str) -> str:
+    t, _ = mimetypes.guess_type(path)
+    return t if t is not None else 'application/octet-stream'
+
+
+def get_etag(st: os.stat_result) -> str:
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def is_not_modified(request: WSGIRequest, etag: str, mtime: float) -> bool:
+    l_if_none_match = request.headers.get('If-None-Match')
+    if l_if_none_match is not None:
+        l_etags = parse_etags(l_if_none_match)
+        return '*' in l_etags or etag.removeprefix('W/') in [e.removeprefix('W/') for e in l_etags]
+    l_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return l_since is not None and int(mtime) <= l_since
+
+
+def is_range_applicable(request: WSGIRequest, etag: str, mtime: float) -> bool:
+    l_if_range = request.headers.get('If-Range')
+    if l_if_range is None:
+        return True
+    if l_if_range.startswith('"'):
+        return l_if_range == etag
+    l_date = parse_http_date_safe(l_if_range)
+    return l_date is not None and int(mtime) <= l_date
+
+
+def parse_range(header: str, size: int) -> list | None:
+    # None means "ignore the header and send everything"; an empty list means unsatisfiable (416).
+    if not header.startswith('bytes='):
+        return None
+    l_ranges: list = []
+    for spec in header[len('bytes='):].split(','):
+        l_match = RANGE_SPEC.match(spec)
+        if l_match is None:
+            return None
+        l_first, l_last = l_match.groups()
+        if l_first == '' and l_last == '':
+            return None
+        if l_first == '':
+            # A suffix of an empty body selects nothing, so it is unsatisfiable like a zero-length one.
+            if int(l_last) == 0 or size == 0:
+                continue
+            l_ranges.append(ByteRange(max(0, size - int(l_last)), size - 1))
+            continue
+        if l_last != '' and int(l_last) < int(l_first):
+            return None
+        if size <= int(l_first):
+            continue
+        l_ranges.append(ByteRange(int(l_first), size - 1 if l_last == '' else min(int(l_last), size - 1)))
+    if MAX_RANGES < len(l_ranges):
+        return None
+    return coalesce(l_ranges)
+
+
+def coalesce(ranges: list) -> list:
+    l_merged: list = []
+    for r in sorted(ranges, key=lambda r: r.start):
+        if l_merged and r.start <= l_merged[-1].end + 1:
+            l_merged[-1] = ByteRange(l_merged[-1].start, max(l_merged[-1].end, r.end))
+        else:
+            l_merged.append(r)
+    return l_merged
+
+
+def iterate_range(f: IO[bytes], byte_range: ByteRange) -> Iterator[bytes]:
+    f.seek(byte_range.start)
+    l_remaining = byte_range.length
+    while 0 < l_remaining:
+        l_chunk = f.read(min(CHUNK_SIZE, l_remaining))
+        if not l_chunk:
+            return
+        l_remaining -= len(l_chunk)
+        yield l_chunk
+
+
+def get_part_header(boundary: str, content_type: str, byte_range: ByteRange, size: int) -> bytes:
+    return (f'\r\n--{boundary}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Range: {byte_range.content_range(size)}\r\n\r\n').encode()
+
+
+def get_multipart_trailer(boundary: str) -> bytes:
+    return f'\r\n--{boundary}--\r\n'.encode()
+
+
+def iterate_multipart(path: str, ranges: list, boundary: str, content_type: str, size: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        for r in ranges:
+            yield get_part_header(boundary, content_type, r, size)
+            yield from iterate_range(f, r)
+        yield get_multipart_trailer(boundary)
+
+
+def iterate_single(path: str, byte_range: ByteRange) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        yield from iterate_range(f, byte_range)
+
+
+async def aiterate_range(fd: int, byte_range: ByteRange) -> AsyncIterator[bytes]:
+    l_offset = byte_range.start
+    while l_offset <= byte_range.end:
+        l_chunk = await run_blocking(os.pread, fd, min(ASYNC_CHUNK_SIZE, byte_range.end - l_offset + 1), l_offset)
+        if not l_chunk:
+            return
+        l_offset += len(l_chunk)
+        yield l_chunk
+
+
+async def aiterate_multipart(path: str, ranges: list, boundary: str, content_type: str, size: int) -> AsyncIterator[bytes]:
+    l_fd = await run_blocking(os.open, path, os.O_RDONLY)
+    try:
+        for r in ranges:
+            yield get_part_header(boundary, content_type, r, size)
+            async for chunk in aiterate_range(l_fd, r):
+                yield chunk
+        yield get_multipart_trailer(boundary)
+    finally:
+        await run_blocking(os.close, l_fd)
+
+
+async def aiterate_single(path: str, byte_range: ByteRange) -> AsyncIterator[bytes]:
+    l_fd = await run_blocking(os.open, path, os.O_RDONLY)
+    try:
+        async for chunk in aiterate_range(l_fd, byte_range):
+            yield chunk
+    finally:
+        await run_blocking(os.close, l_fd)
+
+
+def get_multipart_length(ranges: list, boundary: str, content_type: str, size: int) -> int:
+    return (sum(len(get_part_header(boundary, content_type, r, size)) + r.length for r in ranges)
+            + len(get_multipart_trailer(boundary)))
+
+
+def set_validators(res: HttpResponse, st: os.stat_result) -> HttpResponse:
+    res['Last-Modified'] = http_date(st.st_mtime)
+    res['ETag'] = get_etag(st)
+    res['Accept-Ranges'] = 'bytes'
+    return res
+
+
+def offload_file(path: str, content_type: str) -> HttpResponse:
+    # nginx serves the body with sendfile and answers Range and If-Modified-Since itself;
+    # only the resolved path and the headers it keeps from upstream are sent from here.
+    l_root = os.path.realpath(get_root_directory_path())
+    l_path = os.path.realpath(path)
+    if os.path.commonpath([l_root, l_path]) != l_root or not os.path.isfile(l_path):
+        raise Http404(path)
+    res = HttpResponse(content_type=content_type)
+    res['X-Accel-Redirect'] = X_ACCEL_REDIRECT_LOCATION + urllib.parse.quote(os.path.relpath(l_path, l_root))
+    return res
+
+
+def serve_file(request: WSGIRequest, path: str, content_type: str = None) -> HttpResponse:
+    l_content_type = content_type or get_content_type(path)
+    if X_ACCEL_REDIRECT_LOCATION:
+        return offload_file(path, l_content_type)
+    return build_response(request, path, l_content_type, os.stat(path), False)
+
+
+async def serve_file_async(request: WSGIRequest, path: str, content_type: str = None) -> HttpResponse:
+    l_content_type = content_type or get_content_type(path)
+    if X_ACCEL_REDIRECT_LOCATION:
+        return await run_blocking(offload_file, path, l_content_type)
+    return build_response(request, path, l_content_type, await run_blocking(os.stat, path), True)
+
+
+def build_response(
+        request: WSGIRequest, path: str, content_type: str, st: os.stat_result, asynchronous: bool
+) -> HttpResponse:
+    l_etag = get_etag(st)
+    if is_not_modified(request, l_etag, st.st_mtime):
+        return set_validators(HttpResponseNotModified(), st)
+    l_ranges = None
+    if 'Range' in request.headers and is_range_applicable(request, l_etag, st.st_mtime):
+        l_ranges = parse_range(request.headers['Range'], st.st_size)
+    if l_ranges is None and asynchronous:
+        res = StreamingHttpResponse(aiterate_single(path, ByteRange(0, st.st_size - 1)), content_type=content_type)
+        res['Content-Length'] = str(st.st_size)
+        return set_validators(res, st)
+    if l_ranges is None:
+        # FileResponse hands the open file to the server's file wrapper (sendfile under gunicorn)
+        # and closes it when the response is closed, so no body is ever held in memory.
+        res = FileResponse(open(path, 'rb'), content_type=content_type)
+        res['Content-Length'] = str(st.st_size)
+        return set_validators(res, st)
+    if not l_ranges:
+        res = HttpResponse(status=416)
+        res['Content-Range'] = f'bytes */{st.st_size}'
+        return set_validators(res, st)
+    if 1 == len(l_ranges):
+        l_body = aiterate_single(path, l_ranges[0]) if asynchronous else iterate_single(path, l_ranges[0])
+        res = StreamingHttpResponse(l_body, status=206, content_type=content_type)
+        res['Content-Range'] = l_ranges[0].content_range(st.st_size)
+        res['Content-Length'] = str(l_ranges[0].length)
+        return set_validators(res, st)
+    l_boundary = secrets.token_hex(16)
+    l_body = aiterate_multipart(path, l_ranges, l_boundary, content_type, st.st_size) if asynchronous \
+        else iterate_multipart(path, l_ranges, l_boundary, content_type, st.st_size)
+    res = StreamingHttpResponse(
+        l_body, status=206, content_type=f'multipart/byteranges; boundary={l_boundary}'
+    )
+    res['Content-Length'] = str(get_multipart_length(l_ranges, l_boundary, content_type, st.st_size))
+    return set_validators(res, st)
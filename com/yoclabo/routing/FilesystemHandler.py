@@ -17,29 +17,104 @@
 # limitations under the License.
 #
 
-from typing import IO
+import hashlib
+import json
+import logging
+import math
+import os
+import struct
+import urllib.parse
+from datetime import datetime, timezone
+from typing import IO, Iterator
 
 from django.core.handlers.wsgi import WSGIRequest
-from django.http import FileResponse
-from django.http.response import HttpResponse
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.http.response import HttpResponse, HttpResponseNotModified
 from django.shortcuts import render
+from django.utils.http import parse_etags
 
+from com.yoclabo.filesystem.cache import ListingCache
+from com.yoclabo.filesystem.index import Content
+from com.yoclabo.filesystem.archive import Archive
+from com.yoclabo.filesystem.item.ArchiveItem import ArchiveDirectory, ArchiveMember
 from com.yoclabo.filesystem.item.Item import Item, Directory, File, Text, Image, Pdf, Media
-from com.yoclabo.filesystem.query.Query import ITEM_TYPE_TEXT, ITEM_TYPE_IMAGE, ITEM_TYPE_PDF, ITEM_TYPE_MEDIA
+from com.yoclabo.filesystem.item.SearchResult import SearchResult, ContentSearchResult
+from com.yoclabo.filesystem.query.Query import (
+    ITEM_TYPE_TEXT, ITEM_TYPE_IMAGE, ITEM_TYPE_PDF, ITEM_TYPE_MEDIA, SORT_NAME, SORT_SIZE, SORT_MTIME, SORT_TYPE,
+    get_type_by_name
+)
+from com.yoclabo.filesystem.thumbnail import Prewarm
+from com.yoclabo.filesystem.thumbnail.Thumbnail import THUMBNAIL_BATCH_SIZE, Thumbnail
+from com.yoclabo.filesystem.upload import Upload
+from com.yoclabo.routing import FileServing
+from com.yoclabo.routing.Executor import run_blocking
 
+logger = logging.getLogger(__name__)
 
-def go_to_root(page: int, tile: bool) -> dict:
+
+def go_to_root(page: int, tile: bool, sort: str, descending: bool, show_hidden: bool) -> dict:
     l_d = Directory('', '', 1)
-    l_d.prepare_browse(page, tile)
+    l_d.prepare_browse(page, tile, sort, descending, show_hidden)
     return {'directory': l_d}
 
 
-def go_to_directory(id: str, name: str, page: int, tile: bool) -> dict:
+def go_to_directory(id: str, name: str, page: int, tile: bool, sort: str, descending: bool,
+                    show_hidden: bool) -> dict:
     l_d = Directory(id, name, 1)
-    l_d.prepare_browse(page, tile)
+    l_d.prepare_browse(page, tile, sort, descending, show_hidden)
     return {'directory': l_d}
 
 
+def go_to_archive(id: str, name: str, page: int, tile: bool, sort: str, descending: bool,
+                  show_hidden: bool) -> dict:
+    l_d = ArchiveDirectory(id, name, 1)
+    l_d.prepare_browse(page, tile, sort, descending, show_hidden)
+    return {'directory': l_d}
+
+
+def is_archive_directory(id: str) -> bool:
+    l_m = ArchiveMember(id, '', 1)
+    return l_m.is_directory
+
+
+def open_archive_member(id: str) -> IO[bytes]:
+    l_m = ArchiveMember(id, '', 1)
+    return l_m.get_file_binary_object()
+
+
+def get_archive_member_size(id: str) -> int:
+    l_m = ArchiveMember(id, '', 1)
+    return l_m.size
+
+
+def guess_archive_member_mimetype(id: str) -> type:
+    l_m = ArchiveMember(id, '', 1)
+    return l_m.guess_file_mimetype()
+
+
+def scroll_directory(id: str, name: str, sort: str, descending: bool, show_hidden: bool) -> dict:
+    l_d = Directory(id, name, 1)
+    l_d.prepare_scroll(sort, descending, show_hidden)
+    return {'directory': l_d}
+
+
+def get_directory_version(id: str) -> str:
+    l_d = Directory(id, '', 1)
+    return l_d.version
+
+
+def list_directory(id: str, cursor: str, limit: int | None, sort: str, descending: bool, show_hidden: bool) -> dict:
+    l_d = Directory(id, '', 1)
+    l_d.prepare_listing(cursor, limit, sort, descending, show_hidden)
+    return l_d.listing
+
+
+def get_usage(id: str, limit: int | None) -> dict:
+    l_d = Directory(id, '', 1)
+    l_d.prepare_usage(limit)
+    return l_d.usage
+
+
 def create_directory(id: str, parent_name: str, child_name: str) -> None:
     l_d = Directory(id, parent_name, 1)
     l_d.create_directory(child_name)
@@ -58,6 +133,11 @@ def save_file(id: str, parent_name: str, files: dict) -> None:
     return
 
 
+def begin_upload(id: str, name: str, size: int) -> dict:
+    l_d = Directory(id, '', 1)
+    return l_d.begin_upload(name, size)
+
+
 def rename(parent_id: str, parent_name:str, old_name: str, new_name: str) -> None:
     l_d = Directory(parent_id, parent_name, 1)
     l_d.rename(old_name, new_name)
@@ -80,6 +160,11 @@ def get_file_binary_object(id: str, name: str) -> IO[bytes]:
     return l_f.get_file_binary_object()
 
 
+def get_file_path(id: str, name: str) -> str:
+    l_f = File(id, '', name, 1)
+    return l_f.get_path()
+
+
 def guess_file_mimetype(id: str, name: str) -> type:
     l_f = File(id, '', name, 1)
     return l_f.guess_file_mimetype()
@@ -91,6 +176,27 @@ def view_text(id: str, name: str) -> dict:
     return {'document': l_t}
 
 
+def get_line_window(id: str, start: int, count: int) -> dict:
+    l_t = Text(id, '', 1)
+    return l_t.get_line_window(start, count)
+
+
+def view_tail(id: str, name: str) -> dict:
+    l_t = Text(id, name, 1)
+    l_t.prepare_tail()
+    return {'document': l_t}
+
+
+def follow(id: str, generation: str | None, offset: int | None) -> dict:
+    l_t = Text(id, '', 1)
+    return l_t.follow(generation, offset)
+
+
+async def follow_async(id: str, generation: str | None, offset: int | None, wait: float | None) -> dict:
+    l_t = Text(id, '', 1)
+    return await l_t.follow_async(generation, offset, wait)
+
+
 def update_text_content(id: str, name: str, new_content: str) -> None:
     l_t = Text(id, name, 1)
     l_t.update_text_content(new_content)
@@ -108,9 +214,58 @@ def get_web_encoded_image(id: str) -> str:
     return l_i.get_web_encoded_image()
 
 
-def get_image_bytearray(id: str) -> bytes:
-    l_i = Image(id, '', 1)
-    return l_i.get_image_bytearray()
+def create_thumbnail_source(id: str) -> Image | Pdf | Media | ArchiveMember:
+    if Archive.is_member_path(id):
+        return ArchiveMember(id, '', 1)
+    l_type = get_type_by_name(os.path.basename(id))
+    if l_type == ITEM_TYPE_PDF:
+        return Pdf(id, '', 1)
+    if l_type == ITEM_TYPE_MEDIA:
+        return Media(id, '', 1)
+    return Image(id, '', 1)
+
+
+def describe_thumbnail(id: str) -> Thumbnail:
+    l_i = create_thumbnail_source(id)
+    return l_i.describe_thumbnail()
+
+
+def get_thumbnail(id: str) -> Thumbnail:
+    l_i = create_thumbnail_source(id)
+    return l_i.get_thumbnail()
+
+
+def get_zip_name(id: str, names: list) -> str:
+    l_d = Directory(id, '', 1)
+    return l_d.get_zip_name(names)
+
+
+def iterate_zip(id: str, names: list) -> Iterator[bytes]:
+    l_d = Directory(id, '', 1)
+    return l_d.iterate_zip(names)
+
+
+def pack_frame(header: dict, body: bytes) -> bytes:
+    # One frame per thumbnail: a length-prefixed JSON header, then the length-prefixed image bytes.
+    l_header = json.dumps(header, separators=(',', ':')).encode()
+    return struct.pack('>I', len(l_header)) + l_header + struct.pack('>I', len(body)) + body
+
+
+def iterate_thumbnails(ids: list) -> Iterator[bytes]:
+    for i, id in enumerate(ids):
+        try:
+            l_t = get_thumbnail(id)
+            with open(l_t.path, 'rb') as f:
+                l_body = f.read()
+        except FileNotFoundError:
+            yield pack_frame({'index': i, 'status': 404}, b'')
+            continue
+        except Exception:
+            # A corrupt or hostile image (decompression bomb, bad header) must not cost the rest of the batch.
+            logger.warning('thumbnail failed: %s', id, exc_info=True)
+            yield pack_frame({'index': i, 'status': 500}, b'')
+            continue
+        yield pack_frame({'index': i, 'status': 200, 'type': l_t.content_type, 'etag': l_t.etag}, l_body)
 
 
 def view_pdf(id: str, name: str) -> dict:
@@ -125,6 +280,38 @@ def view_media(id: str, name: str) -> dict:
     return {'document': l_m}
 
 
+def get_playlist(id: str, segment_url: str) -> str:
+    l_m = Media(id, '', 1)
+    return l_m.get_playlist(segment_url)
+
+
+def get_segment(id: str, index: int) -> str:
+    l_m = Media(id, '', 1)
+    return l_m.get_segment(index)
+
+
+def search(query: str, mode: str, types: list, min_size: int | None, max_size: int | None,
+           modified_after: float | None, modified_before: float | None, page: int) -> dict:
+    l_s = SearchResult(query, mode, types, min_size, max_size, modified_after, modified_before, page)
+    l_s.prepare_search()
+    return {'search': l_s}
+
+
+def search_contents(query: str, page: int) -> dict:
+    l_s = ContentSearchResult(query, page)
+    l_s.prepare_search()
+    return {'search': l_s}
+
+
+def get_statistics() -> dict:
+    return {
+        'pid': os.getpid(),
+        'listing_cache': ListingCache.statistics(),
+        'thumbnail_prewarm': Prewarm.statistics(),
+        'content_search': Content.statistics(),
+    }
+
+
 class FilesystemHandler:
 
     def __init__(self, request: WSGIRequest) -> None:
@@ -146,14 +333,46 @@ class FilesystemHandler:
             return self.request.POST.get(name)
         return self.request.GET.get(name)
 
+    def get_int_param(self, name: str, minimum: int | None = None) -> int | None:
+        # A malformed or out-of-range value raises ValueError, which the handlers answer with 400.
+        if not self.get_param(name):
+            return None
+        try:
+            l_value = int(self.get_param(name))
+        except ValueError:
+            raise ValueError(f'{name} must be an integer') from None
+        if minimum is not None and l_value < minimum:
+            raise ValueError(f'{name} must be at least {minimum}')
+        return l_value
+
+    def get_sort(self) -> str:
+        if self.get_param('sort') in [SORT_NAME, SORT_SIZE, SORT_MTIME, SORT_TYPE]:
+            return self.get_param('sort')
+        return SORT_NAME
+
+    def is_descending(self) -> bool:
+        return self.get_param('order') == 'desc'
+
+    def is_showing_hidden(self) -> bool:
+        return self.get_param('hidden') != 'false'
+
     def run(self) -> None:
         pass
 
+    async def run_async(self) -> HttpResponse:
+        # Views without an async body of their own run whole on the bounded I/O pool.
+        return await run_blocking(self.run)
 
-class FilesystemImageBytearrayHandler(FilesystemHandler):
+
+class FilesystemFileBytesHandler(FilesystemHandler):
 
     def run(self) -> HttpResponse:
-        return HttpResponse(get_image_bytearray(self.get_param('id')), content_type='application/octet-stream')
+        return FileServing.serve_file(self.request, get_file_path(self.get_param('id'), self.get_param('name')))
+
+    async def run_async(self) -> HttpResponse:
+        return await FileServing.serve_file_async(
+            self.request, get_file_path(self.get_param('id'), self.get_param('name'))
+        )
 
 
 class FilesystemWebEncodedImageHandler(FilesystemHandler):
@@ -162,6 +381,76 @@ class FilesystemWebEncodedImageHandler(FilesystemHandler):
         return HttpResponse(get_web_encoded_image(self.get_param('id')), content_type='text/plain')
 
 
+class FilesystemThumbnailHandler(FilesystemHandler):
+
+    def run(self) -> HttpResponse | FileResponse:
+        l_t = describe_thumbnail(self.get_param('id'))
+        if l_t.etag in parse_etags(self.request.headers.get('If-None-Match', '')):
+            res = HttpResponseNotModified()
+        else:
+            l_t = get_thumbnail(self.get_param('id'))
+            res = FileResponse(open(l_t.path, 'rb'), content_type=l_t.content_type)
+        res['ETag'] = l_t.etag
+        # The URL does not change when the photo does, so browsers revalidate every time; a hit is a 304.
+        res['Cache-Control'] = 'private, no-cache'
+        return res
+
+
+class FilesystemThumbnailBatchHandler(FilesystemHandler):
+
+    def run(self) -> StreamingHttpResponse:
+        l_ids = [i for i in self.request.GET.getlist('id') if i][:THUMBNAIL_BATCH_SIZE]
+        # Frames are written as each thumbnail is ready, so the first tiles show before the last is resized.
+        res = StreamingHttpResponse(iterate_thumbnails(l_ids), content_type='application/octet-stream')
+        res['Cache-Control'] = 'private, no-cache'
+        return res
+
+
+class FilesystemZipHandler(FilesystemHandler):
+
+    def get_names(self) -> list:
+        if self.request.method == 'POST':
+            return self.request.POST.getlist('name')
+        return self.request.GET.getlist('name')
+
+    def run(self) -> HttpResponse | StreamingHttpResponse:
+        l_names = self.get_names()
+        try:
+            l_content = iterate_zip(self.get_param('id') or '', l_names)
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+        except FileNotFoundError as e:
+            return HttpResponse(str(e), status=404)
+        l_name = get_zip_name(self.get_param('id') or '', l_names)
+        # No Content-Length: the size is only known once the last entry is compressed.
+        res = StreamingHttpResponse(l_content, content_type='application/zip')
+        res['Content-Disposition'] = f"attachment; filename*=UTF-8''{urllib.parse.quote(l_name)}"
+        res['X-Accel-Buffering'] = 'no'
+        return res
+
+
+class FilesystemPlaylistHandler(FilesystemHandler):
+
+    def run(self) -> HttpResponse:
+        l_segment_url = '?id=' + urllib.parse.quote(self.get_param('id')) + '&content=segment'
+        res = HttpResponse(get_playlist(self.get_param('id'), l_segment_url), content_type='application/vnd.apple.mpegurl')
+        res['Cache-Control'] = 'private, no-cache'
+        return res
+
+
+class FilesystemSegmentHandler(FilesystemHandler):
+
+    def run(self) -> HttpResponse | FileResponse:
+        try:
+            l_path = get_segment(self.get_param('id'), int(self.get_param('index')))
+        except ValueError as e:
+            return HttpResponse(str(e), status=404)
+        res = FileResponse(open(l_path, 'rb'), content_type='video/mp2t')
+        # Segment URLs carry the source version, so a cached segment never goes stale.
+        res['Cache-Control'] = 'private, max-age=86400, immutable'
+        return res
+
+
 class FilesystemUpdateTextContentHandler(FilesystemHandler):
 
     def run(self) -> HttpResponse:
@@ -173,6 +462,10 @@ class FilesystemUpdateTextContentHandler(FilesystemHandler):
 class FilesystemDocumentHandler(FilesystemHandler):
 
     def run(self) -> HttpResponse:
+        if self.get_param('type') == ITEM_TYPE_TEXT and self.get_param('view') == 'tail':
+            return render(
+                self.request, 'filesystem/view.html', view_tail(self.get_param('id'), self.get_param('name'))
+            )
         if self.get_param('type') == ITEM_TYPE_TEXT:
             return render(
                 self.request, 'filesystem/view.html', view_text(self.get_param('id'), self.get_param('name'))
@@ -197,15 +490,28 @@ class FilesystemDocumentHandler(FilesystemHandler):
 
 class FilesystemDownloadHandler(FilesystemHandler):
 
-    def run(self) -> FileResponse:
-        f = get_file_binary_object(self.get_param('id'), self.get_param('name'))
+    def get_content_type(self) -> str:
         t = guess_file_mimetype(self.get_param('id'), self.get_param('name'))
         if t is None:
             t = 'application/octet-stream'
-        res = FileResponse(f, t)
+        return t
+
+    def set_content_disposition(self, res: HttpResponse) -> HttpResponse:
         res['Content-Disposition'] = f"attachment; filename={self.get_param('name')}; filename*=UTF-8''{get_quoted_name(self.get_param('id'), self.get_param('type'), self.get_param('name'))}"
         return res
 
+    def run(self) -> HttpResponse:
+        res = FileServing.serve_file(
+            self.request, get_file_path(self.get_param('id'), self.get_param('name')), self.get_content_type()
+        )
+        return self.set_content_disposition(res)
+
+    async def run_async(self) -> HttpResponse:
+        res = await FileServing.serve_file_async(
+            self.request, get_file_path(self.get_param('id'), self.get_param('name')), self.get_content_type()
+        )
+        return self.set_content_disposition(res)
+
 
 class FilesystemFilePostHandler(FilesystemHandler):
 
@@ -216,6 +522,53 @@ class FilesystemFilePostHandler(FilesystemHandler):
         return h.run()
 
 
+class FilesystemUploadHandler(FilesystemHandler):
+
+    # POST id,name,size starts an upload; GET token tells which chunks have arrived; PUT token,offset
+    # carries one chunk as the raw body; POST token,complete=true renames it into place, after checking
+    # the whole file when sha256 is given; DELETE drops it.
+    def get_required_param(self, name: str) -> str:
+        if not self.get_param(name):
+            raise ValueError(f'missing {name}')
+        return self.get_param(name)
+
+    def get_required_int(self, name: str) -> int:
+        try:
+            return int(self.get_required_param(name))
+        except ValueError:
+            raise ValueError(f'invalid {name}: {self.get_param(name)}') from None
+
+    def respond(self) -> HttpResponse:
+        if self.request.method == 'PUT':
+            Upload.write_chunk(
+                self.get_required_param('token'), self.get_required_int('offset'), self.request,
+                self.request.headers.get('X-Chunk-SHA256', '')
+            )
+            return HttpResponse(status=204)
+        if self.request.method == 'DELETE':
+            Upload.abort(self.get_required_param('token'))
+            return HttpResponse(status=204)
+        if self.request.method == 'POST' and self.get_param('complete') == 'true':
+            Upload.complete(self.get_required_param('token'), self.get_param('sha256') or '')
+            return HttpResponse(status=204)
+        if self.request.method == 'POST':
+            return JsonResponse(
+                begin_upload(
+                    self.get_param('id') or '', self.get_required_param('name'), self.get_required_int('size')
+                ),
+                status=201
+            )
+        return JsonResponse(Upload.describe(self.get_required_param('token')))
+
+    def run(self) -> HttpResponse:
+        try:
+            return self.respond()
+        except FileExistsError:
+            return JsonResponse({'error': 'file exists'}, status=409)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+
 class FilesystemCreateTextFileHandler(FilesystemHandler):
 
     def run(self) -> HttpResponse:
@@ -248,6 +601,14 @@ class FilesystemRenameHandler(FilesystemHandler):
 class FilesystemDirectoryHandler(FilesystemHandler):
 
     def run(self) -> HttpResponse:
+        if self.get_param('scroll') == 'true':
+            return render(
+                self.request, 'filesystem/browse.html',
+                scroll_directory(
+                    self.get_param('id'), self.get_param('name'),
+                    self.get_sort(), self.is_descending(), self.is_showing_hidden()
+                )
+            )
         l_page: int = 1
         if self.has_get_param('page'):
             l_page = int(self.get_param('page'))
@@ -256,13 +617,61 @@ class FilesystemDirectoryHandler(FilesystemHandler):
             l_tile = bool(self.get_param('tile'))
         return render(
             self.request, 'filesystem/browse.html',
-            go_to_directory(self.get_param('id'), self.get_param('name'), l_page, l_tile)
+            go_to_directory(
+                self.get_param('id'), self.get_param('name'), l_page, l_tile,
+                self.get_sort(), self.is_descending(), self.is_showing_hidden()
+            )
         )
 
 
+class FilesystemArchiveHandler(FilesystemHandler):
+
+    def browse(self) -> HttpResponse:
+        l_page: int = 1
+        if self.has_get_param('page'):
+            l_page = int(self.get_param('page'))
+        l_tile: bool = False
+        if self.has_get_param('tile'):
+            l_tile = bool(self.get_param('tile'))
+        return render(
+            self.request, 'filesystem/browse.html',
+            go_to_archive(
+                self.get_param('id'), self.get_param('name'), l_page, l_tile,
+                self.get_sort(), self.is_descending(), self.is_showing_hidden()
+            )
+        )
+
+    def serve(self) -> FileResponse:
+        # The member is read in place from the archive, stored data by seeking straight to it.
+        res = FileResponse(
+            open_archive_member(self.get_param('id')),
+            content_type=guess_archive_member_mimetype(self.get_param('id')) or 'application/octet-stream'
+        )
+        if not res.has_header('Content-Length'):
+            res['Content-Length'] = str(get_archive_member_size(self.get_param('id')))
+        return res
+
+    def run(self) -> HttpResponse:
+        try:
+            if is_archive_directory(self.get_param('id')):
+                return self.browse()
+            return self.serve()
+        except (FileNotFoundError, NotADirectoryError) as e:
+            return HttpResponse(str(e), status=404)
+        except PermissionError as e:
+            return HttpResponse(str(e), status=403)
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+
+
 class FilesystemRootDirectoryHandler(FilesystemHandler):
 
     def run(self) -> HttpResponse:
+        if self.get_param('scroll') == 'true':
+            return render(
+                self.request, 'filesystem/browse.html',
+                scroll_directory('', '', self.get_sort(), self.is_descending(), self.is_showing_hidden())
+            )
         l_page: int = 1
         if self.has_get_param('page'):
             l_page = int(self.get_param('page'))
@@ -270,5 +679,129 @@ class FilesystemRootDirectoryHandler(FilesystemHandler):
         if self.has_get_param('tile'):
             l_tile = bool(self.get_param('tile'))
         return render(
-            self.request, 'filesystem/browse.html', go_to_root(l_page, l_tile)
+            self.request, 'filesystem/browse.html',
+            go_to_root(l_page, l_tile, self.get_sort(), self.is_descending(), self.is_showing_hidden())
+        )
+
+
+class FilesystemLinesHandler(FilesystemHandler):
+
+    def run(self) -> HttpResponse:
+        try:
+            l_start = self.get_int_param('start', 0) or 0
+            l_count = self.get_int_param('count', 0)
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+        return JsonResponse(get_line_window(self.get_param('id'), l_start, 100 if l_count is None else l_count))
+
+
+class FilesystemTailHandler(FilesystemHandler):
+
+    # Without generation and offset the answer is the end of the file; with them it is whatever
+    # was appended since. The sync view answers at once; the async one waits until there is some
+    # or the wait runs out.
+    def get_wait(self) -> float | None:
+        if not self.get_param('wait'):
+            return None
+        try:
+            l_wait = float(self.get_param('wait'))
+        except ValueError:
+            raise ValueError('wait must be a number') from None
+        if not math.isfinite(l_wait) or l_wait < 0:
+            raise ValueError('wait must be a number of seconds, at least 0')
+        return l_wait
+
+    def run(self) -> HttpResponse:
+        try:
+            l_offset = self.get_int_param('offset', 0)
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+        return JsonResponse(follow(self.get_param('id'), self.get_param('generation') or None, l_offset))
+
+    async def run_async(self) -> HttpResponse:
+        try:
+            l_offset = self.get_int_param('offset', 0)
+            l_wait = self.get_wait()
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+        return JsonResponse(await follow_async(
+            self.get_param('id'), self.get_param('generation') or None, l_offset, l_wait
+        ))
+
+
+class FilesystemListingHandler(FilesystemHandler):
+
+    def get_etag(self) -> str:
+        # The directory version plus the exact query names one page of one order of one listing.
+        l_key = get_directory_version(self.get_param('id') or '') + '?' + self.request.GET.urlencode()
+        return '"' + hashlib.sha1(l_key.encode()).hexdigest() + '"'
+
+    def run(self) -> HttpResponse:
+        l_etag = self.get_etag()
+        if l_etag in parse_etags(self.request.headers.get('If-None-Match', '')):
+            res = HttpResponseNotModified()
+        else:
+            try:
+                l_limit = self.get_int_param('limit')
+            except ValueError as e:
+                return HttpResponse(str(e), status=400)
+            res = JsonResponse(list_directory(
+                self.get_param('id') or '', self.get_param('cursor') or '', l_limit,
+                self.get_sort(), self.is_descending(), self.is_showing_hidden()
+            ))
+        res['ETag'] = l_etag
+        res['Cache-Control'] = 'private, no-cache'
+        return res
+
+
+class FilesystemUsageHandler(FilesystemHandler):
+
+    def run(self) -> HttpResponse:
+        try:
+            return JsonResponse(get_usage(
+                self.get_param('id') or '', int(self.get_param('limit')) if self.get_param('limit') else None
+            ))
+        except FileNotFoundError as e:
+            return HttpResponse(str(e), status=404)
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+
+
+class FilesystemStatisticsHandler(FilesystemHandler):
+
+    def run(self) -> JsonResponse:
+        return JsonResponse(get_statistics())
+
+
+class FilesystemSearchHandler(FilesystemHandler):
+
+    def get_date_param(self, name: str) -> float | None:
+        if not self.get_param(name):
+            return None
+        try:
+            l_date = datetime.fromisoformat(self.get_param(name))
+        except ValueError:
+            raise ValueError(f'{name} must be an ISO 8601 date') from None
+        return l_date.replace(tzinfo=timezone.utc).timestamp()
+
+    def run(self) -> HttpResponse:
+        try:
+            return self.respond()
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+
+    def respond(self) -> HttpResponse:
+        l_page: int = self.get_int_param('page', 1) or 1
+        l_parameters = self.request.GET.copy()
+        l_parameters.pop('page', None)
+        if self.get_param('mode') == 'contents':
+            l_context = search_contents(self.get_param('q') or '', l_page)
+            l_context['parameters'] = l_parameters.urlencode()
+            return render(self.request, 'filesystem/content_search.html', l_context)
+        l_context = search(
+            self.get_param('q') or '', self.get_param('mode') or 'substring', [t for t in self.request.GET.getlist('type') if t],
+            self.get_int_param('min_size', 0), self.get_int_param('max_size', 0),
+            self.get_date_param('after'), self.get_date_param('before'), l_page
         )
+        l_context['parameters'] = l_parameters.urlencode()
+        return render(self.request, 'filesystem/search.html', l_context)
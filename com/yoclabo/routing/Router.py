@@ -21,8 +21,10 @@ from django.core.handlers.wsgi import WSGIRequest
 from django.http import FileResponse
 from django.http.response import HttpResponse
 
-from com.yoclabo.filesystem.query.Query import ITEM_TYPE_DIRECTORY, ITEM_TYPE_IMAGE
+from com.yoclabo.filesystem.archive import Archive
+from com.yoclabo.filesystem.query.Query import ITEM_TYPE_DIRECTORY, ITEM_TYPE_IMAGE, ITEM_TYPE_ARCHIVE
 from com.yoclabo.routing import BrowserHandler, FilesystemHandler
+from com.yoclabo.routing.Executor import run_blocking
 
 
 def run_browser_handler(handler: BrowserHandler) -> HttpResponse:
@@ -33,6 +35,10 @@ def run_filesystem_handler(handler: FilesystemHandler) -> HttpResponse | FileRes
     return handler.run()
 
 
+async def run_filesystem_handler_async(handler: FilesystemHandler) -> HttpResponse | FileResponse:
+    return await handler.run_async()
+
+
 class Router:
 
     def __init__(self, request: WSGIRequest) -> None:
@@ -119,7 +125,7 @@ class FilesystemRouter(Router):
             return False
         return True
 
-    def is_image_bytearray_get(self) -> bool:
+    def is_file_bytes_get(self) -> bool:
         if not self.has_get_param('id'):
             return False
         if not self.has_get_param('content'):
@@ -128,6 +134,40 @@ class FilesystemRouter(Router):
             return False
         return True
 
+    def is_thumbnail_get(self) -> bool:
+        if not self.has_get_param('id'):
+            return False
+        if not self.has_get_param('content'):
+            return False
+        if self.get_param('content') != 'thumbnail':
+            return False
+        return True
+
+    def is_archive_get(self) -> bool:
+        if not self.has_get_param('id'):
+            return False
+        if self.get_param('content') == 'thumbnail':
+            return False
+        if self.get_param('type') == ITEM_TYPE_ARCHIVE:
+            return True
+        return Archive.is_member_path(self.get_param('id'))
+
+    def is_playlist_get(self) -> bool:
+        if not self.has_get_param('id'):
+            return False
+        if self.get_param('content') != 'playlist':
+            return False
+        return True
+
+    def is_segment_get(self) -> bool:
+        if not self.has_get_param('id'):
+            return False
+        if self.get_param('content') != 'segment':
+            return False
+        if not self.has_get_param('index'):
+            return False
+        return True
+
     def is_web_encoded_image_get(self) -> bool:
         if not self.has_get_param('id'):
             return False
@@ -178,8 +218,24 @@ class FilesystemRouter(Router):
         h = FilesystemHandler.FilesystemUpdateTextContentHandler(self.request)
         return run_filesystem_handler(h)
 
-    def respond_image_bytearray(self) -> HttpResponse:
-        h = FilesystemHandler.FilesystemImageBytearrayHandler(self.request)
+    def respond_file_bytes(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemFileBytesHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_thumbnail(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemThumbnailHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_archive(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemArchiveHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_playlist(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemPlaylistHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_segment(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemSegmentHandler(self.request)
         return run_filesystem_handler(h)
 
     def respond_web_encoded_image(self) -> HttpResponse:
@@ -202,6 +258,42 @@ class FilesystemRouter(Router):
         h = FilesystemHandler.FilesystemDirectoryHandler(self.request)
         return run_filesystem_handler(h)
 
+    def respond_upload(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemUploadHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_zip(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemZipHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_thumbnails(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemThumbnailBatchHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_tail(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemTailHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_lines(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemLinesHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_listing(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemListingHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_usage(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemUsageHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_statistics(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemStatisticsHandler(self.request)
+        return run_filesystem_handler(h)
+
+    def respond_search(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemSearchHandler(self.request)
+        return run_filesystem_handler(h)
+
     def respond_root(self) -> HttpResponse:
         h = FilesystemHandler.FilesystemRootDirectoryHandler(self.request)
         return run_filesystem_handler(h)
@@ -217,8 +309,16 @@ class FilesystemRouter(Router):
             return self.respond_create_text_file()
         if self.is_create_directory_post():
             return self.respond_create_directory()
-        if self.is_image_bytearray_get():
-            return self.respond_image_bytearray()
+        if self.is_archive_get():
+            return self.respond_archive()
+        if self.is_file_bytes_get():
+            return self.respond_file_bytes()
+        if self.is_thumbnail_get():
+            return self.respond_thumbnail()
+        if self.is_playlist_get():
+            return self.respond_playlist()
+        if self.is_segment_get():
+            return self.respond_segment()
         if self.is_web_encoded_image_get():
             return self.respond_web_encoded_image()
         if self.is_document_get():
@@ -232,3 +332,45 @@ class FilesystemRouter(Router):
 
     def download(self) -> FileResponse:
         return self.respond_file_download()
+
+    def upload(self) -> HttpResponse:
+        return self.respond_upload()
+
+    def thumbnails(self) -> HttpResponse:
+        return self.respond_thumbnails()
+
+    def zip(self) -> HttpResponse:
+        return self.respond_zip()
+
+    def tail(self) -> HttpResponse:
+        return self.respond_tail()
+
+    def lines(self) -> HttpResponse:
+        return self.respond_lines()
+
+    def listing(self) -> HttpResponse:
+        return self.respond_listing()
+
+    def usage(self) -> HttpResponse:
+        return self.respond_usage()
+
+    def statistics(self) -> HttpResponse:
+        return self.respond_statistics()
+
+    def search(self) -> HttpResponse:
+        return self.respond_search()
+
+    async def run_async(self) -> HttpResponse:
+        if self.is_file_bytes_get() and not self.is_archive_get():
+            h = FilesystemHandler.FilesystemFileBytesHandler(self.request)
+            return await run_filesystem_handler_async(h)
+        # Directory, text and form views: routing and rendering run on the bounded I/O pool.
+        return await run_blocking(self.run)
+
+    async def download_async(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemDownloadHandler(self.request)
+        return await run_filesystem_handler_async(h)
+
+    async def tail_async(self) -> HttpResponse:
+        h = FilesystemHandler.FilesystemTailHandler(self.request)
+        return await run_filesystem_handler_async(h)
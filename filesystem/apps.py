@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+
+
+def start_watcher(**kwargs) -> None:
+    from com.yoclabo.filesystem.watch import Watcher
+    from com.yoclabo.setting.Server import get_root_directory_path
+    # Only the worker holding the watcher lock runs it. The others keep trying on later requests,
+    # so the watch moves on when that worker is recycled.
+    if Watcher.start(get_root_directory_path(), Watcher.get_listeners()) is not None:
+        request_started.disconnect(start_watcher, dispatch_uid='filesystem-watcher')
 
 
 class FilesystemConfig(AppConfig):
     name = 'filesystem'
+
+    def ready(self) -> None:
+        # Started on the first request rather than here, so migrate and other commands never spawn it.
+        if settings.FILESYSTEM_WATCHER:
+            request_started.connect(start_watcher, dispatch_uid='filesystem-watcher')
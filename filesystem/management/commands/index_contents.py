@@ -0,0 +1,19 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from com.yoclabo.filesystem.index import Content
+
+
+class Command(BaseCommand):
+    help = 'Extracts the text of indexed text and PDF files into the full-text content index.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of extraction processes.')
+
+    def handle(self, *args, **options) -> None:
+        l_statistics = Content.refresh(options['workers'])
+        self.stdout.write(
+            f"{l_statistics['indexed']} files indexed, {l_statistics['failed']} failed, "
+            f"{l_statistics['removed']} removed."
+        )
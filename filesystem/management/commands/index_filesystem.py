@@ -0,0 +1,22 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from com.yoclabo.filesystem.index import Index
+from com.yoclabo.filesystem.query.Query import get_path_from_root_directory
+
+
+class Command(BaseCommand):
+    help = 'Builds or incrementally refreshes the metadata index of ROOT_DIRECTORY.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('id', nargs='?', default='', help='Directory relative to ROOT_DIRECTORY.')
+        parser.add_argument('--workers', type=int, default=(os.cpu_count() or 1) * 4,
+                            help='Number of directory-reading threads.')
+
+    def handle(self, *args, **options) -> None:
+        l_statistics = Index.refresh(get_path_from_root_directory(options['id']), options['workers'])
+        self.stdout.write(
+            f"{l_statistics['directories']} directories: {l_statistics['scanned']} scanned, "
+            f"{l_statistics['unchanged']} unchanged, {l_statistics['failed']} failed."
+        )
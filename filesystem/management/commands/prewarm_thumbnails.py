@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from django.core.management.base import BaseCommand
+
+from com.yoclabo.filesystem.query.Query import (
+    ITEM_TYPE_DIRECTORY, ITEM_TYPE_IMAGE, get_path_from_root_directory, scan_children
+)
+from com.yoclabo.filesystem.thumbnail import Thumbnail
+from com.yoclabo.filesystem.thumbnail.Prewarm import warm
+
+
+class Command(BaseCommand):
+    help = 'Generates the tile thumbnails of a directory ahead of the first visit.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('id', nargs='?', default='', help='Directory relative to ROOT_DIRECTORY.')
+        parser.add_argument('--recursive', action='store_true', help='Descend into subdirectories.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes.')
+
+    def handle(self, *args, **options) -> None:
+        if not Thumbnail.is_available():
+            self.stderr.write('Pillow is not installed; there is nothing to prewarm.')
+            return
+        l_done: int = 0
+        l_failed: int = 0
+        l_in_flight: set = set()
+        # In-flight futures are capped so walking a huge tree does not queue millions of tasks up front.
+        l_limit: int = options['workers'] * 4
+        with ProcessPoolExecutor(options['workers']) as executor:
+            for path in self.walk(get_path_from_root_directory(options['id']), options['recursive']):
+                if l_limit <= len(l_in_flight):
+                    l_finished, l_in_flight = wait(l_in_flight, return_when=FIRST_COMPLETED)
+                    l_failed += sum(1 for f in l_finished if f.exception() is not None)
+                    l_done += len(l_finished)
+                l_in_flight.add(executor.submit(warm, path))
+            l_failed += sum(1 for f in l_in_flight if f.exception() is not None)
+            l_done += len(l_in_flight)
+        self.stdout.write(f'{l_done - l_failed} thumbnails ready, {l_failed} failed.')
+
+    @staticmethod
+    def walk(path: str, recursive: bool):
+        l_directories: list = [path]
+        while l_directories:
+            l_directory = l_directories.pop()
+            try:
+                l_children = scan_children(l_directory)
+            except OSError:
+                continue
+            for e in l_children:
+                if e.type == ITEM_TYPE_IMAGE:
+                    yield e.id
+                elif e.type == ITEM_TYPE_DIRECTORY and recursive:
+                    l_directories.append(e.id)
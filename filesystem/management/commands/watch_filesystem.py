@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from com.yoclabo.filesystem.watch import Watcher
+from com.yoclabo.setting.Server import get_root_directory_path
+
+
+class Command(BaseCommand):
+    help = 'Watches ROOT_DIRECTORY and keeps the metadata index and thumbnail cache up to date.'
+
+    def handle(self, *args, **options) -> None:
+        if not Watcher.lock_process(False):
+            self.stdout.write(f'Another process holds {Watcher.WATCHER_LOCK_FILE}; waiting for it to exit.')
+            Watcher.lock_process(True)
+        Watcher.Watcher(get_root_directory_path(), Watcher.get_listeners()).run()
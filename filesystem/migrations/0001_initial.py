@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Node',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.TextField(unique=True)),
+                ('parent', models.TextField()),
+                ('name', models.TextField()),
+                ('kind', models.CharField(max_length=16)),
+                ('type', models.CharField(max_length=16)),
+                ('size', models.BigIntegerField(default=0)),
+                ('mtime', models.FloatField(default=0)),
+                ('scanned_mtime_ns', models.BigIntegerField(null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['parent', 'kind', 'name'], name='filesystem_node_listing')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# Trigram full-text table over Node.name. It is an external-content table kept in step with
+# filesystem_node by triggers, so the crawler and the watcher need no extra writes.
+CREATE = [
+    """
+    CREATE VIRTUAL TABLE filesystem_node_name USING fts5(
+        name, content='filesystem_node', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER filesystem_node_name_insert AFTER INSERT ON filesystem_node BEGIN
+        INSERT INTO filesystem_node_name(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER filesystem_node_name_delete AFTER DELETE ON filesystem_node BEGIN
+        INSERT INTO filesystem_node_name(filesystem_node_name, rowid, name) VALUES ('delete', old.id, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER filesystem_node_name_update AFTER UPDATE OF name ON filesystem_node BEGIN
+        INSERT INTO filesystem_node_name(filesystem_node_name, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO filesystem_node_name(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    "INSERT INTO filesystem_node_name(filesystem_node_name) VALUES ('rebuild')",
+]
+
+DROP = [
+    'DROP TRIGGER filesystem_node_name_update',
+    'DROP TRIGGER filesystem_node_name_delete',
+    'DROP TRIGGER filesystem_node_name_insert',
+    'DROP TABLE filesystem_node_name',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filesystem', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE, DROP),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+# Extracted text lives in its own FTS5 table (the trigram tokenizer also matches Japanese, which
+# has no word separators); rows share their rowid with filesystem_contentdocument.
+CREATE = [
+    "CREATE VIRTUAL TABLE filesystem_content_text USING fts5(body, tokenize='trigram')",
+    """
+    CREATE TRIGGER filesystem_content_text_delete AFTER DELETE ON filesystem_contentdocument BEGIN
+        DELETE FROM filesystem_content_text WHERE rowid = old.id;
+    END
+    """,
+]
+
+DROP = [
+    'DROP TRIGGER filesystem_content_text_delete',
+    'DROP TABLE filesystem_content_text',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filesystem', '0002_node_name_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.TextField(unique=True)),
+                ('mtime', models.FloatField(default=0)),
+                ('size', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(CREATE, DROP),
+    ]
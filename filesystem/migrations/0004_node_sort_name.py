@@ -0,0 +1,72 @@
+# Generated by Django 5.2 on 2026-10-18 07:17
+
+import re
+
+from django.db import migrations, models
+
+# The triggers that keep filesystem_node_name in step with filesystem_node, as 0002 created them.
+# SQLite adds a column by rebuilding the table, which drops its triggers, so they are put back here.
+NAME_INDEX_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS filesystem_node_name_insert AFTER INSERT ON filesystem_node BEGIN
+        INSERT INTO filesystem_node_name(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS filesystem_node_name_delete AFTER DELETE ON filesystem_node BEGIN
+        INSERT INTO filesystem_node_name(filesystem_node_name, rowid, name) VALUES ('delete', old.id, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS filesystem_node_name_update AFTER UPDATE OF name ON filesystem_node BEGIN
+        INSERT INTO filesystem_node_name(filesystem_node_name, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO filesystem_node_name(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+]
+
+NAME_INDEX_REBUILD = "INSERT INTO filesystem_node_name(filesystem_node_name) VALUES ('rebuild')"
+
+NATURAL_NUMBER = re.compile(r'\d+')
+
+
+def get_sort_name(name: str) -> str:
+    # Query.get_sort_name as of this migration: case folded, digit runs zero-padded to 20.
+    return NATURAL_NUMBER.sub(lambda m: m.group().zfill(20), name.casefold())
+
+
+def fill_sort_name(apps, schema_editor):
+    # Rows already crawled get their key here, so the index stays usable without a full re-crawl.
+    Node = apps.get_model('filesystem', 'Node')
+    l_nodes = []
+    for n in Node.objects.only('id', 'name').iterator(chunk_size=2000):
+        n.sort_name = get_sort_name(n.name)
+        l_nodes.append(n)
+        if 2000 <= len(l_nodes):
+            Node.objects.bulk_update(l_nodes, ['sort_name'])
+            l_nodes = []
+    Node.objects.bulk_update(l_nodes, ['sort_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filesystem', '0003_content_document'),
+    ]
+
+    operations = [
+        # Adding and removing the column both rebuild filesystem_node and lose the name index
+        # triggers; they are put back after either direction.
+        migrations.RunSQL(migrations.RunSQL.noop, NAME_INDEX_TRIGGERS + [NAME_INDEX_REBUILD]),
+        migrations.AddField(
+            model_name='node',
+            name='sort_name',
+            field=models.TextField(default=''),
+        ),
+        migrations.RunSQL(NAME_INDEX_TRIGGERS + [NAME_INDEX_REBUILD], migrations.RunSQL.noop),
+        migrations.RunPython(fill_sort_name, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='node',
+            index=models.Index(fields=['parent', 'kind', 'sort_name'], name='filesystem_node_sorted'),
+        ),
+    ]
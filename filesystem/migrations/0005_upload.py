@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 07:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filesystem', '0004_node_sort_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, unique=True)),
+                ('path', models.TextField()),
+                ('temp_path', models.TextField()),
+                ('size', models.BigIntegerField()),
+                ('chunk_size', models.IntegerField()),
+                ('created', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UploadChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='filesystem.upload')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('upload', 'index'), name='filesystem_upload_chunk')],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2 on 2026-10-18 08:02
+
+import os
+
+from django.db import migrations, models
+from django.db.models import F, Max, Sum
+from django.db.models.functions import Greatest
+
+# The triggers that keep filesystem_node_name in step with filesystem_node, as 0002 created them.
+# SQLite adds a column by rebuilding the table, which drops its triggers, so they are put back here.
+NAME_INDEX_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS filesystem_node_name_insert AFTER INSERT ON filesystem_node BEGIN
+        INSERT INTO filesystem_node_name(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS filesystem_node_name_delete AFTER DELETE ON filesystem_node BEGIN
+        INSERT INTO filesystem_node_name(filesystem_node_name, rowid, name) VALUES ('delete', old.id, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS filesystem_node_name_update AFTER UPDATE OF name ON filesystem_node BEGIN
+        INSERT INTO filesystem_node_name(filesystem_node_name, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO filesystem_node_name(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+]
+
+NAME_INDEX_REBUILD = "INSERT INTO filesystem_node_name(filesystem_node_name) VALUES ('rebuild')"
+
+
+def fill_rollup(apps, schema_editor):
+    # File rows count themselves; directories are then rolled up deepest first, so the index
+    # carries subtree totals without a re-crawl.
+    Node = apps.get_model('filesystem', 'Node')
+    Node.objects.filter(kind='file').update(file_count=1, newest_mtime=F('mtime'))
+    l_directories = list(Node.objects.filter(kind='directory').values_list('path', flat=True))
+    l_directories.sort(key=lambda p: p.count(os.sep), reverse=True)
+    for d in l_directories:
+        l_totals = Node.objects.filter(parent=d).aggregate(
+            size=Sum('size'), file_count=Sum('file_count'), newest_mtime=Max('newest_mtime')
+        )
+        Node.objects.filter(path=d).update(
+            size=l_totals['size'] or 0, file_count=l_totals['file_count'] or 0,
+            newest_mtime=Greatest(F('mtime'), models.Value(l_totals['newest_mtime'] or 0.0)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filesystem', '0005_upload'),
+    ]
+
+    operations = [
+        # Both columns are added by rebuilding filesystem_node, which drops the name index triggers;
+        # they are put back after either direction.
+        migrations.RunSQL(migrations.RunSQL.noop, NAME_INDEX_TRIGGERS + [NAME_INDEX_REBUILD]),
+        migrations.AddField(
+            model_name='node',
+            name='file_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='newest_mtime',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunSQL(NAME_INDEX_TRIGGERS + [NAME_INDEX_REBUILD], migrations.RunSQL.noop),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='node',
+            index=models.Index(fields=['kind', 'size'], name='filesystem_node_usage'),
+        ),
+    ]
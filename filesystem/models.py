@@ -0,0 +1,58 @@
+from django.db import models
+
+
+class Node(models.Model):
+    path = models.TextField(unique=True)
+    parent = models.TextField()
+    name = models.TextField()
+    # Natural-order key from Query.get_sort_name, computed once at crawl time.
+    sort_name = models.TextField(default='')
+    # 'directory' sorts before 'file', which gives the directories-first order straight from the index.
+    kind = models.CharField(max_length=16)
+    type = models.CharField(max_length=16)
+    # For directories: bytes in the whole subtree, rolled up from the children.
+    size = models.BigIntegerField(default=0)
+    mtime = models.FloatField(default=0)
+    # For directories: st_mtime_ns of the directory when its children were last indexed.
+    scanned_mtime_ns = models.BigIntegerField(null=True)
+    # Files in the subtree and the newest mtime in it; a file row counts itself, so a directory's
+    # values are plain SUM and MAX over its direct children.
+    file_count = models.BigIntegerField(default=0)
+    newest_mtime = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['parent', 'kind', 'name'], name='filesystem_node_listing'),
+            models.Index(fields=['parent', 'kind', 'sort_name'], name='filesystem_node_sorted'),
+            models.Index(fields=['kind', 'size'], name='filesystem_node_usage'),
+        ]
+
+
+class ContentDocument(models.Model):
+    # One row per text or PDF file whose contents are in the filesystem_content_text full-text table;
+    # the row id is the rowid there. mtime and size tell the indexer when to extract again.
+    path = models.TextField(unique=True)
+    mtime = models.FloatField(default=0)
+    size = models.BigIntegerField(default=0)
+
+
+class Upload(models.Model):
+    # A resumable upload in progress. Chunks are written straight into temp_path, beside path,
+    # which is renamed onto path once every chunk has arrived.
+    token = models.CharField(max_length=64, unique=True)
+    path = models.TextField()
+    temp_path = models.TextField()
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    created = models.FloatField()
+
+
+class UploadChunk(models.Model):
+    upload = models.ForeignKey(Upload, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['upload', 'index'], name='filesystem_upload_chunk'),
+        ]
@@ -0,0 +1,49 @@
+import os
+import os.path
+import shutil
+import tempfile
+from unittest import mock
+
+
+class ShareMixin:
+
+    # A throwaway share: ROOT_DIRECTORY points at a temporary directory for the length of each test.
+    def setUp(self) -> None:
+        super().setUp()
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, True)
+        l_patch = mock.patch.dict(os.environ, {'ROOT_DIRECTORY': self.root})
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        return
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def write(self, name: str, data: bytes | str = b'', mtime: float | None = None) -> str:
+        l_path = self.path(name)
+        os.makedirs(os.path.dirname(l_path), exist_ok=True)
+        with open(l_path, 'wb') as f:
+            f.write(data.encode() if isinstance(data, str) else data)
+        if mtime is not None:
+            os.utime(l_path, (mtime, mtime))
+        return l_path
+
+    def mkdir(self, name: str) -> str:
+        l_path = self.path(name)
+        os.makedirs(l_path, exist_ok=True)
+        return l_path
+
+
+class ThumbnailCacheMixin(ShareMixin):
+
+    # ShareMixin with THUMBNAIL_DIRECTORY in a temporary directory as well.
+    def setUp(self) -> None:
+        super().setUp()
+        from com.yoclabo.filesystem.thumbnail import Thumbnail
+        self.cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache, True)
+        l_patch = mock.patch.object(Thumbnail, 'THUMBNAIL_DIRECTORY', self.cache)
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        return
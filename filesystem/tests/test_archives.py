@@ -0,0 +1,101 @@
+import io
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from com.yoclabo.filesystem.archive import Archive
+from com.yoclabo.filesystem.item.ArchiveItem import ArchiveDirectory, ArchiveMember
+from com.yoclabo.filesystem.query.Query import ITEM_TYPE_ARCHIVE, ITEM_TYPE_DIRECTORY, ITEM_TYPE_OTHER, ITEM_TYPE_TEXT
+from filesystem.tests.support import ShareMixin
+
+
+class ArchivePathTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('photos.zip')
+        self.mkdir('folder.zip')
+        return
+
+    def test_split(self):
+        l_archive = self.path('photos.zip')
+        self.assertEqual(Archive.split(l_archive + '!/2024/a.jpg'), (l_archive, '2024/a.jpg'))
+        self.assertEqual(Archive.split(l_archive + '!/'), (l_archive, ''))
+        self.assertEqual(Archive.split(l_archive), (l_archive, None))
+
+    def test_only_existing_archive_files_are_entered(self):
+        self.assertEqual(Archive.split(self.path('folder.zip!/a')), (self.path('folder.zip!/a'), None))
+        self.assertEqual(Archive.split(self.path('notes.txt!/a')), (self.path('notes.txt!/a'), None))
+        self.assertFalse(Archive.is_member_path(self.path('notes.txt!/a')))
+
+    def test_join_is_the_inverse_of_split(self):
+        l_archive = self.path('photos.zip')
+        self.assertEqual(Archive.split(Archive.join(l_archive, 'a/b.jpg')), (l_archive, 'a/b.jpg'))
+
+    def test_member_names_are_normalised(self):
+        self.assertEqual(Archive.get_member_name('./a/b/'), 'a/b')
+        self.assertEqual(Archive.get_member_name('a\\b.txt'), 'a/b.txt')
+        self.assertEqual(Archive.get_member_name('.'), '')
+
+
+class ArchiveItemTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        l_cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, l_cache, True)
+        l_patch = mock.patch.object(Archive, 'ARCHIVE_CACHE_DIRECTORY', l_cache)
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        with zipfile.ZipFile(self.path('a.zip'), 'w') as z:
+            z.writestr('docs/readme.txt', 'hello')
+            z.writestr('docs/inner.zip', b'PK')
+            z.writestr('top.txt', 'top')
+        l_data = b'tar member'
+        with tarfile.open(self.path('b.tar'), 'w') as t:
+            l_info = tarfile.TarInfo('./dir/file.txt')
+            l_info.size = len(l_data)
+            t.addfile(l_info, io.BytesIO(l_data))
+        return
+
+    def browse(self, id: str) -> ArchiveDirectory:
+        l_d = ArchiveDirectory(id, '', 1)
+        l_d.prepare_browse(1, False)
+        return l_d
+
+    def test_archive_root(self):
+        l_d = self.browse('/a.zip')
+        self.assertEqual(l_d.type, ITEM_TYPE_ARCHIVE)
+        self.assertEqual([(c.name, c.type) for c in l_d.children],
+                         [('docs', ITEM_TYPE_DIRECTORY), ('top.txt', ITEM_TYPE_TEXT)])
+
+    def test_directory_inside_an_archive(self):
+        l_d = self.browse(Archive.join('/a.zip', 'docs'))
+        self.assertEqual(l_d.type, ITEM_TYPE_DIRECTORY)
+        # Nested archives are listed as plain files.
+        self.assertEqual([(c.name, c.type) for c in l_d.children],
+                         [('inner.zip', ITEM_TYPE_OTHER), ('readme.txt', ITEM_TYPE_TEXT)])
+        self.assertEqual([a.name for a in l_d.ancestors][-2:], ['a.zip', 'docs'])
+
+    def test_tar_members(self):
+        l_d = self.browse(Archive.join('/b.tar', 'dir'))
+        self.assertEqual([c.name for c in l_d.children], ['file.txt'])
+
+    def test_member(self):
+        l_m = ArchiveMember(Archive.join('/a.zip', 'docs/readme.txt'), '', 1)
+        self.assertEqual((l_m.name, l_m.type, l_m.size, l_m.is_directory), ('readme.txt', ITEM_TYPE_TEXT, 5, False))
+        with l_m.get_file_binary_object() as f:
+            self.assertEqual(f.read(), b'hello')
+        self.assertTrue(ArchiveMember(Archive.join('/a.zip', 'docs'), '', 1).is_directory)
+
+    def test_browse_and_serve_over_http(self):
+        l_response = self.client.get('/filesystem/', {'id': '/a.zip!/docs', 'name': 'docs'})
+        self.assertEqual(l_response.status_code, 200)
+        self.assertIn(b'readme.txt', l_response.content)
+        l_response = self.client.get('/filesystem/', {'id': '/a.zip!/top.txt', 'name': 'top.txt', 'content': 'bytes'})
+        self.assertEqual(b''.join(l_response.streaming_content), b'top')
+        self.assertEqual(self.client.get('/filesystem/', {'id': '/a.zip!/nope', 'name': 'nope'}).status_code, 404)
@@ -0,0 +1,63 @@
+import asyncio
+from unittest import mock
+
+from django.test import AsyncRequestFactory, TransactionTestCase
+
+from com.yoclabo.routing import Executor
+from filesystem import views
+from filesystem.models import Node
+from filesystem.tests.support import ShareMixin
+
+
+class RunBlockingTest(TransactionTestCase):
+
+    def test_connections_are_closed_around_each_job(self):
+        # The in-memory test database never really closes, so the calls themselves are checked.
+        with mock.patch.object(Executor, 'close_old_connections') as l_close:
+            self.assertTrue(asyncio.run(Executor.run_blocking(lambda: Node.objects.count() == 0)))
+            self.assertEqual(l_close.call_count, 2)
+            with self.assertRaises(ZeroDivisionError):
+                asyncio.run(Executor.run_blocking(lambda: 1 / 0))
+            self.assertEqual(l_close.call_count, 4)
+
+    def test_exceptions_reach_the_caller(self):
+        with self.assertRaises(FileNotFoundError):
+            asyncio.run(Executor.run_blocking(open, '/nonexistent/file'))
+
+
+class AsyncViewTest(ShareMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('a.bin', bytes(range(256)) * 1000)
+        self.factory = AsyncRequestFactory()
+        self.query = {'id': '/a.bin', 'name': 'a.bin'}
+        return
+
+    async def consume(self, response) -> bytes:
+        return b''.join([c async for c in response])
+
+    def test_download_streams_the_file(self):
+        l_response = asyncio.run(views.download_async(self.factory.get('/filesystem/download', self.query)))
+        self.assertEqual(l_response.status_code, 200)
+        self.assertEqual(asyncio.run(self.consume(l_response)), bytes(range(256)) * 1000)
+
+    def test_download_range(self):
+        l_request = self.factory.get('/filesystem/download', self.query, headers={'Range': 'bytes=256-511'})
+        l_response = asyncio.run(views.download_async(l_request))
+        self.assertEqual(l_response.status_code, 206)
+        self.assertEqual(asyncio.run(self.consume(l_response)), bytes(range(256)))
+
+    def test_concurrent_downloads(self):
+        async def download_all():
+            l_responses = await asyncio.gather(*[
+                views.download_async(self.factory.get('/filesystem/download', self.query)) for _ in range(8)
+            ])
+            return await asyncio.gather(*[self.consume(r) for r in l_responses])
+
+        self.assertEqual(set(asyncio.run(download_all())), {bytes(range(256)) * 1000})
+
+    def test_browse_runs_on_the_pool(self):
+        l_response = asyncio.run(views.browse_async(self.factory.get('/filesystem/', {'id': '/'})))
+        self.assertEqual(l_response.status_code, 200)
+        self.assertIn(b'a.bin', l_response.content)
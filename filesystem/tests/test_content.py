@@ -0,0 +1,82 @@
+import os
+from unittest import mock
+
+from django.test import TestCase
+
+from com.yoclabo.filesystem.cache.ListingCache import ListingCache
+from com.yoclabo.filesystem.index import Content, Index
+from com.yoclabo.filesystem.watch import Watcher
+from filesystem.tests.support import ShareMixin
+
+
+class ContentIndexTest(ShareMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('notes/meeting.txt', 'The quarterly budget was approved.\n')
+        self.write('notes/diary.txt', '今日は予算会議がありました。'.encode('cp932'))
+        self.write('notes/markup.txt', '<p>x & y budget</p>')
+        self.write('notes/photo.png', b'budget')
+        Index.refresh(self.root, 2)
+        return
+
+    def paths(self, query: str) -> list:
+        return [os.path.relpath(m.entry.id, self.root) for m in Content.search(query, 0, 10)]
+
+    def test_text_files_are_indexed_and_found(self):
+        l_statistics = Content.refresh(1)
+        self.assertEqual((l_statistics['indexed'], l_statistics['failed']), (3, 0))
+        self.assertEqual(sorted(self.paths('budget')), ['notes/markup.txt', 'notes/meeting.txt'])
+        self.assertEqual(self.paths('予算会議'), ['notes/diary.txt'])
+        l_snippet = Content.search('quarterly', 0, 1)[0].snippet
+        self.assertIn(Content.SNIPPET_OPEN + 'quarterly' + Content.SNIPPET_CLOSE, l_snippet)
+
+    def test_only_changed_files_are_read_again(self):
+        Content.refresh(1)
+        self.assertEqual(Content.refresh(1)['indexed'], 0)
+        # Rewriting a file leaves its directory mtime alone; the watcher reports it as a change instead.
+        self.write('notes/meeting.txt', 'The budget was rejected after all.\n', mtime=1000)
+        Index.update(self.path('notes'))
+        self.assertEqual(Content.refresh(1)['indexed'], 1)
+        self.assertEqual(self.paths('rejected'), ['notes/meeting.txt'])
+
+    def test_deleted_files_leave_the_index(self):
+        Content.refresh(1)
+        os.remove(self.path('notes/meeting.txt'))
+        Index.update(self.path('notes'))
+        self.assertEqual(Content.refresh(1)['removed'], 1)
+        self.assertEqual(self.paths('quarterly'), [])
+
+    def test_extraction_stops_at_the_byte_budget(self):
+        self.write('long.txt', 'あ' * 10)
+        with mock.patch.object(Content, 'CONTENT_INDEX_MAX_BYTES', 10):
+            self.assertEqual(Content.extract_text(self.path('long.txt')), 'あ' * 3)
+
+    def test_quotes_in_the_query_are_not_syntax(self):
+        Content.refresh(1)
+        self.assertEqual(self.paths('"budget'), [])
+
+    def test_snippets_are_escaped_and_marked(self):
+        Content.refresh(1)
+        with mock.patch.object(Index, 'METADATA_INDEX', True):
+            l_response = self.client.get('/filesystem/search', {'q': 'budget', 'mode': 'contents'})
+        self.assertContains(l_response, '<mark>budget</mark>')
+        self.assertContains(l_response, '&lt;p&gt;x &amp; y')
+
+    def test_watcher_keeps_changed_files_current(self):
+        Content.refresh(1)
+        self.write('notes/meeting.txt', 'The budget was rejected after all.\n', mtime=1000)
+        self.write('notes/new/agenda.txt', 'Quarterly planning.\n')
+        os.remove(self.path('notes/diary.txt'))
+        l_change = Watcher.Change()
+        for name in ['notes/meeting.txt', 'notes/new', 'notes/diary.txt']:
+            l_change.add_entry(self.path(name))
+        with mock.patch.object(Index, 'METADATA_INDEX', True), mock.patch.object(Content, 'CONTENT_INDEX_WATCH', True):
+            l_listeners = Watcher.get_listeners()
+        self.assertEqual(l_listeners[-2:], [Watcher.update_index, Watcher.update_contents])
+        with mock.patch.object(Watcher.ListingCache, 'cache', ListingCache(100, 0, False)):
+            Watcher.Watcher(self.root, l_listeners).dispatch(l_change)
+        self.assertEqual(self.paths('rejected'), ['notes/meeting.txt'])
+        self.assertEqual(self.paths('planning'), ['notes/new/agenda.txt'])
+        self.assertEqual(self.paths('予算会議'), [])
+        self.assertEqual(Content.update([self.path('notes')]), {'indexed': 0, 'failed': 0, 'removed': 0})
@@ -0,0 +1,36 @@
+from django.http import FileResponse
+from django.test import SimpleTestCase
+
+from filesystem.tests.support import ShareMixin
+
+DATA = b'\xff\xd8\xff\xe0' + bytes(range(256)) * 400
+
+
+class ImageBytesTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('photo.jpg', DATA)
+        return
+
+    def get(self, **headers):
+        return self.client.get('/filesystem/', {'id': '/photo.jpg', 'name': 'photo.jpg', 'content': 'bytes'},
+                               headers=headers)
+
+    def test_image_is_streamed_from_the_file(self):
+        l_response = self.get()
+        self.assertIsInstance(l_response, FileResponse)
+        self.assertEqual(l_response['Content-Type'], 'image/jpeg')
+        self.assertEqual(l_response['Content-Length'], str(len(DATA)))
+        self.assertIn('ETag', l_response)
+        self.assertEqual(b''.join(l_response.streaming_content), DATA)
+        l_response.close()
+
+    def test_not_modified(self):
+        self.assertEqual(self.get(If_None_Match=self.get()['ETag']).status_code, 304)
+
+    def test_view_page_links_the_bytes_instead_of_inlining_them(self):
+        l_response = self.client.get('/filesystem/', {'id': '/photo.jpg', 'name': 'photo.jpg', 'type': 'image'})
+        self.assertEqual(l_response.status_code, 200)
+        self.assertNotIn(b'data:image/jpeg;base64', l_response.content)
+        self.assertIn(b'content=bytes', l_response.content)
@@ -0,0 +1,91 @@
+import os
+from unittest import mock
+
+from django.test import TestCase
+
+from com.yoclabo.filesystem.index import Index
+from com.yoclabo.filesystem.item import Item
+from filesystem.models import Node
+from filesystem.tests.support import ShareMixin
+
+
+class IndexTest(ShareMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('a/1.txt', b'x' * 10)
+        self.write('a/b/2.txt', b'x' * 20)
+        self.write('a/b/c/3.txt', b'x' * 30)
+        self.write('top.txt')
+        return
+
+    def children(self, name: str) -> list:
+        return [e.name for e in Index.query_children(self.path(name), 0, 100)]
+
+    def touch(self, name: str) -> None:
+        # Bumps the directory mtime for filesystems with a coarse timestamp.
+        l_st = os.stat(self.path(name))
+        os.utime(self.path(name), ns=(l_st.st_atime_ns, l_st.st_mtime_ns + 1000000))
+        return
+
+    def test_refresh_indexes_the_whole_tree(self):
+        l_statistics = Index.refresh(self.root, 2)
+        self.assertEqual((l_statistics['directories'], l_statistics['scanned']), (4, 4))
+        self.assertEqual(self.children(''), ['a', 'top.txt'])
+        self.assertEqual(self.children('a'), ['b', '1.txt'])
+        self.assertEqual(Index.count_children(self.path('a/b')), 2)
+        self.assertTrue(Index.is_fresh(self.path('a')))
+
+    def test_unchanged_directories_are_not_read_again(self):
+        Index.refresh(self.root, 2)
+        self.write('a/b/new.txt')
+        self.touch('a/b')
+        l_statistics = Index.refresh(self.root, 2)
+        self.assertEqual((l_statistics['scanned'], l_statistics['unchanged']), (1, 3))
+        self.assertEqual(self.children('a/b'), ['c', '2.txt', 'new.txt'])
+
+    def test_removed_directories_take_their_subtree_along(self):
+        Index.refresh(self.root, 2)
+        for name in ['a/b/c/3.txt', 'a/b/2.txt']:
+            os.remove(self.path(name))
+        os.rmdir(self.path('a/b/c'))
+        os.rmdir(self.path('a/b'))
+        self.touch('a')
+        Index.refresh(self.root, 2)
+        self.assertFalse(Node.objects.filter(path__startswith=self.path('a/b')).exists())
+
+    def test_update_after_a_change_notification(self):
+        Index.refresh(self.root, 2)
+        self.write('a/d/4.txt', b'x' * 40)
+        Index.update(self.path('a'))
+        self.assertEqual(self.children('a/d'), ['4.txt'])
+        self.assertEqual(Index.get_totals(self.path('a')).size, 100)
+
+    def test_keyset_pages_match_offset_pages(self):
+        for i in range(7):
+            self.write(f'many/f{i}.txt')
+        self.mkdir('many/sub')
+        Index.refresh(self.root, 2)
+        l_names: list = []
+        l_after = None
+        while True:
+            l_page = Index.query_children_after(self.path('many'), l_after, 3)
+            if not l_page:
+                break
+            l_names += [e.name for e in l_page]
+            l_after = Index.get_key(l_page[-1])
+        self.assertEqual(l_names, self.children('many'))
+        self.assertEqual(l_names[0], 'sub')
+
+    def test_directory_lists_from_the_index_while_it_is_fresh(self):
+        Index.refresh(self.root, 2)
+        with mock.patch.object(Index, 'METADATA_INDEX', True):
+            l_d = Item.Directory('/a', 'a', 1)
+            l_d.prepare_browse(1, False)
+            self.assertIsInstance(l_d.f_children_info, Item.IndexedChildren)
+            self.assertEqual([c.name for c in l_d.children], ['b', '1.txt'])
+            self.write('a/fresh.txt')
+            self.touch('a')
+            l_d = Item.Directory('/a', 'a', 1)
+            l_d.prepare_browse(1, False)
+            self.assertIsInstance(l_d.f_children_info, Item.Children)
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from com.yoclabo.filesystem.text import LineIndex
+from filesystem.tests.support import ShareMixin
+
+
+class LineIndexTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache, True)
+        # A tiny stride puts many checkpoints into a small file.
+        for name, value in [('LINE_INDEX_DIRECTORY', self.cache), ('LINE_INDEX_STRIDE', 64),
+                            ('LARGE_TEXT_THRESHOLD', 100)]:
+            l_patch = mock.patch.object(LineIndex, name, value)
+            l_patch.start()
+            self.addCleanup(l_patch.stop)
+        l_patch = mock.patch.object(LineIndex, 'indexes', OrderedDict())
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        self.log = self.write('big.log', ''.join(f'line {i}\n' for i in range(1000)))
+        return
+
+    def test_window_anywhere_in_the_file(self):
+        l_window = LineIndex.get_window(self.log, 500, 3)
+        self.assertEqual(l_window['lines'], ['line 500', 'line 501', 'line 502'])
+        self.assertEqual((l_window['total'], l_window['complete']), (1000, True))
+        self.assertEqual(LineIndex.get_window(self.log, 0, 1)['lines'], ['line 0'])
+        self.assertEqual(LineIndex.get_window(self.log, 999, 10)['lines'], ['line 999'])
+        self.assertEqual(LineIndex.get_window(self.log, 1000, 10)['lines'], [])
+
+    def test_window_size_is_capped(self):
+        with mock.patch.object(LineIndex, 'LINE_WINDOW_MAX_LINES', 5):
+            self.assertEqual(len(LineIndex.get_window(self.log, 0, 100)['lines']), 5)
+
+    def test_trailing_line_without_newline_and_crlf(self):
+        l_path = self.write('crlf.txt', 'a\r\nb\r\nc')
+        self.assertEqual(LineIndex.get_window(l_path, 0, 10), {
+            'start': 0, 'lines': ['a', 'b', 'c'], 'total': 3, 'complete': True, 'scanned': 7, 'size': 7,
+        })
+
+    def test_long_lines_are_cut(self):
+        l_path = self.write('long.txt', 'x' * 100 + '\nshort\n')
+        with mock.patch.object(LineIndex, 'LINE_MAX_BYTES', 10):
+            self.assertEqual(LineIndex.get_window(l_path, 0, 2)['lines'], ['x' * 10, 'short'])
+
+    def test_index_is_saved_and_reused(self):
+        LineIndex.get_index(self.log)
+        LineIndex.indexes.clear()
+        with mock.patch.object(LineIndex.LineIndex, 'scan') as l_scan:
+            self.assertEqual(LineIndex.get_window(self.log, 10, 1)['lines'], ['line 10'])
+        l_scan.assert_not_called()
+
+    def test_a_slow_scan_holds_up_only_its_own_file(self):
+        l_small = self.write('small.log', 'a\nb\n')
+        l_started = threading.Event()
+        l_release = threading.Event()
+        self.addCleanup(l_release.set)
+        l_scan = LineIndex.LineIndex.scan
+        l_scans: list = []
+
+        def scan(index: LineIndex.LineIndex) -> None:
+            l_scans.append(index.path)
+            if index.path == self.log:
+                l_started.set()
+                l_release.wait(5)
+            l_scan(index)
+
+        l_results: list = []
+        with mock.patch.object(LineIndex.LineIndex, 'scan', scan):
+            l_threads = [threading.Thread(target=lambda: l_results.append(LineIndex.get_window(self.log, 0, 1)))
+                         for _ in range(3)]
+            for t in l_threads:
+                t.start()
+            self.assertTrue(l_started.wait(5))
+            l_other = threading.Thread(target=lambda: l_results.append(LineIndex.get_window(l_small, 1, 1)))
+            l_other.start()
+            l_other.join(2)
+            self.assertFalse(l_other.is_alive())
+            self.assertEqual(l_results.pop()['lines'], ['b'])
+            l_release.set()
+            for t in l_threads:
+                t.join()
+        self.assertEqual([r['lines'] for r in l_results], [['line 0']] * 3)
+        self.assertEqual(l_scans.count(self.log), 1)
+
+    def test_changed_file_is_scanned_again(self):
+        LineIndex.get_index(self.log)
+        with open(self.log, 'a') as f:
+            f.write('line 1000\n')
+        os.utime(self.log, ns=(1, 1))
+        self.assertEqual(LineIndex.get_window(self.log, 1000, 1)['lines'], ['line 1000'])
+
+    def test_large_files_open_in_the_paged_viewer(self):
+        l_response = self.client.get('/filesystem/', {'id': '/big.log', 'type': 'text', 'name': 'big.log'})
+        self.assertContains(l_response, 'large-text-viewport')
+        self.assertNotContains(l_response, 'line 999')
+        l_window = self.client.get('/filesystem/lines', {'id': '/big.log', 'start': 42, 'count': 2}).json()
+        self.assertEqual(l_window['lines'], ['line 42', 'line 43'])
+
+    def test_malformed_window_is_a_bad_request(self):
+        for parameters in [{'start': 'x'}, {'start': -1}, {'count': '1.5'}, {'count': -3}]:
+            l_response = self.client.get('/filesystem/lines', {'id': '/big.log', **parameters})
+            self.assertEqual(l_response.status_code, 400)
+        self.assertEqual(l_response.content, b'count must be at least 0')
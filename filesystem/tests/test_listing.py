@@ -0,0 +1,56 @@
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from com.yoclabo.filesystem.query.Query import (
+    ITEM_TYPE_DIRECTORY, ITEM_TYPE_HIDDEN_FILE, ITEM_TYPE_IMAGE, ITEM_TYPE_TEXT, query_children, scan_children
+)
+from filesystem.tests.support import ShareMixin
+
+
+class ScanChildrenTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('b.txt', b'12345', mtime=1000)
+        self.write('a.jpg', b'1', mtime=2000)
+        self.write('.hidden')
+        self.mkdir('z dir')
+        self.mkdir('a dir')
+        os.symlink(self.path('b.txt'), self.path('link.txt'))
+        os.symlink(self.path('missing'), self.path('broken.txt'))
+        return
+
+    def test_directories_first_then_files_by_name(self):
+        self.assertEqual([e.name for e in scan_children(self.root)],
+                         ['a dir', 'z dir', '.hidden', 'a.jpg', 'b.txt', 'link.txt'])
+
+    def test_entries_carry_type_size_and_mtime(self):
+        l_entries = {e.name: e for e in scan_children(self.root)}
+        self.assertEqual(l_entries['a dir'].type, ITEM_TYPE_DIRECTORY)
+        self.assertEqual(l_entries['.hidden'].type, ITEM_TYPE_HIDDEN_FILE)
+        self.assertEqual((l_entries['b.txt'].type, l_entries['b.txt'].size, l_entries['b.txt'].mtime),
+                         (ITEM_TYPE_TEXT, 5, 1000))
+        self.assertEqual((l_entries['a.jpg'].type, l_entries['a.jpg'].id), (ITEM_TYPE_IMAGE, self.path('a.jpg')))
+
+    def test_symlinks_are_followed_and_broken_ones_skipped(self):
+        l_entries = {e.name: e for e in scan_children(self.root)}
+        self.assertEqual(l_entries['link.txt'].size, 5)
+        self.assertNotIn('broken.txt', l_entries)
+
+    def test_one_readdir_pass_without_path_lookups(self):
+        # Types and sizes come from the DirEntry objects; nothing is looked up again by path.
+        with mock.patch('os.stat', side_effect=AssertionError), mock.patch('os.path.isdir', side_effect=AssertionError):
+            self.assertEqual(len(scan_children(self.root)), 6)
+
+    def test_query_children_keeps_its_dict_shape(self):
+        self.assertEqual(query_children(self.path('z dir')), [])
+        self.assertEqual(query_children(self.root)[0],
+                         {'id': self.path('a dir'), 'type': ITEM_TYPE_DIRECTORY, 'name': 'a dir'})
+
+    def test_browse_lists_the_directory(self):
+        l_response = self.client.get('/filesystem/')
+        self.assertEqual(l_response.status_code, 200)
+        for name in [b'a dir', b'z dir', b'a.jpg', b'b.txt']:
+            self.assertIn(name, l_response.content)
@@ -0,0 +1,86 @@
+import os
+from unittest import mock
+
+from django.test import TestCase
+
+from com.yoclabo.filesystem.index import Index
+from com.yoclabo.filesystem.item.Cursor import decode_cursor, encode_cursor
+from filesystem.tests.support import ShareMixin
+
+
+class ListingApiTest(ShareMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(1, 8):
+            self.write(f'big/f{i}.txt', b'x' * i, mtime=1000 + i)
+        self.write('big/f10.txt')
+        self.mkdir('big/sub')
+        return
+
+    def get(self, headers: dict | None = None, **parameters):
+        return self.client.get('/filesystem/listing', {'id': '/big', **parameters}, headers=headers)
+
+    def walk(self, **parameters) -> list:
+        l_names: list = []
+        l_cursor = ''
+        while True:
+            l_listing = self.get(cursor=l_cursor, limit=3, **parameters).json()
+            l_names += [e[1] for e in l_listing['entries']]
+            l_cursor = l_listing['cursor']
+            if l_cursor is None:
+                return l_names
+
+    def test_first_page(self):
+        l_listing = self.get(limit=3).json()
+        self.assertEqual(l_listing['total'], 9)
+        self.assertEqual(l_listing['fields'][:5], ['id', 'name', 'type', 'size', 'mtime'])
+        self.assertEqual(l_listing['entries'][1][:4], ['/big/f1.txt', 'f1.txt', 'text', 1])
+        self.assertFalse(l_listing['restarted'])
+        self.assertEqual(decode_cursor(l_listing['cursor'])['o'], 3)
+
+    def test_cursor_walks_every_entry_once(self):
+        l_names = ['sub'] + [f'f{i}.txt' for i in [1, 2, 3, 4, 5, 6, 7, 10]]
+        self.assertEqual(self.walk(), l_names)
+        self.assertEqual(self.walk(sort='size', order='desc')[:3], ['sub', 'f7.txt', 'f6.txt'])
+
+    def test_cursor_from_an_older_version_restarts(self):
+        l_cursor = self.get(limit=3).json()['cursor']
+        self.write('big/new.txt')
+        os.utime(self.path('big'), ns=(1, 1))
+        l_listing = self.get(cursor=l_cursor, limit=3).json()
+        self.assertTrue(l_listing['restarted'])
+        self.assertEqual(l_listing['entries'][0][1], 'sub')
+
+    def test_garbage_cursor_starts_from_the_top(self):
+        self.assertEqual(self.get(cursor='not a cursor', limit=1).json()['entries'][0][1], 'sub')
+        self.assertEqual(self.get(cursor=encode_cursor({'o': 'x'})[:-2], limit=1).json()['entries'][0][1], 'sub')
+
+    def test_cursor_of_the_wrong_shape_starts_from_the_top(self):
+        l_version = decode_cursor(self.get(limit=3).json()['cursor'])['v']
+        for cursor in [{'o': 'x'}, {'o': -1}, {'o': True}, {'o': 3, 'k': 'f2.txt'}, {'o': 3, 'k': [1, 2, 3]}]:
+            l_listing = self.get(cursor=encode_cursor({'v': l_version, **cursor}), limit=1)
+            self.assertEqual(l_listing.json()['entries'][0][1], 'sub')
+
+    def test_malformed_limit_is_a_bad_request(self):
+        l_response = self.get(limit='many')
+        self.assertEqual(l_response.status_code, 400)
+        self.assertEqual(l_response.content, b'limit must be an integer')
+
+    def test_limit_is_capped(self):
+        with mock.patch.dict(os.environ, {'LISTING_API_MAX_LIMIT': '2'}):
+            self.assertEqual(len(self.get(limit=100).json()['entries']), 2)
+
+    def test_unchanged_page_is_not_modified(self):
+        l_etag = self.get(limit=3)['ETag']
+        self.assertEqual(self.get(limit=3, headers={'If-None-Match': l_etag}).status_code, 304)
+        self.assertNotEqual(self.get(limit=4)['ETag'], l_etag)
+        os.utime(self.path('big'), ns=(1, 1))
+        self.assertEqual(self.get(limit=3, headers={'If-None-Match': l_etag}).status_code, 200)
+
+    def test_index_hands_out_keyset_cursors(self):
+        Index.refresh(self.root, 2)
+        with mock.patch.object(Index, 'METADATA_INDEX', True):
+            l_cursor = decode_cursor(self.get(limit=3).json()['cursor'])
+            self.assertEqual(l_cursor['k'][2], 'f2.txt')
+            self.assertEqual(self.walk(), ['sub'] + [f'f{i}.txt' for i in [1, 2, 3, 4, 5, 6, 7, 10]])
@@ -0,0 +1,97 @@
+import os
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from com.yoclabo.filesystem.cache.ListingCache import ListingCache
+from filesystem.tests.support import ShareMixin
+
+
+class ListingCacheTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.loads: list = []
+        for name in ['a', 'b', 'c']:
+            self.write(f'{name}/1')
+            self.write(f'{name}/2')
+        return
+
+    def loader(self, path: str) -> list:
+        self.loads.append(path)
+        return sorted(os.listdir(path))
+
+    def test_hit_until_the_directory_changes(self):
+        l_cache = ListingCache(100, 0, True)
+        self.assertEqual(l_cache.get(self.path('a'), self.loader).entries, ['1', '2'])
+        l_cache.get(self.path('a') + '/', self.loader)
+        self.assertEqual(len(self.loads), 1)
+        self.write('a/3')
+        os.utime(self.path('a'), ns=(1, 1))
+        self.assertEqual(l_cache.get(self.path('a'), self.loader).entries, ['1', '2', '3'])
+        self.assertEqual(l_cache.statistics()['hits'], 1)
+        self.assertEqual(l_cache.statistics()['misses'], 2)
+
+    def test_least_recently_used_directory_is_evicted_first(self):
+        l_cache = ListingCache(4, 0, True)
+        l_cache.get(self.path('a'), self.loader)
+        l_cache.get(self.path('b'), self.loader)
+        l_cache.get(self.path('a'), self.loader)
+        l_cache.get(self.path('c'), self.loader)
+        self.assertEqual(l_cache.statistics()['evictions'], 1)
+        self.assertEqual(l_cache.statistics()['entries'], 4)
+        l_cache.get(self.path('a'), self.loader)
+        l_cache.get(self.path('b'), self.loader)
+        self.assertEqual(self.loads, [self.path(n) for n in ['a', 'b', 'c', 'b']])
+
+    def test_a_listing_over_the_budget_is_not_kept(self):
+        l_cache = ListingCache(1, 0, True)
+        l_cache.get(self.path('a'), self.loader)
+        l_cache.get(self.path('a'), self.loader)
+        self.assertEqual(len(self.loads), 2)
+        self.assertEqual(l_cache.statistics()['directories'], 0)
+
+    def test_invalidate(self):
+        l_cache = ListingCache(100, 0, True)
+        l_cache.get(self.path('a'), self.loader)
+        l_cache.invalidate(self.path('a') + '/')
+        l_cache.get(self.path('a'), self.loader)
+        self.assertEqual(len(self.loads), 2)
+        self.assertEqual(l_cache.statistics()['invalidations'], 1)
+
+    def test_ttl_without_mtime_checks(self):
+        l_cache = ListingCache(100, 60, False)
+        l_cache.get(self.path('a'), self.loader)
+        self.write('a/3')
+        self.assertEqual(l_cache.get(self.path('a'), self.loader).entries, ['1', '2'])
+        with mock.patch.object(time, 'monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual(l_cache.get(self.path('a'), self.loader).entries, ['1', '2', '3'])
+
+    def test_memo_lives_with_the_listing(self):
+        l_cache = ListingCache(100, 0, True)
+        l_builds: list = []
+        l_listing = l_cache.get(self.path('a'), self.loader)
+        for _ in range(2):
+            l_listing.memo(('order',), lambda: l_builds.append(1) or ['x'])
+        self.assertEqual(len(l_builds), 1)
+        os.utime(self.path('a'), ns=(1, 1))
+        self.assertEqual(l_cache.get(self.path('a'), self.loader).memo(('order',), lambda: ['y']), ['y'])
+
+    def test_creating_a_directory_through_the_browser_shows_at_once(self):
+        self.client.get('/filesystem/', {'id': '/a', 'name': 'a'})
+        l_response = self.client.post('/filesystem/?id=/a&name=a', {'directoryName': 'fresh'})
+        self.assertEqual(l_response.status_code, 200)
+        self.assertIn(b'name=fresh', l_response.content)
+
+    def test_memoised_orders_count_towards_the_budget(self):
+        l_cache = ListingCache(6, 0, True)
+        l_listing = l_cache.get(self.path('a'), self.loader)
+        l_cache.get(self.path('b'), self.loader)
+        l_listing.memo(('order',), lambda: ['2', '1'])
+        self.assertEqual(l_cache.statistics()['entries'], 6)
+        l_cache.get(self.path('b'), self.loader).memo(('sort_names',), lambda: ['1', '2'])
+        self.assertEqual(l_cache.statistics()['evictions'], 1)
+        self.assertEqual(l_cache.statistics()['entries'], 4)
+        l_cache.get(self.path('a'), self.loader)
+        self.assertEqual(self.loads, [self.path(n) for n in ['a', 'b', 'a']])
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import AsyncRequestFactory, SimpleTestCase
+
+from com.yoclabo.routing import FileServing
+from filesystem import views
+from filesystem.tests.support import ShareMixin
+
+
+class OffloadTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('dir/my file #1.bin', bytes(100))
+        l_patch = mock.patch.object(FileServing, 'X_ACCEL_REDIRECT_LOCATION', '/protected/')
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        return
+
+    def test_body_is_left_to_nginx(self):
+        l_response = self.client.get('/filesystem/download', {'id': '/dir/my file #1.bin', 'name': 'my file #1.bin'})
+        self.assertEqual(l_response.status_code, 200)
+        self.assertEqual(l_response['X-Accel-Redirect'], '/protected/dir/my%20file%20%231.bin')
+        self.assertIn('attachment', l_response['Content-Disposition'])
+        self.assertEqual(l_response.content, b'')
+
+    def test_inline_bytes(self):
+        l_response = self.client.get('/filesystem/', {'id': '/dir/my file #1.bin', 'name': 'x', 'content': 'bytes'})
+        self.assertEqual(l_response['X-Accel-Redirect'], '/protected/dir/my%20file%20%231.bin')
+
+    def test_async_view(self):
+        l_request = AsyncRequestFactory().get('/filesystem/download', {'id': '/dir/my file #1.bin', 'name': 'x'})
+        l_response = asyncio.run(views.download_async(l_request))
+        self.assertEqual(l_response['X-Accel-Redirect'], '/protected/dir/my%20file%20%231.bin')
+
+    def test_links_out_of_the_share_are_refused(self):
+        l_outside = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, l_outside, True)
+        with open(os.path.join(l_outside, 'secret'), 'wb') as f:
+            f.write(b'secret')
+        os.symlink(os.path.join(l_outside, 'secret'), self.path('link'))
+        self.assertEqual(self.client.get('/filesystem/download', {'id': '/link', 'name': 'link'}).status_code, 404)
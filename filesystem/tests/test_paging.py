@@ -0,0 +1,55 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from com.yoclabo.filesystem.item import Item
+from com.yoclabo.filesystem.query.Query import Entry
+from filesystem.tests.support import ShareMixin
+
+
+class ChildrenTest(SimpleTestCase):
+
+    def setUp(self):
+        self.children = Item.Children([Entry(f'/f{i}.txt', f'f{i}.txt', 'text', i, 0.0) for i in range(5)])
+        return
+
+    def test_sequence_interface(self):
+        self.assertEqual(len(self.children), 5)
+        self.assertEqual(self.children[1].name, 'f1.txt')
+        self.assertEqual(self.children[-1].sequence, 5)
+        self.assertEqual([c.name for c in self.children[3:10]], ['f3.txt', 'f4.txt'])
+        self.assertEqual([c.sequence for c in self.children], [1, 2, 3, 4, 5])
+        self.assertEqual(self.children.entries(1, 3)[0].name, 'f1.txt')
+
+
+class PageMaterializationTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(95):
+            self.write(f'big/f{i:03d}.txt')
+        return
+
+    def browse(self, page: int, tile: bool = False) -> Item.Directory:
+        l_d = Item.Directory('/big', 'big', 1)
+        l_d.prepare_browse(page, tile)
+        return l_d
+
+    def test_only_the_page_is_built(self):
+        with mock.patch.object(Item, 'create_item', wraps=Item.create_item) as l_create:
+            l_d = self.browse(3)
+        self.assertEqual(l_create.call_count, 10)
+        self.assertEqual([c.name for c in l_d.children], [f'f{i:03d}.txt' for i in range(20, 30)])
+        self.assertEqual([c.sequence for c in l_d.children], list(range(21, 31)))
+
+    def test_page_count_and_last_page(self):
+        l_d = self.browse(10)
+        self.assertEqual((l_d.max_page, l_d.prev_page, l_d.next_page), (10, 9, 10))
+        self.assertEqual(len(l_d.children), 5)
+        self.assertEqual(self.browse(1, True).max_page, 4)
+
+    def test_empty_directory_has_one_page(self):
+        self.mkdir('empty')
+        l_d = Item.Directory('/empty', 'empty', 1)
+        l_d.prepare_browse(1, False)
+        self.assertEqual((l_d.max_page, l_d.children), (1, []))
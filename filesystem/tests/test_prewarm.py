@@ -0,0 +1,102 @@
+import io
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+from PIL import Image as PILImage
+
+from com.yoclabo.filesystem.item.Item import Directory
+from com.yoclabo.filesystem.thumbnail import Prewarm, Thumbnail
+from filesystem.tests.support import ThumbnailCacheMixin
+
+
+class PrewarmTest(ThumbnailCacheMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        l_png = io.BytesIO()
+        PILImage.new('RGB', (400, 400), 'green').save(l_png, 'png')
+        for i in range(3):
+            self.write(f'photos/p{i}.png', l_png.getvalue())
+        self.write('photos/notes.txt')
+        return
+
+    def idle(self, workers: int = 1, queue_size: int = 10) -> Prewarm.Prewarmer:
+        # Workers are not started, so what was queued can be inspected.
+        l_prewarmer = Prewarm.Prewarmer(workers, queue_size, False)
+        l_patch = mock.patch.object(l_prewarmer, 'start')
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        return l_prewarmer
+
+    def queued(self, prewarmer: Prewarm.Prewarmer) -> list:
+        l_tasks: list = []
+        while not prewarmer.f_queue.empty():
+            l_priority, _, l_kind, l_path = prewarmer.f_queue.get_nowait()
+            l_tasks.append((l_priority, l_kind, os.path.relpath(l_path, self.root)))
+        return l_tasks
+
+    def is_cached(self, name: str) -> bool:
+        return os.path.exists(Thumbnail.describe(self.path(name)).path)
+
+    def test_disabled_without_workers(self):
+        self.assertFalse(Prewarm.Prewarmer(0, 10, False).submit(Prewarm.PRIORITY_PAGE, Prewarm.TASK_IMAGE, 'x'))
+
+    def test_queue_is_deduplicated_bounded_and_ordered(self):
+        l_prewarmer = self.idle(queue_size=2)
+
+        def submit(priority: int, name: str) -> bool:
+            return l_prewarmer.submit(priority, Prewarm.TASK_IMAGE, self.path(name))
+
+        self.assertTrue(submit(Prewarm.PRIORITY_SUBDIRECTORY, 'photos/p0.png'))
+        self.assertFalse(submit(Prewarm.PRIORITY_PAGE, 'photos/p0.png'))
+        self.assertTrue(submit(Prewarm.PRIORITY_PAGE, 'photos/p1.png'))
+        self.assertFalse(submit(Prewarm.PRIORITY_PAGE, 'photos/p2.png'))
+        self.assertEqual(l_prewarmer.statistics()['dropped'], 1)
+        self.assertEqual([t[2] for t in self.queued(l_prewarmer)], ['photos/p1.png', 'photos/p0.png'])
+
+    def test_workers_render_images_and_expand_directories(self):
+        l_prewarmer = Prewarm.Prewarmer(2, 10, False)
+        l_prewarmer.submit(Prewarm.PRIORITY_SUBDIRECTORY, Prewarm.TASK_DIRECTORY, self.path('photos'))
+        l_prewarmer.f_queue.join()
+        self.assertTrue(all(self.is_cached(f'photos/p{i}.png') for i in range(3)))
+        self.assertEqual(l_prewarmer.statistics()['done'], 4)
+
+    def test_failures_are_counted(self):
+        self.write('bad.png', b'not a png')
+        l_prewarmer = Prewarm.Prewarmer(1, 10, False)
+        with self.assertLogs(Prewarm.logger, 'WARNING'):
+            l_prewarmer.submit(Prewarm.PRIORITY_PAGE, Prewarm.TASK_IMAGE, self.path('bad.png'))
+            l_prewarmer.f_queue.join()
+        self.assertEqual(l_prewarmer.statistics()['failed'], 1)
+
+    def test_browsing_schedules_the_page_then_neighbours_then_subdirectories(self):
+        for i in range(12):
+            self.write(f'many/{i:02d}.png')
+        self.mkdir('many/sub')
+        l_prewarmer = self.idle(queue_size=100)
+        with mock.patch.object(Prewarm, 'prewarmer', l_prewarmer):
+            Directory('/many', 'many', 1).prepare_browse(1, True)
+        l_tasks = self.queued(l_prewarmer)
+        self.assertEqual(l_tasks[0], (Prewarm.PRIORITY_PAGE, Prewarm.TASK_IMAGE, 'many/00.png'))
+        self.assertEqual(l_tasks[-1], (Prewarm.PRIORITY_SUBDIRECTORY, Prewarm.TASK_DIRECTORY, 'many/sub'))
+        self.assertEqual(len(l_tasks), 13)
+
+    def test_documents_and_clips_are_queued_when_their_renderer_is_installed(self):
+        self.write('mixed/a.pdf', b'%PDF-1.4\n')
+        self.write('mixed/b.mp4', bytes(10))
+        self.write('mixed/c.png')
+        l_installed = [Prewarm.TASK_PDF, Prewarm.TASK_MEDIA, Prewarm.TASK_IMAGE]
+        for which, kinds in [(lambda name: '/usr/bin/' + name, l_installed), (lambda name: None, [Prewarm.TASK_IMAGE])]:
+            l_prewarmer = self.idle(queue_size=100)
+            with mock.patch.object(Prewarm, 'prewarmer', l_prewarmer), \
+                    mock.patch.object(Thumbnail.shutil, 'which', side_effect=which):
+                Directory('/mixed', 'mixed', 1).prepare_browse(1, True)
+            self.assertEqual([t[1] for t in self.queued(l_prewarmer)], kinds)
+
+    def test_workers_render_each_kind(self):
+        l_prewarmer = Prewarm.Prewarmer(1, 10, False)
+        with mock.patch.object(Thumbnail, 'get_thumbnail') as l_get_thumbnail:
+            l_prewarmer.submit(Prewarm.PRIORITY_PAGE, Prewarm.TASK_PDF, self.path('docs/a.pdf'))
+            l_prewarmer.f_queue.join()
+        l_get_thumbnail.assert_called_once_with(self.path('docs/a.pdf'), Thumbnail.KIND_PDF)
@@ -0,0 +1,82 @@
+from django.test import SimpleTestCase
+
+from com.yoclabo.routing.FileServing import parse_range
+from filesystem.tests.support import ShareMixin
+
+
+def spans(header: str, size: int) -> list | None:
+    l_ranges = parse_range(header, size)
+    return None if l_ranges is None else [(r.start, r.end) for r in l_ranges]
+
+
+class ParseRangeTest(SimpleTestCase):
+
+    def test_single_ranges(self):
+        self.assertEqual(spans('bytes=0-9', 100), [(0, 9)])
+        self.assertEqual(spans('bytes=90-', 100), [(90, 99)])
+        self.assertEqual(spans('bytes=90-1000', 100), [(90, 99)])
+        self.assertEqual(spans('bytes=-5', 100), [(95, 99)])
+        self.assertEqual(spans('bytes=-500', 100), [(0, 99)])
+
+    def test_unsatisfiable(self):
+        self.assertEqual(spans('bytes=100-', 100), [])
+        self.assertEqual(spans('bytes=-0', 100), [])
+        self.assertEqual(spans('bytes=0-0', 0), [])
+        self.assertEqual(spans('bytes=-5', 0), [])
+
+    def test_ignored(self):
+        self.assertIsNone(spans('items=0-9', 100))
+        self.assertIsNone(spans('bytes=9-0', 100))
+        self.assertIsNone(spans('bytes=-', 100))
+        self.assertIsNone(spans('bytes=a-b', 100))
+        self.assertIsNone(spans(','.join(['bytes=0-0'] + [f'{i * 2}-{i * 2}' for i in range(1, 20)]), 100))
+
+    def test_overlapping_and_adjacent_ranges_are_merged(self):
+        self.assertEqual(spans('bytes=50-59,0-9,5-19,20-29', 100), [(0, 29), (50, 59)])
+
+
+class DownloadTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('data.bin', bytes(range(100)))
+        self.write('empty.bin')
+        return
+
+    def get(self, name: str, **headers):
+        return self.client.get('/filesystem/download', {'id': '/' + name, 'name': name}, headers=headers)
+
+    def body(self, response) -> bytes:
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_whole_file(self):
+        l_response = self.get('data.bin')
+        self.assertEqual((l_response.status_code, l_response['Content-Length']), (200, '100'))
+        self.assertIn('ETag', l_response)
+        self.assertEqual(self.body(l_response), bytes(range(100)))
+
+    def test_single_range(self):
+        l_response = self.get('data.bin', Range='bytes=10-19')
+        self.assertEqual((l_response.status_code, l_response['Content-Range']), (206, 'bytes 10-19/100'))
+        self.assertEqual(self.body(l_response), bytes(range(10, 20)))
+
+    def test_multipart_ranges(self):
+        l_response = self.get('data.bin', Range='bytes=0-1,50-51')
+        self.assertEqual(l_response.status_code, 206)
+        self.assertTrue(l_response['Content-Type'].startswith('multipart/byteranges; boundary='))
+        l_body = self.body(l_response)
+        self.assertEqual(len(l_body), int(l_response['Content-Length']))
+        self.assertIn(b'Content-Range: bytes 50-51/100\r\n\r\n\x32\x33', l_body)
+
+    def test_suffix_range_of_an_empty_file_is_416(self):
+        l_response = self.get('empty.bin', Range='bytes=-5')
+        self.assertEqual((l_response.status_code, l_response['Content-Range']), (416, 'bytes */0'))
+
+    def test_not_modified(self):
+        l_etag = self.get('data.bin')['ETag']
+        self.assertEqual(self.get('data.bin', If_None_Match=l_etag).status_code, 304)
+
+    def test_stale_if_range_sends_everything(self):
+        l_response = self.get('data.bin', Range='bytes=10-19', If_Range='"stale"')
+        self.assertEqual(l_response.status_code, 200)
+        self.assertEqual(self.body(l_response), bytes(range(100)))
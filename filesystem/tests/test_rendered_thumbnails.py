@@ -0,0 +1,83 @@
+import io
+import subprocess
+from unittest import mock
+
+from django.test import SimpleTestCase
+from PIL import Image as PILImage
+
+from com.yoclabo.filesystem.thumbnail import Thumbnail
+from com.yoclabo.routing import FilesystemHandler
+from filesystem.tests.support import ThumbnailCacheMixin
+from filesystem.tests.test_thumbnails import unpack_frames
+
+
+class RenderedThumbnailTest(ThumbnailCacheMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('docs/manual.pdf', b'%PDF-1.4\n')
+        self.write('clips/short.mp4', bytes(100))
+        # pdftoppm and ffmpeg are stood in for; each writes a portrait frame where the real tool would.
+        self.runs: list = []
+        l_patch = mock.patch.object(Thumbnail.subprocess, 'run', side_effect=self.run_tool)
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        l_patch = mock.patch.object(Thumbnail.shutil, 'which', side_effect=lambda name: '/usr/bin/' + name)
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        return
+
+    def run_tool(self, arguments: list, **kwargs) -> subprocess.CompletedProcess:
+        self.runs.append(arguments)
+        if arguments[0] == Thumbnail.PDFTOPPM_BINARY:
+            l_destination = arguments[-1] + '.png'
+        elif arguments[arguments.index('-ss') + 1] == '0':
+            l_destination = arguments[-1]
+        else:
+            # The clip is shorter than the poster offset: ffmpeg succeeds without writing a frame.
+            return subprocess.CompletedProcess(arguments, 0, b'', b'')
+        PILImage.new('RGB', (600, 800), 'white').save(l_destination, 'png')
+        return subprocess.CompletedProcess(arguments, 0, b'', b'')
+
+    def test_kinds_follow_the_installed_tools(self):
+        self.assertEqual(Thumbnail.get_kinds(), [Thumbnail.KIND_IMAGE, Thumbnail.KIND_PDF, Thumbnail.KIND_MEDIA])
+        with mock.patch.object(Thumbnail.shutil, 'which', return_value=None):
+            self.assertEqual(Thumbnail.get_kinds(), [Thumbnail.KIND_IMAGE])
+            with self.assertRaises(FileNotFoundError):
+                Thumbnail.describe(self.path('docs/manual.pdf'), Thumbnail.KIND_PDF)
+
+    def test_first_page_of_a_pdf(self):
+        l_t = Thumbnail.get_thumbnail(self.path('docs/manual.pdf'), Thumbnail.KIND_PDF)
+        with PILImage.open(l_t.path) as l_image:
+            self.assertEqual(l_image.size, (270, 360))
+        Thumbnail.get_thumbnail(self.path('docs/manual.pdf'), Thumbnail.KIND_PDF)
+        self.assertEqual(len(self.runs), 1)
+        self.assertEqual(self.runs[0][1:5], ['-f', '1', '-l', '1'])
+
+    def test_short_clip_falls_back_to_the_first_frame(self):
+        l_t = Thumbnail.get_thumbnail(self.path('clips/short.mp4'), Thumbnail.KIND_MEDIA)
+        with PILImage.open(l_t.path) as l_image:
+            self.assertEqual(l_image.size, (270, 360))
+        self.assertEqual([r[r.index('-ss') + 1] for r in self.runs], [str(Thumbnail.THUMBNAIL_POSTER_SECONDS), '0'])
+
+    def test_renderer_failure_is_an_os_error(self):
+        Thumbnail.subprocess.run.side_effect = subprocess.CalledProcessError(1, 'pdftoppm')
+        with self.assertRaises(OSError):
+            Thumbnail.get_thumbnail(self.path('docs/manual.pdf'), Thumbnail.KIND_PDF)
+
+    def test_tiles_of_documents_and_clips(self):
+        self.write('docs/broken.pdf', b'')
+        l_run = self.run_tool
+
+        def run_tool(arguments: list, **kwargs) -> subprocess.CompletedProcess:
+            if 'broken' in arguments[-2]:
+                raise subprocess.CalledProcessError(1, arguments[0])
+            return l_run(arguments, **kwargs)
+
+        Thumbnail.subprocess.run.side_effect = run_tool
+        l_ids = ['/docs/manual.pdf', '/clips/short.mp4', '/docs/broken.pdf']
+        with self.assertLogs(FilesystemHandler.logger, 'WARNING'):
+            l_response = self.client.get('/filesystem/thumbnails', {'id': l_ids})
+            l_frames = unpack_frames(b''.join(l_response.streaming_content))
+        self.assertEqual([h['status'] for h, _ in l_frames], [200, 200, 500])
+        self.assertEqual(PILImage.open(io.BytesIO(l_frames[1][1])).size, (270, 360))
@@ -0,0 +1,72 @@
+import os
+
+from django.db import connection
+from django.test import TestCase
+
+from com.yoclabo.filesystem.index import Index, Search
+from filesystem.tests.support import ShareMixin
+
+
+class NameSearchTest(ShareMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('report.pdf', b'x' * 100, mtime=1000)
+        self.write('old report.pdf', b'x' * 10, mtime=2000)
+        self.write('reports/2024 summary.txt', b'x' * 5000, mtime=3000)
+        self.write('Report', b'', mtime=4000)
+        self.write('日本語テキスト.txt')
+        self.write('ab.txt')
+        Index.refresh(self.root, 2)
+        return
+
+    def names(self, query: str, mode: str = Search.MODE_SUBSTRING, **filters) -> list:
+        return [e.name for e in Search.search(
+            query, mode, filters.get('types', []), filters.get('min_size'), filters.get('max_size'),
+            filters.get('after'), filters.get('before'), 0, 50
+        )]
+
+    def test_substring_ranks_exact_then_prefix_then_shorter(self):
+        self.assertEqual(self.names('report'), ['Report', 'reports', 'report.pdf', 'old report.pdf'])
+
+    def test_substring_inside_japanese_names(self):
+        self.assertEqual(self.names('語テキ'), ['日本語テキスト.txt'])
+
+    def test_short_terms_fall_back_to_like(self):
+        self.assertEqual(self.names('ab'), ['ab.txt'])
+
+    def test_prefix(self):
+        self.assertEqual(self.names('REPORT', Search.MODE_PREFIX), ['Report', 'reports', 'report.pdf'])
+        self.assertEqual(self.names('re', Search.MODE_PREFIX), ['Report', 'reports', 'report.pdf'])
+
+    def test_prefix_of_three_or_more_characters_uses_the_index(self):
+        l_match, l_params = Search.get_match('repo', Search.MODE_PREFIX)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN SELECT rowid FROM filesystem_node_name n WHERE ' + l_match, l_params)
+            l_plan = ' '.join(str(r[-1]) for r in cursor.fetchall())
+        # 'M' in the index string is a full-text MATCH constraint; a LIKE would leave the table scanned.
+        self.assertRegex(l_plan, r'VIRTUAL TABLE INDEX \d+:M')
+
+    def test_glob(self):
+        self.assertEqual(self.names('*.pdf', Search.MODE_GLOB), ['report.pdf', 'old report.pdf'])
+
+    def test_filters(self):
+        self.assertEqual(self.names('report', types=['pdf'], min_size=50), ['report.pdf'])
+        self.assertEqual(self.names('report', after=2500), ['Report', 'reports'])
+
+    def test_removed_file_is_no_longer_found(self):
+        os.remove(self.path('report.pdf'))
+        Index.update(self.root)
+        self.assertNotIn('report.pdf', self.names('report'))
+
+    def test_quotes_in_the_query(self):
+        self.write('say "hi".txt')
+        Index.update(self.root)
+        self.assertEqual(self.names('"hi"'), ['say "hi".txt'])
+
+    def test_malformed_filters_are_bad_requests(self):
+        for l_query in [{'min_size': 'big'}, {'max_size': '-1'}, {'after': 'yesterday'}, {'page': '0'}]:
+            l_response = self.client.get('/filesystem/search', {'q': 'report', **l_query})
+            self.assertEqual(l_response.status_code, 400, l_query)
+        l_response = self.client.get('/filesystem/search', {'q': 'report', 'min_size': '50', 'after': '2024-01-01'})
+        self.assertEqual(l_response.status_code, 200)
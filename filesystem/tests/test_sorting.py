@@ -0,0 +1,81 @@
+import importlib
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+
+from com.yoclabo.filesystem.index import Index, Search
+from com.yoclabo.filesystem.query.Query import (
+    SORT_MTIME, SORT_NAME, SORT_SIZE, get_sort_name, list_children_sorted
+)
+from filesystem.tests.support import ShareMixin
+
+
+class SortNameTest(TestCase):
+
+    def test_digit_runs_compare_as_numbers(self):
+        l_names = ['f10.txt', 'F2.txt', 'f1.txt', 'f02b.txt']
+        self.assertEqual(sorted(l_names, key=get_sort_name), ['f1.txt', 'F2.txt', 'f02b.txt', 'f10.txt'])
+
+    def test_migration_fills_the_same_keys_as_the_crawler(self):
+        # 0004 carries its own copy; rows it filled must sort with the ones crawled since.
+        l_migration = importlib.import_module('filesystem.migrations.0004_node_sort_name')
+        for name in ['f10.txt', 'F2.txt', 'Ä 007', '日本語1']:
+            self.assertEqual(l_migration.get_sort_name(name), get_sort_name(name))
+
+
+class SortedListingTest(ShareMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('f10.txt', b'x' * 10, mtime=1000)
+        self.write('f2.txt', b'x' * 300, mtime=3000)
+        self.write('F1.txt', b'x' * 20, mtime=2000)
+        self.write('.hidden', b'', mtime=4000)
+        self.mkdir('z-dir')
+        self.mkdir('a-dir')
+        return
+
+    def names(self, sort: str, descending: bool = False, show_hidden: bool = True) -> list:
+        return [e.name for e in list_children_sorted(self.root, sort, descending, show_hidden)]
+
+    def test_name_order_is_natural_with_directories_first(self):
+        self.assertEqual(self.names(SORT_NAME), ['a-dir', 'z-dir', '.hidden', 'F1.txt', 'f2.txt', 'f10.txt'])
+
+    def test_descending_reverses_inside_each_kind(self):
+        self.assertEqual(self.names(SORT_SIZE, True, False), ['z-dir', 'a-dir', 'f2.txt', 'F1.txt', 'f10.txt'])
+
+    def test_hidden_entries_can_be_left_out(self):
+        self.assertNotIn('.hidden', self.names(SORT_MTIME, show_hidden=False))
+
+    def test_index_orders_like_the_scan(self):
+        Index.refresh(self.root, 2)
+        for sort in [SORT_NAME, SORT_SIZE, SORT_MTIME]:
+            for descending in [False, True]:
+                l_indexed = [e.name for e in Index.query_children(self.root, 0, 100, sort, descending, True)]
+                # Directory sizes differ on purpose (the index holds subtree totals), so only files are compared.
+                self.assertEqual(l_indexed[2:], self.names(sort, descending)[2:], (sort, descending))
+
+
+class NameIndexAfterMigrateTest(ShareMixin, TestCase):
+
+    # 0004 and later migrations rebuild filesystem_node; the name index must still be fed afterwards.
+    def test_triggers_survive_all_migrations(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'filesystem_node'")
+            l_triggers = {r[0] for r in cursor.fetchall()}
+        self.assertEqual(
+            l_triggers, {'filesystem_node_name_insert', 'filesystem_node_name_delete', 'filesystem_node_name_update'}
+        )
+
+    def test_search_finds_indexed_file(self):
+        self.write('f1.txt')
+        self.write('sub/report-2024.pdf')
+        with mock.patch.object(Index, 'METADATA_INDEX', True):
+            Index.refresh(self.root, 2)
+        self.assertEqual([e.name for e in Search.search('f1.', 'substring', [], None, None, None, None, 0, 10)],
+                         ['f1.txt'])
+        self.assertEqual([e.name for e in Search.search('PORT-20', 'substring', [], None, None, None, None, 0, 10)],
+                         ['report-2024.pdf'])
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO filesystem_node_name(filesystem_node_name) VALUES ('integrity-check')")
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import threading
+import time
+from unittest import mock
+
+from django.test import AsyncRequestFactory, SimpleTestCase
+
+from com.yoclabo.filesystem.text import Tail
+from filesystem import views
+from filesystem.tests.support import ShareMixin
+
+
+class TailTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.log = self.write('app.log', 'one\ntwo\n')
+        return
+
+    def append(self, data: str) -> None:
+        with open(self.log, 'a') as f:
+            f.write(data)
+        return
+
+    def test_first_answer_is_the_end_of_the_file(self):
+        l_tail = Tail.follow(self.log, None, None)
+        self.assertEqual(l_tail['data'], 'one\ntwo\n')
+        self.assertEqual(l_tail['offset'], 8)
+        self.assertGreater(l_tail['retry'], 0)
+
+    def test_only_whole_lines_are_sent(self):
+        l_tail = Tail.follow(self.log, None, None)
+        self.append('thr')
+        l_next = Tail.follow(self.log, l_tail['generation'], l_tail['offset'])
+        self.assertEqual((l_next['data'], l_next['offset'], l_next['reset']), ('', 8, False))
+        self.append('ee\n')
+        l_next = Tail.follow(self.log, l_tail['generation'], l_tail['offset'])
+        self.assertEqual((l_next['data'], l_next['offset']), ('three\n', 14))
+
+    def test_generation_does_not_depend_on_the_process(self):
+        # Another worker, with no state of its own, continues from the same position.
+        l_tail = Tail.follow(self.log, None, None)
+        Tail.followers.clear()
+        self.append('x\n')
+        self.assertEqual(Tail.follow(self.log, l_tail['generation'], l_tail['offset'])['data'], 'x\n')
+
+    def test_truncation(self):
+        l_tail = Tail.follow(self.log, None, None)
+        with open(self.log, 'w') as f:
+            f.write('new\n')
+        l_next = Tail.follow(self.log, l_tail['generation'], l_tail['offset'])
+        self.assertEqual((l_next['data'], l_next['reset']), ('new\n', Tail.RESET_TRUNCATED))
+
+    def test_rotation(self):
+        l_tail = Tail.follow(self.log, None, None)
+        os.rename(self.log, self.log + '.1')
+        self.write('app.log', 'fresh\n')
+        l_next = Tail.follow(self.log, l_tail['generation'], l_tail['offset'])
+        self.assertEqual((l_next['data'], l_next['reset']), ('fresh\n', Tail.RESET_ROTATED))
+        self.assertNotEqual(l_next['generation'], l_tail['generation'])
+
+    def test_far_behind_skips_ahead_to_a_line_start(self):
+        l_tail = Tail.follow(self.log, None, None)
+        self.append(''.join(f'line {i}\n' for i in range(100)))
+        with mock.patch.object(Tail, 'TAIL_BUFFER_BYTES', 100):
+            l_next = Tail.follow(self.log, l_tail['generation'], l_tail['offset'])
+        self.assertEqual(l_next['reset'], Tail.RESET_SKIPPED)
+        self.assertTrue(l_next['data'].startswith('line '))
+        self.assertTrue(l_next['data'].endswith('line 99\n'))
+
+
+class TailAsyncTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.log = self.write('app.log', 'one\n')
+        for name, value in [('TAIL_POLL_SECONDS', 0.05), ('TAIL_WAIT_SECONDS', 5.0)]:
+            l_patch = mock.patch.object(Tail, name, value)
+            l_patch.start()
+            self.addCleanup(l_patch.stop)
+        return
+
+    def test_long_poll_returns_when_a_line_is_appended(self):
+        l_tail = Tail.follow(self.log, None, None)
+
+        def append():
+            time.sleep(0.2)
+            with open(self.log, 'a') as f:
+                f.write('two\n')
+
+        threading.Thread(target=append).start()
+        l_start = time.monotonic()
+        l_next = asyncio.run(Tail.follow_async(self.log, l_tail['generation'], l_tail['offset'], None))
+        self.assertEqual((l_next['data'], l_next['retry']), ('two\n', 0))
+        self.assertLess(time.monotonic() - l_start, 4)
+
+    def test_long_poll_gives_up_after_the_wait(self):
+        l_tail = Tail.follow(self.log, None, None)
+        l_next = asyncio.run(Tail.follow_async(self.log, l_tail['generation'], l_tail['offset'], 0.2))
+        self.assertEqual((l_next['data'], l_next['offset'], l_next['reset']), ('', 4, False))
+
+    def test_malformed_parameters_are_bad_requests(self):
+        for parameters in [{'offset': 'x'}, {'offset': -1}, {'wait': 'soon'}, {'wait': 'nan'}, {'wait': -1}]:
+            l_request = AsyncRequestFactory().get('/filesystem/tail', {'id': '/app.log', **parameters})
+            self.assertEqual(asyncio.run(views.tail_async(l_request)).status_code, 400)
+        self.assertEqual(self.client.get('/filesystem/tail', {'id': '/app.log', 'offset': 'x'}).status_code, 400)
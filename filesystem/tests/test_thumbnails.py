@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import struct
+from unittest import mock
+
+from django.test import SimpleTestCase
+from PIL import Image as PILImage
+
+from com.yoclabo.filesystem.thumbnail import Thumbnail
+from com.yoclabo.routing import FilesystemHandler
+from filesystem.tests.support import ThumbnailCacheMixin
+
+
+def unpack_frames(data: bytes) -> list:
+    l_frames = []
+    while data:
+        l_header_length = struct.unpack('>I', data[:4])[0]
+        l_header = json.loads(data[4:4 + l_header_length])
+        l_body_length = struct.unpack('>I', data[4 + l_header_length:8 + l_header_length])[0]
+        l_frames.append((l_header, data[8 + l_header_length:8 + l_header_length + l_body_length]))
+        data = data[8 + l_header_length + l_body_length:]
+    return l_frames
+
+
+def encode_image(image: PILImage.Image, format: str, **options) -> bytes:
+    l_data = io.BytesIO()
+    image.save(l_data, format, **options)
+    return l_data.getvalue()
+
+
+class ImageShareMixin(ThumbnailCacheMixin):
+
+    def setUp(self):
+        super().setUp()
+        self.write('good.png', encode_image(PILImage.new('RGB', (800, 600), 'red'), 'png'))
+        self.write('corrupt.jpg', b'not a jpeg')
+        return
+
+
+class ThumbnailTest(ImageShareMixin, SimpleTestCase):
+
+    def test_resized_and_cached(self):
+        l_t = Thumbnail.get_thumbnail(self.path('good.png'))
+        self.assertEqual(l_t.content_type, 'image/jpeg')
+        with PILImage.open(l_t.path) as l_image:
+            self.assertEqual((l_image.format, l_image.size), ('JPEG', (360, 270)))
+        with mock.patch.object(Thumbnail, 'create_thumbnail') as l_create:
+            self.assertEqual(Thumbnail.get_thumbnail(self.path('good.png')).path, l_t.path)
+        l_create.assert_not_called()
+
+    def test_exif_orientation_and_transparency(self):
+        l_exif = PILImage.Exif()
+        l_exif[0x0112] = 6
+        self.write('turned.jpg', encode_image(PILImage.new('RGB', (800, 600)), 'jpeg', exif=l_exif))
+        self.write('alpha.png', encode_image(PILImage.new('RGBA', (100, 100), (0, 0, 0, 0)), 'png'))
+        with PILImage.open(Thumbnail.get_thumbnail(self.path('turned.jpg')).path) as l_image:
+            self.assertEqual(l_image.size, (270, 360))
+        with PILImage.open(Thumbnail.get_thumbnail(self.path('alpha.png')).path) as l_image:
+            self.assertEqual(l_image.getpixel((50, 50)), (255, 255, 255))
+
+    def test_a_changed_source_replaces_the_old_thumbnail(self):
+        l_old = Thumbnail.get_thumbnail(self.path('good.png'))
+        self.write('good.png', encode_image(PILImage.new('RGB', (100, 100), 'blue'), 'png'), mtime=1000)
+        l_new = Thumbnail.get_thumbnail(self.path('good.png'))
+        self.assertNotEqual(l_new.etag, l_old.etag)
+        self.assertFalse(os.path.exists(l_old.path))
+        Thumbnail.invalidate(self.path('good.png'))
+        self.assertFalse(os.path.exists(l_new.path))
+
+    def test_single_thumbnail_revalidates_with_the_etag(self):
+        l_query = {'id': '/good.png', 'content': 'thumbnail'}
+        l_response = self.client.get('/filesystem/', l_query)
+        self.assertEqual((l_response.status_code, l_response['Content-Type']), (200, 'image/jpeg'))
+        l_response.close()
+        l_response = self.client.get('/filesystem/', l_query, headers={'If-None-Match': l_response['ETag']})
+        self.assertEqual(l_response.status_code, 304)
+
+
+class ThumbnailBatchTest(ImageShareMixin, SimpleTestCase):
+
+    def batch(self, *ids: str) -> list:
+        l_response = self.client.get('/filesystem/thumbnails', {'id': list(ids)})
+        self.assertEqual(l_response.status_code, 200)
+        return unpack_frames(b''.join(l_response.streaming_content))
+
+    def test_every_id_gets_a_frame(self):
+        with self.assertLogs(FilesystemHandler.logger, 'WARNING'):
+            l_frames = self.batch('/good.png', '/missing.png', '/corrupt.jpg', '/good.png')
+        self.assertEqual([h['index'] for h, _ in l_frames], [0, 1, 2, 3])
+        self.assertEqual([h['status'] for h, _ in l_frames], [200, 404, 500, 200])
+        self.assertEqual(PILImage.open(io.BytesIO(l_frames[0][1])).size, (360, 270))
+
+    def test_an_unexpected_error_only_fails_its_own_item(self):
+        l_get = FilesystemHandler.get_thumbnail
+
+        def get_thumbnail(id: str):
+            if id == '/bomb.png':
+                raise PILImage.DecompressionBombError('too many pixels')
+            return l_get(id)
+
+        with mock.patch.object(FilesystemHandler, 'get_thumbnail', get_thumbnail):
+            with self.assertLogs(FilesystemHandler.logger, 'WARNING'):
+                l_frames = self.batch('/bomb.png', '/good.png')
+        self.assertEqual([h['status'] for h, _ in l_frames], [500, 200])
@@ -0,0 +1,128 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from com.yoclabo.filesystem.media import Transcode
+from filesystem.tests.support import ShareMixin
+
+
+class ProbeTest(SimpleTestCase):
+
+    def test_native_formats_play_from_the_file(self):
+        self.assertTrue(Transcode.Probe(10, 'mov,mp4,m4a,3gp,3g2,mj2', 'h264', 'aac').is_native)
+        self.assertTrue(Transcode.Probe(10, 'mp3', '', 'mp3').is_native)
+        self.assertFalse(Transcode.Probe(10, 'avi', 'h264', 'mp3').is_native)
+        self.assertFalse(Transcode.Probe(10, 'matroska,webm', 'hevc', 'aac').is_native)
+
+    def test_segment_count(self):
+        with mock.patch.object(Transcode, 'MEDIA_SEGMENT_SECONDS', 6):
+            self.assertEqual(Transcode.Probe(13, 'avi', '', '').segment_count, 3)
+            self.assertEqual(Transcode.Probe(0, 'avi', '', '').segment_count, 1)
+
+
+class TranscodeTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache, True)
+        for name, value in [('MEDIA_CACHE_DIRECTORY', self.cache), ('MEDIA_SEGMENT_SECONDS', 6), ('cache_size', -1)]:
+            l_patch = mock.patch.object(Transcode, name, value)
+            l_patch.start()
+            self.addCleanup(l_patch.stop)
+        # ffmpeg and ffprobe are stood in for: the probe answers for an AVI, a segment is a few bytes.
+        self.runs: list = []
+        l_patch = mock.patch.object(Transcode.subprocess, 'run', side_effect=self.run_tool)
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        l_patch = mock.patch.object(Transcode, 'is_available', return_value=True)
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        self.movie = self.write('clips/old.avi', bytes(1000))
+        return
+
+    def run_tool(self, arguments: list, **kwargs) -> subprocess.CompletedProcess:
+        self.runs.append(arguments[0])
+        if arguments[0] == Transcode.FFPROBE_BINARY:
+            l_info = {'format': {'format_name': 'avi', 'duration': '13.5'},
+                      'streams': [{'codec_type': 'video', 'codec_name': 'mpeg4'}]}
+            return subprocess.CompletedProcess(arguments, 0, json.dumps(l_info).encode(), b'')
+        with open(arguments[-1], 'wb') as f:
+            f.write(b'segment ' + arguments[arguments.index('-ss') + 1].encode())
+        return subprocess.CompletedProcess(arguments, 0, b'', b'')
+
+    def test_is_streamed_needs_ffmpeg_and_a_foreign_format(self):
+        self.assertTrue(Transcode.is_streamed(self.movie))
+        with mock.patch.object(Transcode, 'is_available', return_value=False):
+            self.assertFalse(Transcode.is_streamed(self.movie))
+
+    def test_probe_is_cached_beside_the_segments(self):
+        Transcode.probe(self.movie)
+        Transcode.probe(self.movie)
+        self.assertEqual(self.runs, [Transcode.FFPROBE_BINARY])
+
+    def test_playlist_covers_the_whole_duration(self):
+        l_playlist = Transcode.get_playlist(self.movie, '?id=/clips/old.avi&content=segment').splitlines()
+        self.assertEqual([l for l in l_playlist if l.startswith('#EXTINF')],
+                         ['#EXTINF:6.000,', '#EXTINF:6.000,', '#EXTINF:1.500,'])
+        self.assertIn(f'?id=/clips/old.avi&content=segment&index=2&v={Transcode.get_key(self.movie)}', l_playlist)
+        self.assertEqual(l_playlist[-1], '#EXT-X-ENDLIST')
+
+    def test_segment_is_produced_once(self):
+        l_path = Transcode.get_segment(self.movie, 1)
+        self.assertEqual(Transcode.get_segment(self.movie, 1), l_path)
+        with open(l_path, 'rb') as f:
+            self.assertEqual(f.read(), b'segment 6')
+        self.assertEqual(self.runs.count(Transcode.FFMPEG_BINARY), 1)
+        with self.assertRaises(ValueError):
+            Transcode.get_segment(self.movie, 3)
+
+    def test_concurrent_requests_share_one_run(self):
+        Transcode.probe(self.movie)
+        l_release = threading.Event()
+        l_run = self.run_tool
+
+        def slow_run(arguments: list, **kwargs) -> subprocess.CompletedProcess:
+            l_release.wait(5)
+            return l_run(arguments, **kwargs)
+
+        Transcode.subprocess.run.side_effect = slow_run
+        l_results: list = []
+        l_threads = [threading.Thread(target=lambda: l_results.append(Transcode.get_segment(self.movie, 0)))
+                     for _ in range(4)]
+        for t in l_threads:
+            t.start()
+        l_release.set()
+        for t in l_threads:
+            t.join()
+        self.assertEqual(len(set(l_results)), 1)
+        self.assertEqual(self.runs.count(Transcode.FFMPEG_BINARY), 1)
+
+    def test_changed_source_gets_new_segments(self):
+        l_path = Transcode.get_segment(self.movie, 0)
+        os.utime(self.movie, ns=(1, 1))
+        self.assertNotEqual(Transcode.get_segment(self.movie, 0), l_path)
+
+    def test_least_recently_used_segments_are_evicted(self):
+        with mock.patch.object(Transcode, 'MEDIA_CACHE_MAX_BYTES', 20):
+            l_first = Transcode.get_segment(self.movie, 0)
+            os.utime(l_first, (1, 1))
+            Transcode.get_segment(self.movie, 1)
+            Transcode.get_segment(self.movie, 2)
+        self.assertFalse(os.path.exists(l_first))
+
+    def test_segments_over_http(self):
+        l_query = {'id': '/clips/old.avi', 'name': 'old.avi', 'type': 'media'}
+        l_response = self.client.get('/filesystem/', {**l_query, 'content': 'playlist'})
+        self.assertEqual(l_response['Content-Type'], 'application/vnd.apple.mpegurl')
+        l_query['content'] = 'segment'
+        l_response = self.client.get('/filesystem/', {**l_query, 'index': 0})
+        self.assertEqual(b''.join(l_response.streaming_content), b'segment 0')
+        l_response.close()
+        self.assertEqual(self.client.get('/filesystem/', {**l_query, 'index': 9}).status_code, 404)
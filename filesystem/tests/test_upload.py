@@ -0,0 +1,121 @@
+import hashlib
+import os
+from unittest import mock
+
+from django.test import TestCase
+
+from com.yoclabo.filesystem.query.Query import scan_children
+from com.yoclabo.filesystem.upload import Upload
+from filesystem.models import Upload as UploadModel
+from filesystem.tests.support import ShareMixin
+
+DATA = b'0123456789abcdefghij'
+
+
+class UploadTest(ShareMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        l_patch = mock.patch.object(Upload, 'UPLOAD_CHUNK_SIZE', 8)
+        l_patch.start()
+        self.addCleanup(l_patch.stop)
+        self.mkdir('in')
+        return
+
+    def begin(self, name: str = 'new.bin', size: int = len(DATA)) -> dict:
+        l_response = self.client.post('/filesystem/upload', {'id': '/in', 'name': name, 'size': size})
+        self.assertEqual(l_response.status_code, 201)
+        return l_response.json()
+
+    def put(self, token: str, offset: int, data: bytes, sha256: str | None = None):
+        l_headers = {} if sha256 is None else {'X-Chunk-SHA256': sha256}
+        return self.client.put(
+            f'/filesystem/upload?token={token}&offset={offset}', data, content_type='application/octet-stream',
+            headers=l_headers
+        )
+
+    def put_all(self, token: str, data: bytes = DATA) -> None:
+        for offset in range(0, len(data), 8):
+            self.assertEqual(self.put(token, offset, data[offset:offset + 8]).status_code, 204)
+        return
+
+    def received(self, token: str) -> list:
+        return self.client.get('/filesystem/upload', {'token': token}).json()['received']
+
+    def complete(self, token: str, sha256: str = ''):
+        return self.client.post(f'/filesystem/upload?token={token}&complete=true&sha256={sha256}')
+
+    def test_chunks_out_of_order_then_complete(self):
+        l_session = self.begin()
+        self.assertEqual(self.put(l_session['token'], 16, DATA[16:]).status_code, 204)
+        self.assertEqual(self.put(l_session['token'], 0, DATA[:8]).status_code, 204)
+        self.assertEqual(self.received(l_session['token']), [0, 2])
+        self.assertEqual(self.complete(l_session['token']).status_code, 400)
+        self.assertEqual(self.put(l_session['token'], 8, DATA[8:16]).status_code, 204)
+        self.assertEqual(self.complete(l_session['token']).status_code, 204)
+        with open(self.path('in/new.bin'), 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+        self.assertEqual(os.listdir(self.path('in')), ['new.bin'])
+
+    def test_part_file_is_not_listed(self):
+        self.begin()
+        self.assertEqual(len(os.listdir(self.path('in'))), 1)
+        self.assertEqual(scan_children(self.path('in')), [])
+
+    def test_missing_or_invalid_parameters_are_400(self):
+        self.assertEqual(self.client.post('/filesystem/upload', {'id': '/in', 'name': 'x'}).status_code, 400)
+        self.assertEqual(self.client.post('/filesystem/upload', {'id': '/in', 'size': 3}).status_code, 400)
+        l_response = self.client.post('/filesystem/upload', {'id': '/in', 'name': 'x', 'size': 'a'})
+        self.assertEqual(l_response.status_code, 400)
+        self.assertEqual(self.client.get('/filesystem/upload').status_code, 400)
+        l_session = self.begin()
+        self.assertEqual(self.put(l_session['token'], 3, DATA[:8]).status_code, 400)
+        self.assertEqual(self.client.put(f'/filesystem/upload?token={l_session["token"]}', b'').status_code, 400)
+
+    def test_existing_target_is_409(self):
+        self.write('in/new.bin', b'old')
+        l_response = self.client.post('/filesystem/upload', {'id': '/in', 'name': 'new.bin', 'size': 3})
+        self.assertEqual(l_response.status_code, 409)
+
+    def test_target_created_during_completion_is_409(self):
+        l_session = self.begin()
+        self.put_all(l_session['token'])
+        l_verify = Upload.verify
+
+        def verify(upload, sha256: str) -> None:
+            l_verify(upload, sha256)
+            self.write('in/new.bin', b'old')
+
+        with mock.patch.object(Upload, 'verify', side_effect=verify):
+            l_response = self.complete(l_session['token'], hashlib.sha256(DATA).hexdigest())
+        self.assertEqual(l_response.status_code, 409)
+        with open(self.path('in/new.bin'), 'rb') as f:
+            self.assertEqual(f.read(), b'old')
+        self.assertEqual(self.received(l_session['token']), [0, 1, 2])
+
+    def test_chunk_checksum_mismatch_leaves_the_chunk_missing(self):
+        l_session = self.begin()
+        self.assertEqual(self.put(l_session['token'], 0, DATA[:8], '00' * 32).status_code, 400)
+        self.assertEqual(self.received(l_session['token']), [])
+
+    def test_whole_file_checksum(self):
+        l_session = self.begin()
+        self.put_all(l_session['token'])
+        self.assertEqual(self.complete(l_session['token'], '00' * 32).status_code, 400)
+        self.assertFalse(os.path.exists(self.path('in/new.bin')))
+        self.assertEqual(self.complete(l_session['token'], hashlib.sha256(DATA).hexdigest()).status_code, 204)
+        self.assertTrue(os.path.exists(self.path('in/new.bin')))
+
+    def test_corrupted_part_file_is_caught_by_the_whole_file_check(self):
+        l_session = self.begin()
+        self.put_all(l_session['token'])
+        with open(UploadModel.objects.get(token=l_session['token']).temp_path, 'r+b') as f:
+            f.seek(9)
+            f.write(b'X')
+        self.assertEqual(self.complete(l_session['token'], hashlib.sha256(DATA).hexdigest()).status_code, 400)
+        self.assertEqual(self.received(l_session['token']), [0, 2])
+
+    def test_abort_removes_the_part_file(self):
+        l_session = self.begin()
+        self.assertEqual(self.client.delete(f'/filesystem/upload?token={l_session["token"]}').status_code, 204)
+        self.assertEqual(os.listdir(self.path('in')), [])
@@ -0,0 +1,103 @@
+import os
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+
+from com.yoclabo.filesystem.index import Index
+from filesystem.tests.support import ShareMixin
+
+
+def settle(root: str) -> None:
+    # A directory's own mtime counts towards its newest; old ones leave the files' times to show.
+    for l_directory, _, _ in os.walk(root):
+        os.utime(l_directory, (1, 1))
+    return
+
+
+class RollupTest(ShareMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('photos/2023/a.jpg', b'x' * 100, mtime=1000)
+        self.write('photos/2024/b.jpg', b'x' * 300, mtime=3000)
+        self.write('photos/2024/c.jpg', b'x' * 200, mtime=2000)
+        self.write('docs/readme.txt', b'x' * 10, mtime=500)
+        settle(self.root)
+        Index.refresh(self.root, 2)
+        return
+
+    def totals(self, name: str) -> tuple:
+        l_totals = Index.get_totals(self.path(name))
+        return l_totals.size, l_totals.files, l_totals.newest
+
+    def test_directories_carry_their_subtree_totals(self):
+        self.assertEqual(self.totals('photos/2024'), (500, 2, 3000))
+        self.assertEqual(self.totals('photos')[:2], (600, 3))
+        self.assertEqual(self.totals('')[:2], (610, 4))
+        self.assertIsNone(Index.get_totals(self.path('docs/readme.txt')))
+
+    def test_a_change_is_rolled_up_to_the_root(self):
+        self.write('photos/2023/d.jpg', b'x' * 1000, mtime=4000)
+        settle(self.root)
+        Index.update(self.path('photos/2023'))
+        self.assertEqual(self.totals('photos/2023'), (1100, 2, 4000))
+        self.assertEqual(self.totals('photos'), (1600, 4, 4000))
+        self.assertEqual(self.totals('')[:2], (1610, 5))
+
+    def test_a_removed_directory_leaves_the_totals(self):
+        for name in ['b.jpg', 'c.jpg']:
+            os.remove(self.path('photos/2024/' + name))
+        os.rmdir(self.path('photos/2024'))
+        Index.update(self.path('photos/2024'))
+        self.assertEqual(self.totals('photos')[:2], (100, 1))
+
+    def test_totals_survive_a_rescan_of_the_parent(self):
+        self.write('photos/new.txt', b'x')
+        Index.update(self.path('photos'))
+        self.assertEqual(self.totals('photos/2024')[:2], (500, 2))
+        self.assertEqual(self.totals('photos')[:2], (601, 4))
+
+    def test_largest_descendants(self):
+        self.assertEqual([e.name for e in Index.query_largest(self.root, 2)], ['photos', '2024'])
+
+    def test_name_index_triggers_are_in_place(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'filesystem_node'")
+            l_triggers = sorted(r[0] for r in cursor.fetchall())
+        self.assertEqual(l_triggers, [f'filesystem_node_name_{e}' for e in ['delete', 'insert', 'update']])
+
+
+class UsageApiTest(ShareMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('a/big.bin', b'x' * 1000, mtime=1000)
+        self.write('a/b/small.bin', b'x' * 10, mtime=2000)
+        self.write('c/tiny.bin', b'x', mtime=3000)
+        settle(self.root)
+        Index.refresh(self.root, 2)
+        return
+
+    def get(self, **parameters):
+        with mock.patch.object(Index, 'METADATA_INDEX', True):
+            return self.client.get('/filesystem/usage', parameters)
+
+    def test_report(self):
+        l_usage = self.get(id='/', limit=2).json()
+        self.assertEqual((l_usage['id'], l_usage['size'], l_usage['files'], l_usage['newest']), ('/', 1011, 3, 3000))
+        self.assertEqual(l_usage['fields'], ['id', 'name', 'size', 'files', 'newest'])
+        self.assertEqual(l_usage['largest'], [['/a', 'a', 1010, 2, 2000], ['/a/b', 'b', 10, 1, 2000]])
+
+    def test_limit_is_capped(self):
+        with mock.patch.dict(os.environ, {'USAGE_API_MAX_LIMIT': '1'}):
+            self.assertEqual(len(self.get(id='/', limit=50).json()['largest']), 1)
+
+    def test_unknown_directory_or_no_index(self):
+        self.assertEqual(self.get(id='/missing').status_code, 404)
+        self.assertEqual(self.client.get('/filesystem/usage', {'id': '/a'}).status_code, 404)
+
+    def test_listing_shows_directory_totals(self):
+        with mock.patch.object(Index, 'METADATA_INDEX', True):
+            l_response = self.client.get('/filesystem/', {'id': '/', 'name': 'root'})
+        self.assertContains(l_response, '1010\xa0bytes / 2 files')
@@ -0,0 +1,40 @@
+import os
+
+from django.test import SimpleTestCase
+
+from browser.settings import BASE_DIR
+from filesystem.tests.support import ShareMixin
+
+STATIC_DIRECTORY = os.path.join(BASE_DIR, 'static')
+
+
+class ViewerTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('docs/manual.pdf', b'%PDF-1.4\n' + bytes(2000))
+        self.write('clips/movie.mp4', bytes(5000))
+        self.static = sorted(os.listdir(STATIC_DIRECTORY))
+        return
+
+    def view(self, id: str, type: str):
+        l_response = self.client.get('/filesystem/', {'id': id, 'type': type, 'name': os.path.basename(id)})
+        self.assertEqual(l_response.status_code, 200)
+        return l_response.content.decode()
+
+    def test_pdf_is_read_from_the_share(self):
+        l_page = self.view('/docs/manual.pdf', 'pdf')
+        self.assertIn('id=/docs/manual.pdf&type=pdf&name=manual.pdf&content=bytes', l_page)
+        self.assertEqual(sorted(os.listdir(STATIC_DIRECTORY)), self.static)
+
+    def test_media_plays_from_the_share(self):
+        l_page = self.view('/clips/movie.mp4', 'media')
+        self.assertIn('<video controls preload="metadata" src="?id=/clips/movie.mp4&type=media', l_page)
+        self.assertEqual(sorted(os.listdir(STATIC_DIRECTORY)), self.static)
+
+    def test_bytes_answer_range_requests(self):
+        l_query = {'id': '/clips/movie.mp4', 'name': 'movie.mp4', 'content': 'bytes'}
+        l_response = self.client.get('/filesystem/', l_query, headers={'Range': 'bytes=1000-1999'})
+        self.assertEqual((l_response.status_code, l_response['Content-Range']), (206, 'bytes 1000-1999/5000'))
+        self.assertEqual(l_response['Accept-Ranges'], 'bytes')
+        self.assertEqual(len(b''.join(l_response.streaming_content)), 1000)
@@ -0,0 +1,193 @@
+import fcntl
+import os
+import subprocess
+import sys
+import threading
+from unittest import mock
+
+from django.core.signals import request_started
+from django.test import SimpleTestCase
+
+from browser.settings import BASE_DIR
+from com.yoclabo.filesystem.cache.ListingCache import ListingCache
+from com.yoclabo.filesystem.watch import Watcher
+from filesystem import apps
+from filesystem.tests.support import ShareMixin
+
+
+def run_python(code: str, *arguments: str, **kwargs) -> subprocess.Popen:
+    # Another worker of the same deployment: a separate interpreter on the same tree.
+    return subprocess.Popen([sys.executable, '-c', code, *arguments], cwd=BASE_DIR, **kwargs)
+
+
+class WatcherStartTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name, value in [('WATCHER_LOCK_FILE', self.path('cache/watcher.lock')), ('lock_fd', None),
+                            ('watcher', None), ('next_attempt', 0.0), ('WATCHER_LOCK_RETRY_SECONDS', 0)]:
+            l_patch = mock.patch.object(Watcher, name, value)
+            l_patch.start()
+            self.addCleanup(l_patch.stop)
+        l_patch = mock.patch.object(Watcher.Watcher, 'run')
+        self.run_mock = l_patch.start()
+        self.addCleanup(l_patch.stop)
+        self.addCleanup(self.release)
+        return
+
+    def release(self) -> None:
+        if Watcher.lock_fd is not None:
+            os.close(Watcher.lock_fd)
+        return
+
+    def test_concurrent_starts_create_one_watcher(self):
+        l_barrier = threading.Barrier(8)
+        l_watchers: list = []
+
+        def start():
+            l_barrier.wait()
+            l_watchers.append(Watcher.start(self.root, []))
+
+        l_threads = [threading.Thread(target=start) for _ in range(8)]
+        for t in l_threads:
+            t.start()
+        for t in l_threads:
+            t.join()
+        self.assertEqual(len({id(w) for w in l_watchers}), 1)
+        Watcher.watcher.f_thread.join()
+        self.assertEqual(self.run_mock.call_count, 1)
+
+    def test_only_the_lock_holder_starts_a_watcher(self):
+        # flock locks belong to the open file, so a second descriptor stands in for another worker.
+        os.makedirs(self.path('cache'))
+        l_fd = os.open(Watcher.WATCHER_LOCK_FILE, os.O_RDWR | os.O_CREAT)
+        self.addCleanup(os.close, l_fd)
+        fcntl.flock(l_fd, fcntl.LOCK_EX)
+        self.assertIsNone(Watcher.start(self.root, []))
+        fcntl.flock(l_fd, fcntl.LOCK_UN)
+        self.assertIsNotNone(Watcher.start(self.root, []))
+        with self.assertRaises(BlockingIOError):
+            fcntl.flock(l_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def test_another_worker_takes_over_when_the_holder_exits(self):
+        os.makedirs(self.path('cache'))
+        l_holder = run_python(
+            'import fcntl, os, sys\n'
+            'fd = os.open(sys.argv[1], os.O_RDWR | os.O_CREAT)\n'
+            'fcntl.flock(fd, fcntl.LOCK_EX)\n'
+            'print(flush=True)\n'
+            'sys.stdin.read()\n',
+            Watcher.WATCHER_LOCK_FILE, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        l_holder.stdout.readline()
+        Watcher.WATCHER_LOCK_RETRY_SECONDS = 3600
+        with mock.patch.object(Watcher, 'get_listeners', return_value=[]):
+            request_started.connect(apps.start_watcher, dispatch_uid='filesystem-watcher')
+            self.addCleanup(request_started.disconnect, apps.start_watcher, dispatch_uid='filesystem-watcher')
+            apps.start_watcher()
+            self.assertIsNone(Watcher.watcher)
+            self.assertTrue(request_started.has_listeners())
+            l_holder.communicate(b'')
+            apps.start_watcher()
+            self.assertIsNone(Watcher.watcher)
+            Watcher.next_attempt = 0.0
+            apps.start_watcher()
+        self.assertIsNotNone(Watcher.watcher)
+        self.assertFalse(request_started.disconnect(apps.start_watcher, dispatch_uid='filesystem-watcher'))
+
+
+class SharedInvalidationTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.log = self.path('cache/listing.invalidations')
+        self.write('a/1')
+        self.write('b/1')
+        return
+
+    def load(self, cache: ListingCache, name: str) -> list:
+        return cache.get(self.path(name), lambda p: sorted(os.listdir(p))).entries
+
+    def publish_elsewhere(self, *names: str) -> None:
+        l_process = run_python(
+            'import sys\n'
+            'from com.yoclabo.filesystem.cache.ListingCache import ListingCache\n'
+            'ListingCache(100, 0, False, sys.argv[1]).publish(sys.argv[2:])\n',
+            self.log, *[self.path(n) for n in names]
+        )
+        self.assertEqual(l_process.wait(60), 0)
+        return
+
+    def test_invalidations_from_another_process_are_replayed(self):
+        # Without mtime checks or a TTL the cache would otherwise serve the old listing for ever.
+        l_cache = ListingCache(100, 0, False, self.log)
+        self.assertEqual(self.load(l_cache, 'a'), ['1'])
+        self.load(l_cache, 'b')
+        self.write('a/2')
+        self.write('b/2')
+        self.assertEqual(self.load(l_cache, 'a'), ['1'])
+        self.publish_elsewhere('a')
+        self.assertEqual(self.load(l_cache, 'a'), ['1', '2'])
+        self.assertEqual(self.load(l_cache, 'b'), ['1'])
+
+    def test_a_log_started_over_drops_everything(self):
+        l_cache = ListingCache(100, 0, False, self.log)
+        self.publish_elsewhere('a')
+        self.load(l_cache, 'b')
+        self.write('b/2')
+        with mock.patch('com.yoclabo.filesystem.cache.ListingCache.LISTING_INVALIDATION_LOG_MAX_BYTES', 0):
+            ListingCache(100, 0, False, self.log).publish([self.path('a')])
+        self.assertEqual(self.load(l_cache, 'b'), ['1', '2'])
+
+    def test_watcher_publishes_its_changes(self):
+        l_change = Watcher.Change()
+        l_change.add_entry(self.path('a/1'))
+        with mock.patch.object(Watcher.ListingCache, 'cache', ListingCache(100, 0, False, self.log)):
+            Watcher.invalidate_listings(l_change)
+        with open(self.log, 'rb') as f:
+            self.assertEqual(f.read(), os.fsencode(self.path('a')) + b'\0' + os.fsencode(self.path('a/1')) + b'\0')
+
+
+class WatcherChangeTest(ShareMixin, SimpleTestCase):
+
+    def test_inotify_ignores_upload_part_files(self):
+        l_inotify = Watcher.Inotify()
+        self.addCleanup(l_inotify.close)
+        l_inotify.add_tree(self.root)
+        self.write('.new.bin.abcdEFGH.part', b'x')
+        self.write('new.bin', b'x')
+        l_change = Watcher.Change()
+        self.assertTrue(l_inotify.read(l_change))
+        self.assertEqual(l_change.paths, {self.path('new.bin')})
+        self.assertEqual(l_change.directories, {self.root})
+
+    def test_inotify_follows_new_directories(self):
+        l_inotify = Watcher.Inotify()
+        self.addCleanup(l_inotify.close)
+        l_inotify.add_tree(self.root)
+        self.mkdir('sub')
+        l_inotify.read(Watcher.Change())
+        self.write('sub/a.txt')
+        l_change = Watcher.Change()
+        l_inotify.read(l_change)
+        self.assertIn(self.path('sub/a.txt'), l_change.paths)
+
+    def test_sweep_reports_changed_and_removed_directories(self):
+        self.mkdir('a/b')
+        self.mkdir('c')
+        l_watcher = Watcher.Watcher(self.root, [])
+        l_watcher.sweep(Watcher.Change())
+        os.utime(self.path('a/b'), (1, 1))
+        os.rmdir(self.path('c'))
+        l_change = Watcher.Change()
+        l_watcher.sweep(l_change)
+        self.assertEqual(l_change.directories, {self.path('a/b'), self.root})
+        self.assertEqual(l_change.paths, {self.path('c')})
+
+    def test_a_failing_listener_does_not_stop_the_others(self):
+        l_seen: list = []
+        l_watcher = Watcher.Watcher(self.root, [lambda c: 1 / 0, l_seen.append])
+        l_change = Watcher.Change()
+        with self.assertLogs(Watcher.logger, 'WARNING'):
+            l_watcher.dispatch(l_change)
+        self.assertEqual(l_seen, [l_change])
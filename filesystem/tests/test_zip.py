@@ -0,0 +1,78 @@
+import builtins
+import io
+import zipfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from com.yoclabo.filesystem.archive import ZipStream
+from filesystem.tests.support import ShareMixin
+
+
+class FailingFile(io.BytesIO):
+
+    # Reads succeed until fail_after bytes have been handed out, then raise like a dropped network mount.
+    def __init__(self, data: bytes, fail_after: int) -> None:
+        super().__init__(data)
+        self.f_fail_after: int = fail_after
+        return
+
+    def read(self, size: int = -1) -> bytes:
+        if self.f_fail_after <= self.tell():
+            raise OSError(5, 'Input/output error')
+        return super().read(size)
+
+
+class ZipStreamTest(ShareMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('dir/a.txt', b'hello ' * 1000)
+        self.write('dir/photo.jpg', b'\xff\xd8' + bytes(100))
+        self.write('dir/sub/empty.txt')
+        self.write('dir/.b.txt.abcdEFGH.part', b'partial')
+        self.write('dir/broken.txt', b'broken')
+        return
+
+    def archive(self, sources: list) -> zipfile.ZipFile:
+        return zipfile.ZipFile(io.BytesIO(b''.join(ZipStream.iterate(sources))))
+
+    def fail_on(self, name: str, fail_after: int):
+        l_open = builtins.open
+
+        def fake_open(path, *args, **kwargs):
+            if path.endswith(name):
+                return FailingFile(b'x' * ZipStream.READ_SIZE * 3, fail_after)
+            return l_open(path, *args, **kwargs)
+
+        return mock.patch.object(ZipStream, 'open', fake_open, create=True)
+
+    def test_directory_round_trip(self):
+        l_zip = self.archive([(self.path('dir'), 'dir')])
+        self.assertIsNone(l_zip.testzip())
+        self.assertEqual(l_zip.namelist(), [
+            'dir/', 'dir/a.txt', 'dir/broken.txt', 'dir/photo.jpg', 'dir/sub/', 'dir/sub/empty.txt'
+        ])
+        self.assertEqual(l_zip.read('dir/a.txt'), b'hello ' * 1000)
+        self.assertEqual(l_zip.getinfo('dir/a.txt').compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(l_zip.getinfo('dir/photo.jpg').compress_type, zipfile.ZIP_STORED)
+
+    def test_a_file_that_cannot_be_read_at_all_is_left_out(self):
+        with self.fail_on('broken.txt', 0), self.assertLogs(ZipStream.logger, 'WARNING') as l_logs:
+            l_zip = self.archive([(self.path('dir'), 'dir')])
+        self.assertIsNone(l_zip.testzip())
+        self.assertNotIn('dir/broken.txt', l_zip.namelist())
+        self.assertIn('dir/photo.jpg', l_zip.namelist())
+        self.assertIn('skipped', l_logs.output[0])
+
+    def test_a_read_error_part_way_ends_the_stream(self):
+        self.write('big.txt', b'x' * ZipStream.READ_SIZE * 3)
+        l_chunks: list = []
+        with self.fail_on('big.txt', ZipStream.READ_SIZE), self.assertLogs(ZipStream.logger, 'WARNING') as l_logs:
+            with self.assertRaises(ZipStream.IncompleteEntry) as l_error:
+                for c in ZipStream.iterate([(self.path('dir/a.txt'), 'a.txt'), (self.path('big.txt'), 'big.txt')]):
+                    l_chunks.append(c)
+        self.assertEqual(l_error.exception.written, ZipStream.READ_SIZE)
+        self.assertNotIn('skipped', ''.join(l_logs.output))
+        with self.assertRaises(zipfile.BadZipFile):
+            zipfile.ZipFile(io.BytesIO(b''.join(l_chunks)))
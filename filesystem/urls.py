@@ -1,9 +1,19 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
 app_name = 'filesystem'
 urlpatterns = [
-    path('', views.browse, name='index'),
-    path('download', views.download, name='download'),
+    path('', views.browse_async if settings.ASYNC_VIEWS else views.browse, name='index'),
+    path('download', views.download_async if settings.ASYNC_VIEWS else views.download, name='download'),
+    path('upload', views.upload, name='upload'),
+    path('thumbnails', views.thumbnails, name='thumbnails'),
+    path('zip', views.zip, name='zip'),
+    path('tail', views.tail_async if settings.ASYNC_VIEWS else views.tail, name='tail'),
+    path('lines', views.lines, name='lines'),
+    path('listing', views.listing, name='listing'),
+    path('usage', views.usage, name='usage'),
+    path('statistics', views.statistics, name='statistics'),
+    path('search', views.search, name='search'),
 ]
@@ -12,3 +12,63 @@ def browse(request) -> HttpResponse:
 def download(request) -> FileResponse:
     l_router = Router.FilesystemRouter(request)
     return l_router.download()
+
+
+async def browse_async(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return await l_router.run_async()
+
+
+async def download_async(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return await l_router.download_async()
+
+
+def upload(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return l_router.upload()
+
+
+def thumbnails(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return l_router.thumbnails()
+
+
+def zip(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return l_router.zip()
+
+
+def tail(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return l_router.tail()
+
+
+async def tail_async(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return await l_router.tail_async()
+
+
+def lines(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return l_router.lines()
+
+
+def listing(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return l_router.listing()
+
+
+def usage(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return l_router.usage()
+
+
+def statistics(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return l_router.statistics()
+
+
+def search(request) -> HttpResponse:
+    l_router = Router.FilesystemRouter(request)
+    return l_router.search()
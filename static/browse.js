@@ -1,53 +1,310 @@
-const DelayedImageLoader = function (w, url) {
-    if (!(this instanceof DelayedImageLoader)) {
-        return new DelayedImageLoader(w, url);
+const BatchImageLoader = function (w, url, size) {
+    if (!(this instanceof BatchImageLoader)) {
+        return new BatchImageLoader(w, url, size);
     }
 
     this.window = w;
-    this.thumb_url = url;
+    this.batch_url = url;
+    this.batch_size = size;
+    this.pending = [];
+    this.timer = undefined;
+    this.observer = new IntersectionObserver(entries => this.intersected(entries), {rootMargin: '200px'});
 }
 
-DelayedImageLoader.prototype.scroll = function () {
-    let y = this.window.scrollY;
-    let h = this.window.innerHeight;
-    let images = this.window.document.getElementsByClassName('lazy');
-    for (let i = 0; i < images.length; i++) {
-        let pos = images[i].getBoundingClientRect().top + y;
-        if (y > pos - h) {
-            this.focus(images[i]);
-        }
+BatchImageLoader.prototype.start = function () {
+    Array.from(this.window.document.getElementsByClassName('lazy')).forEach(e => this.observer.observe(e));
+}
+
+BatchImageLoader.prototype.intersected = function (entries) {
+    entries.filter(entry => entry.isIntersecting).forEach(entry => {
+        this.observer.unobserve(entry.target);
+        this.pending.push(entry.target);
+    });
+    if (this.pending.length > 0 && this.timer === undefined) {
+        // Tiles that come into view within the same frame or two share one request.
+        this.timer = setTimeout(() => this.flush(), 30);
     }
 }
 
-DelayedImageLoader.prototype.focus = function (e) {
-    if (!e.hasAttribute('id')) {
-        return;
+BatchImageLoader.prototype.flush = function () {
+    this.timer = undefined;
+    while (this.pending.length > 0) {
+        this.fetch(this.pending.splice(0, this.batch_size));
     }
+}
+
+BatchImageLoader.prototype.fetch = function (images) {
+    const target = this.batch_url + '?' + images.map(e => 'id=' + e.getAttribute('id')).join('&');
+    images.forEach(e => e.removeAttribute('id'));
+    fetch(target).then(res => this.read(res.body.getReader(), images));
+}
 
-    let request = new XMLHttpRequest();
-    request.open('GET', this.thumb_url + "?id=" + e.getAttribute('id') + "&content=encoded");
-    request.responseType = 'text';
-    request.onload = () => e.src = request.responseText;
-    request.send();
-    e.removeAttribute('id');
+BatchImageLoader.prototype.read = async function (reader, images) {
+    // Frames are [header length][header JSON][body length][body], lengths as 4-byte big-endian.
+    let buffer = new Uint8Array(0);
+    for (;;) {
+        const {done, value} = await reader.read();
+        if (done) {
+            return;
+        }
+        const joined = new Uint8Array(buffer.length + value.length);
+        joined.set(buffer);
+        joined.set(value, buffer.length);
+        buffer = joined;
+        buffer = this.unpack(buffer, images);
+    }
 }
 
-const TileSwitch = function (w, id, type, page) {
+BatchImageLoader.prototype.unpack = function (buffer, images) {
+    for (;;) {
+        const view = new DataView(buffer.buffer, buffer.byteOffset, buffer.byteLength);
+        if (buffer.length < 4) {
+            return buffer;
+        }
+        const header_length = view.getUint32(0);
+        if (buffer.length < 8 + header_length) {
+            return buffer;
+        }
+        const body_length = view.getUint32(4 + header_length);
+        if (buffer.length < 8 + header_length + body_length) {
+            return buffer;
+        }
+        const header = JSON.parse(new TextDecoder().decode(buffer.subarray(4, 4 + header_length)));
+        if (header.status === 200) {
+            const body = buffer.slice(8 + header_length, 8 + header_length + body_length);
+            const url = URL.createObjectURL(new Blob([body], {type: header.type}));
+            const e = images[header.index];
+            e.onload = () => URL.revokeObjectURL(url);
+            e.src = url;
+        }
+        buffer = buffer.subarray(8 + header_length + body_length);
+    }
+}
+
+const TileSwitch = function (w, id, type, page, parameters) {
     if (!(this instanceof TileSwitch)) {
-        return new TileSwitch(w, id, type, page);
+        return new TileSwitch(w, id, type, page, parameters);
     }
 
     this.window = w;
     this.id = id;
     this.type = type;
     this.page = page;
+    this.parameters = parameters;
 }
 
 TileSwitch.prototype.changed = function (ev) {
     if (ev.currentTarget.checked) {
-        this.window.location.href = '?id=' + this.id + '&type=' + this.type + '&page=' + this.page + '&tile=true';
+        this.window.location.href = '?id=' + this.id + '&type=' + this.type + '&page=' + this.page + '&tile=true' + this.parameters;
     } else {
-        this.window.location.href = '?id=' + this.id + '&type=' + this.type + '&page=' + this.page;
+        this.window.location.href = '?id=' + this.id + '&type=' + this.type + '&page=' + this.page + this.parameters;
+    }
+}
+
+TileSwitch.prototype.scrollChanged = function (ev) {
+    if (ev.currentTarget.checked) {
+        this.window.location.href = '?id=' + this.id + '&type=' + this.type + '&scroll=true' + this.parameters;
+    } else {
+        this.window.location.href = '?id=' + this.id + '&type=' + this.type + '&page=1' + this.parameters;
+    }
+}
+
+const VirtualList = function (w, url, id, parameters) {
+    if (!(this instanceof VirtualList)) {
+        return new VirtualList(w, url, id, parameters);
+    }
+
+    this.window = w;
+    this.url = url;
+    this.id = id;
+    this.parameters = parameters;
+    this.row_height = 40;
+    this.overscan = 20;
+    this.entries = [];
+    this.total = 0;
+    this.cursor = null;
+    this.done = false;
+    this.loading = false;
+}
+
+VirtualList.prototype.start = function () {
+    this.container = this.window.document.getElementById('virtual-list');
+    this.status = this.window.document.getElementById('virtual-list-status');
+    this.load();
+}
+
+VirtualList.prototype.load = function () {
+    if (this.loading || this.done) {
+        return;
+    }
+    this.loading = true;
+    let target = this.url + '?id=' + encodeURIComponent(this.id) + this.parameters;
+    if (this.cursor !== null) {
+        target += '&cursor=' + this.cursor;
+    }
+    fetch(target)
+        .then(res => res.json())
+        .then(listing => {
+            if (listing.restarted) {
+                // The directory changed between two pages; what was loaded so far is out of date.
+                this.entries = [];
+            }
+            this.entries.push(...listing.entries);
+            this.total = listing.total;
+            this.cursor = listing.cursor;
+            this.done = listing.cursor === null;
+            this.loading = false;
+            this.container.style.height = (this.total * this.row_height) + 'px';
+            this.status.textContent = this.entries.length + ' / ' + this.total;
+            this.render();
+        })
+        .catch(() => this.loading = false);
+}
+
+VirtualList.prototype.render = function () {
+    // Only the rows around the viewport exist in the DOM, however long the directory is.
+    const top = this.window.scrollY - this.container.offsetTop;
+    const first = Math.max(0, Math.floor(top / this.row_height) - this.overscan);
+    const last = Math.min(this.entries.length, Math.ceil((top + this.window.innerHeight) / this.row_height) + this.overscan);
+    const rows = this.window.document.createDocumentFragment();
+    for (let i = first; i < last; i++) {
+        rows.appendChild(this.row(i, this.entries[i]));
+    }
+    this.container.replaceChildren(rows);
+    if (this.entries.length - this.overscan <= last) {
+        this.load();
+    }
+}
+
+VirtualList.prototype.row = function (index, entry) {
+    const [id, name, type, size, mtime, files] = entry;
+    const row = this.window.document.createElement('div');
+    row.className = 'row align-items-center position-absolute w-100 border-bottom';
+    row.style.top = (index * this.row_height) + 'px';
+    row.style.height = this.row_height + 'px';
+    const link = this.window.document.createElement('a');
+    link.className = 'col-6 text-truncate';
+    link.textContent = name;
+    link.href = '?id=' + encodeURIComponent(id) + '&type=' + type + '&name=' + encodeURIComponent(name);
+    if (type === 'directory') {
+        link.href += '&scroll=true' + this.parameters;
+    } else {
+        link.target = '_blank';
+    }
+    const kind = this.window.document.createElement('span');
+    kind.className = 'col-2 text-center';
+    kind.textContent = type;
+    const detail = this.window.document.createElement('small');
+    detail.className = 'col-4 text-center text-body-secondary';
+    // Directories only have a size once the metadata index has rolled up their subtree.
+    const total = type !== 'directory' ? size + ' B  ' : files ? size + ' B / ' + files + (files === 1 ? ' file  ' : ' files  ') : '';
+    detail.textContent = total + new Date(mtime * 1000).toISOString().slice(0, 16).replace('T', ' ');
+    row.append(link, kind, detail);
+    return row;
+}
+
+const ChunkedUploader = function (w, url, id, csrf, parallel) {
+    if (!(this instanceof ChunkedUploader)) {
+        return new ChunkedUploader(w, url, id, csrf, parallel);
+    }
+
+    this.window = w;
+    this.url = url;
+    this.id = id;
+    this.csrf = csrf;
+    this.parallel = parallel;
+    this.retries = 5;
+    // SubtleCrypto cannot hash incrementally, so only files this small get a whole-file digest.
+    this.max_digest_size = 256 * 1024 * 1024;
+}
+
+ChunkedUploader.prototype.start = async function (input, bar, status) {
+    for (const file of Array.from(input.files)) {
+        status.textContent = file.name;
+        try {
+            await this.upload(file, (done, count) => bar.style.width = (count === 0 ? 100 : 100 * done / count) + '%');
+        } catch (e) {
+            status.textContent = file.name + ': ' + e.message + ' (start again to resume)';
+            return;
+        }
+    }
+    this.window.location.reload();
+}
+
+ChunkedUploader.prototype.request = async function (query, options) {
+    const res = await fetch(this.url + '?' + query, Object.assign({headers: {'X-CSRFToken': this.csrf}}, options));
+    if (!res.ok) {
+        throw new Error(res.status + ' ' + (await res.text()));
+    }
+    return res;
+}
+
+ChunkedUploader.prototype.begin = async function (file) {
+    // The token is kept per file, so a reload or a dropped connection carries on where it stopped.
+    const key = 'upload:' + this.id + ':' + file.name + ':' + file.size + ':' + file.lastModified;
+    const token = this.window.localStorage.getItem(key);
+    if (token !== null) {
+        try {
+            return [key, await (await this.request('token=' + token, {})).json()];
+        } catch (e) {
+            this.window.localStorage.removeItem(key);
+        }
+    }
+    const query = 'id=' + encodeURIComponent(this.id) + '&name=' + encodeURIComponent(file.name) + '&size=' + file.size;
+    const session = await (await this.request(query, {method: 'POST'})).json();
+    this.window.localStorage.setItem(key, session.token);
+    return [key, session];
+}
+
+ChunkedUploader.prototype.upload = async function (file, progress) {
+    const [key, session] = await this.begin(file);
+    const received = new Set(session.received);
+    const count = Math.ceil(file.size / session.chunk_size);
+    const queue = [];
+    for (let i = 0; i < count; i++) {
+        if (!received.has(i)) {
+            queue.push(i);
+        }
+    }
+    let done = count - queue.length;
+    progress(done, count);
+    const worker = async () => {
+        while (queue.length > 0) {
+            await this.send(session, file, queue.shift());
+            progress(++done, count);
+        }
+    };
+    await Promise.all(Array.from({length: this.parallel}, worker));
+    let complete = 'token=' + session.token + '&complete=true';
+    if (this.window.crypto.subtle !== undefined && file.size <= this.max_digest_size) {
+        complete += '&sha256=' + this.hex(await this.window.crypto.subtle.digest('SHA-256', await file.arrayBuffer()));
+    }
+    await this.request(complete, {method: 'POST'});
+    this.window.localStorage.removeItem(key);
+}
+
+ChunkedUploader.prototype.hex = function (digest) {
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+ChunkedUploader.prototype.send = async function (session, file, index) {
+    const offset = index * session.chunk_size;
+    const body = await file.slice(offset, offset + session.chunk_size).arrayBuffer();
+    const headers = {'X-CSRFToken': this.csrf, 'Content-Type': 'application/octet-stream'};
+    if (this.window.crypto.subtle !== undefined) {
+        // SubtleCrypto only exists on secure origins; without it the server skips the comparison.
+        headers['X-Chunk-SHA256'] = this.hex(await this.window.crypto.subtle.digest('SHA-256', body));
+    }
+    for (let attempt = 1; ; attempt++) {
+        try {
+            await this.request('token=' + session.token + '&offset=' + offset, {method: 'PUT', headers: headers, body: body});
+            return;
+        } catch (e) {
+            if (attempt >= this.retries) {
+                throw e;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt));
+        }
     }
 }
 
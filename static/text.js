@@ -0,0 +1,182 @@
+const LargeTextViewer = function (w, url, id) {
+    if (!(this instanceof LargeTextViewer)) {
+        return new LargeTextViewer(w, url, id);
+    }
+
+    this.window = w;
+    this.url = url;
+    this.id = id;
+    this.row_height = 20;
+    this.block_size = 500;
+    this.max_blocks = 40;
+    // Browsers stop growing an element somewhere past 10M pixels, so very long files are scrolled in scale.
+    this.max_height = 10000000;
+    this.blocks = new Map();
+    this.requested = new Set();
+    this.total = 0;
+    this.complete = false;
+    this.timer = undefined;
+}
+
+LargeTextViewer.prototype.start = function () {
+    this.viewport = this.window.document.getElementById('large-text-viewport');
+    this.spacer = this.window.document.getElementById('large-text-spacer');
+    this.status = this.window.document.getElementById('large-text-status');
+    this.load(0);
+}
+
+LargeTextViewer.prototype.scale = function () {
+    return Math.min(1, this.max_height / Math.max(1, this.total * this.row_height));
+}
+
+LargeTextViewer.prototype.visible = function () {
+    return Math.ceil(this.viewport.clientHeight / this.row_height);
+}
+
+LargeTextViewer.prototype.first = function (top) {
+    if (this.scale() === 1) {
+        return Math.floor(top / this.row_height);
+    }
+    // Scaled: the scroll range maps onto the lines proportionally, so the last page stays reachable.
+    const range = Math.max(1, this.viewport.scrollHeight - this.viewport.clientHeight);
+    return Math.floor(top / range * Math.max(0, this.total - this.visible()));
+}
+
+LargeTextViewer.prototype.load = function (block) {
+    if (this.requested.has(block)) {
+        return;
+    }
+    this.requested.add(block);
+    fetch(this.url + '?id=' + encodeURIComponent(this.id) + '&start=' + (block * this.block_size) + '&count=' + this.block_size)
+        .then(res => res.json())
+        .then(page => {
+            this.requested.delete(block);
+            this.total = page.total;
+            this.complete = page.complete;
+            if (page.lines.length === this.block_size || this.complete) {
+                this.blocks.set(block, page.lines);
+            }
+            while (this.blocks.size > this.max_blocks) {
+                this.blocks.delete(this.blocks.keys().next().value);
+            }
+            this.spacer.style.height = (this.total * this.row_height * this.scale()) + 'px';
+            this.status.textContent = this.total.toLocaleString() + ' lines' + (this.complete ? '' : ' so far, scanning ' + Math.floor(100 * page.scanned / Math.max(1, page.size)) + '%');
+            if (!this.complete && this.timer === undefined) {
+                // The index grows while the server scans; ask again until it is complete.
+                this.timer = setTimeout(() => {
+                    this.timer = undefined;
+                    this.blocks.delete(block);
+                    this.load(block);
+                }, 1000);
+            }
+            this.render();
+        })
+        .catch(() => this.requested.delete(block));
+}
+
+LargeTextViewer.prototype.line = function (index) {
+    const lines = this.blocks.get(Math.floor(index / this.block_size));
+    if (lines === undefined) {
+        this.load(Math.floor(index / this.block_size));
+        return undefined;
+    }
+    return lines[index % this.block_size];
+}
+
+LargeTextViewer.prototype.render = function () {
+    // Only the lines in view exist in the DOM; they are placed at the scroll position itself.
+    const top = this.viewport.scrollTop;
+    const first = this.first(top);
+    const last = Math.min(this.total, first + this.visible() + 1);
+    const rows = this.window.document.createDocumentFragment();
+    rows.appendChild(this.spacer);
+    for (let i = first; i < last; i++) {
+        const row = this.window.document.createElement('div');
+        row.className = 'position-absolute w-100 text-nowrap';
+        row.style.top = (top + (i - first) * this.row_height) + 'px';
+        row.style.height = this.row_height + 'px';
+        const number = this.window.document.createElement('span');
+        number.className = 'text-body-secondary d-inline-block text-end pe-3';
+        number.style.minWidth = '6em';
+        number.textContent = i + 1;
+        const text = this.window.document.createElement('span');
+        const line = this.line(i);
+        text.textContent = line === undefined ? '…' : line;
+        row.append(number, text);
+        rows.appendChild(row);
+    }
+    this.viewport.replaceChildren(rows);
+}
+
+LargeTextViewer.prototype.go = function (line) {
+    const index = Math.max(0, Math.min(this.total - 1, parseInt(line, 10) - 1));
+    if (isNaN(index)) {
+        return;
+    }
+    if (this.scale() === 1) {
+        this.viewport.scrollTop = index * this.row_height;
+    } else {
+        const range = Math.max(1, this.viewport.scrollHeight - this.viewport.clientHeight);
+        this.viewport.scrollTop = Math.ceil(index / Math.max(1, this.total - this.visible()) * range);
+    }
+    this.render();
+}
+
+const LogTail = function (w, url, id) {
+    if (!(this instanceof LogTail)) {
+        return new LogTail(w, url, id);
+    }
+
+    this.window = w;
+    this.url = url;
+    this.id = id;
+    this.max_lines = 5000;
+    this.generation = null;
+    this.offset = null;
+}
+
+LogTail.prototype.start = function () {
+    this.output = this.window.document.getElementById('log-tail');
+    this.status = this.window.document.getElementById('log-tail-status');
+    this.scroll = this.window.document.getElementById('log-tail-scroll');
+    this.poll();
+}
+
+LogTail.prototype.poll = function () {
+    // With async views this is a long poll that the server answers as soon as something is appended
+    // (retry 0); otherwise the server answers at once and says how long to wait before asking again.
+    let target = this.url + '?id=' + encodeURIComponent(this.id);
+    if (this.generation !== null) {
+        target += '&generation=' + encodeURIComponent(this.generation) + '&offset=' + this.offset;
+    }
+    fetch(target)
+        .then(res => res.json())
+        .then(tail => {
+            if (typeof tail.reset === 'string' && this.generation !== null) {
+                this.append('\n--- ' + (tail.reset === 'skipped' ? 'skipped ahead' : 'file ' + tail.reset) + ' ---\n');
+            }
+            this.generation = tail.generation;
+            this.offset = tail.offset;
+            this.append(tail.data);
+            this.status.textContent = 'following, ' + this.offset.toLocaleString() + ' bytes';
+            setTimeout(() => this.poll(), tail.retry * 1000);
+        })
+        .catch(() => {
+            this.status.textContent = 'connection lost, retrying';
+            setTimeout(() => this.poll(), 5000);
+        });
+}
+
+LogTail.prototype.append = function (data) {
+    if (data === '') {
+        return;
+    }
+    this.output.appendChild(this.window.document.createTextNode(data));
+    // Old text nodes are dropped once there are more than enough lines on screen.
+    while (this.output.childNodes.length > 1 && this.output.textContent.split('\n').length > this.max_lines) {
+        this.output.removeChild(this.output.firstChild);
+    }
+    if (this.scroll.checked) {
+        this.output.scrollTop = this.output.scrollHeight;
+    }
+}